@@ -0,0 +1,76 @@
+# Compares two results of benchmarks.suite, flagging the phases that
+# got slower, and the cases that took more memory, by over a threshold.
+# Exits with 1 when something regressed.
+#
+#   python -m benchmarks.compare old.json new.json [threshold]
+
+import json
+import sys
+
+from benchmarks.suite import PHASES
+
+
+DEFAULT_THRESHOLD = 0.1
+
+
+# (case, metric, old, new, change) of every metric both runs measured.
+# Changes are relative, positive when the new run is slower or bigger
+def compare(old, new):
+    changes = []
+    for case in sorted(set(old["cases"]) & set(new["cases"])):
+        before = old["cases"][case]
+        after = new["cases"][case]
+        for phase in PHASES:
+            metric = phase + " seconds"
+            changes.append(_change(
+                case, metric, before[phase]["seconds"],
+                after[phase]["seconds"]
+            ))
+        changes.append(_change(
+            case, "peak memory", before["peak_memory"], after["peak_memory"]
+        ))
+    return changes
+
+
+def regressions(changes, threshold=DEFAULT_THRESHOLD):
+    return [change for change in changes if change[4] > threshold]
+
+
+def _change(case, metric, old, new):
+    return case, metric, old, new, (new - old) / old if old else 0.0
+
+
+def report(changes, threshold):
+    for case, metric, old, new, change in changes:
+        flag = "REGRESSION" if change > threshold else ""
+        print("{:<16} {:<16} {:>12.4g} {:>12.4g} {:>+8.1%} {}".format(
+            case, metric, old, new, change, flag
+        ).rstrip())
+
+
+def main():
+    if len(sys.argv) < 3:
+        sys.exit("usage: python -m benchmarks.compare old.json new.json "
+                 "[threshold]")
+    runs = []
+    for path in sys.argv[1:3]:
+        with open(path) as file:
+            runs.append(json.load(file))
+    threshold = float(sys.argv[3]) if len(sys.argv) > 3 else \
+        DEFAULT_THRESHOLD
+    old, new = runs
+    if old["settings"] != new["settings"]:
+        print("warning: runs with different settings {} and {}".format(
+            old["settings"], new["settings"]
+        ))
+    for name in sorted(set(old["cases"]) ^ set(new["cases"])):
+        print("warning: case {!r} is in one run only".format(name))
+    changes = compare(old, new)
+    report(changes, threshold)
+    found = regressions(changes, threshold)
+    if found:
+        sys.exit("{} regressions over {:.0%}".format(len(found), threshold))
+
+
+if __name__ == "__main__":
+    main()
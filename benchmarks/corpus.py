@@ -0,0 +1,171 @@
+# Deterministic MEL documents for benchmarks. The same settings and seed
+# always give the same text.
+#
+#   python -m benchmarks.corpus [size] [seed] > document.mel
+#   python -m benchmarks.corpus page [size] [seed] > document.mel
+
+import os
+import random
+import sys
+
+from mel import tokens
+from mel.lexing import Lexer
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES = os.path.join(ROOT, "examples")
+
+# relative weights of each kind of literal value
+LITERALS = {
+    "int": 3,
+    "float": 1,
+    "string": 2,
+    "template": 1,
+    "boolean": 1,
+    "list": 1,
+}
+
+WORDS = [
+    "alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf",
+    "hotel", "india", "juliet", "kilo", "lima", "mike", "november",
+]
+
+
+# documents of about size characters, made of root objects nested depth
+# levels deep with width entries each. comments and references are the
+# share of lines ending in a comment and of values referencing an earlier
+# property
+def generate(size, depth=3, width=5, literals=None, comments=0.1,
+             references=0.1, seed=0):
+    generator = Generator(depth, width, literals or LITERALS, comments,
+                          references, seed)
+    return generator.document(size)
+
+
+class Generator:
+    def __init__(self, depth, width, literals, comments, references, seed):
+        self.depth = depth
+        self.width = width
+        self.kinds = list(literals)
+        self.weights = [literals[kind] for kind in self.kinds]
+        self.comments = comments
+        self.references = references
+        self.random = random.Random(seed)
+        # paths of the properties written so far, for references
+        self.paths = []
+
+    def document(self, size):
+        lines = []
+        length = 0
+        count = 0
+        while length < size:
+            count += 1
+            block = self.object("o{}".format(count), [], 0)
+            lines.extend(block)
+            length += sum(len(line) + 1 for line in block)
+        return "\n".join(lines) + "\n"
+
+    def object(self, key, path, level):
+        indent = "    " * level
+        path = path + [key]
+        lines = [self.line(indent + "(" + key)]
+        for index in range(1, self.width + 1):
+            name = "k{}".format(index)
+            # the first entry nests, so documents reach depth
+            nests = index == 1 or self.random.random() < 0.3
+            if level + 1 < self.depth and nests:
+                lines.extend(self.object(name, path, level + 1))
+            elif self.random.random() < 0.1:
+                lines.append(self.line(indent + "    #" + name))
+            else:
+                value = self.value()
+                lines.append(self.line(
+                    "{}    {} = {}".format(indent, name, value)
+                ))
+                self.paths.append("/".join(path + [name]))
+        lines.append(indent + ")")
+        return lines
+
+    def value(self):
+        if self.paths and self.random.random() < self.references:
+            return self.random.choice(self.paths)
+        kind = self.random.choices(self.kinds, self.weights)[0]
+        return self.literal(kind)
+
+    def literal(self, kind):
+        if kind == "int":
+            return str(self.random.randint(-1000, 100000))
+        if kind == "float":
+            return "{:.3f}".format(self.random.uniform(-100, 1000))
+        if kind == "string":
+            return "'{}'".format(self.words())
+        if kind == "template":
+            return '"{}"'.format(self.words())
+        if kind == "boolean":
+            return self.random.choice(["true", "false"])
+        items = [
+            self.literal(self.random.choice(["int", "string", "boolean"]))
+            for _ in range(self.random.randint(1, 5))
+        ]
+        return "[{}]".format(" ".join(items))
+
+    def words(self):
+        count = self.random.randint(1, 6)
+        return " ".join(self.random.choice(WORDS) for _ in range(count))
+
+    def line(self, text):
+        if self.random.random() < self.comments:
+            return "{}  -- {}".format(text, self.words())
+        return text
+
+
+# copies of an example from examples/ until size characters, with the
+# numbers and strings of each copy changed
+def grow(example, size, seed=0):
+    with open(os.path.join(EXAMPLES, example)) as file:
+        text = file.read()
+    generator = Generator(1, 1, LITERALS, 0, 0, seed)
+    lexed = Lexer(text).tokenize()
+    copies = []
+    length = 0
+    while length < size:
+        copy = _vary(text, lexed, generator)
+        copies.append(copy)
+        length += len(copy) + 1
+    return "\n".join(copies)
+
+
+def _vary(text, lexed, generator):
+    parts = []
+    end = 0
+    for token in lexed:
+        start, stop = token.index
+        parts.append(text[end:start])
+        if isinstance(token, tokens.IntToken):
+            parts.append(generator.literal("int"))
+        elif isinstance(token, tokens.StringToken):
+            parts.append(generator.literal("string"))
+        elif isinstance(token, tokens.TemplateStringToken):
+            parts.append(generator.literal("template"))
+        else:
+            parts.append(text[start:stop])
+        end = stop
+    parts.append(text[end:])
+    return "".join(parts)
+
+
+def main():
+    args = sys.argv[1:]
+    example = None
+    if args and not args[0].isdigit():
+        example = args.pop(0)
+    size = int(args[0]) if args else 10000
+    seed = int(args[1]) if len(args) > 1 else 0
+    if example is None:
+        sys.stdout.write(generate(size, seed=seed))
+    else:
+        sys.stdout.write(grow(example, size, seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Compares the streaming JSON writer with json.dumps(mel.eval(text)).
+#
+#   python -m benchmarks.json_writer [objects]
+
+import io
+import json
+import sys
+import time
+import tracemalloc
+
+import mel
+from mel.evaluation import evaluate
+from mel.rendering.json import dump
+from mel.utils import Context
+
+
+# discards the output, keeping only its size
+class Sink:
+    def __init__(self):
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text)
+
+
+def document(objects):
+    return "\n".join(
+        "(item #active id = {0} name = 'item {0}' "
+        "tags = [1 2 3] (size w = {0} h = 2.5))".format(index)
+        for index in range(objects)
+    )
+
+
+def measure(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    output = function()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return output, elapsed, peak
+
+
+def report(name, size, elapsed, peak):
+    print("{:<24} {:>8.3f}s {:>8.2f} MB/s {:>10.1f} KB peak".format(
+        name, elapsed, size / elapsed / 2 ** 20, peak / 1024
+    ))
+
+
+def main():
+    objects = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    text = document(objects)
+    context = Context()
+    context.tree = tree = mel.parse(text)
+    value = evaluate(tree, context)
+
+    def evaluate_and_dump():
+        return len(json.dumps(evaluate(tree, context)))
+
+    def stream(file):
+        dump(tree, file)
+        return file.size if isinstance(file, Sink) else len(file.getvalue())
+
+    cases = [
+        ("json.dumps(eval_result)", lambda: len(json.dumps(value))),
+        ("evaluate + json.dumps", evaluate_and_dump),
+        ("dump to StringIO", lambda: stream(io.StringIO())),
+        ("dump to sink", lambda: stream(Sink())),
+    ]
+    print("{} objects, {} bytes of source".format(objects, len(text)))
+    for name, function in cases:
+        size, elapsed, peak = measure(function)
+        report(name, size, elapsed, peak)
+
+
+if __name__ == "__main__":
+    main()
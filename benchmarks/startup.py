@@ -0,0 +1,49 @@
+# Measures the time of `import mel` with -X importtime, reporting the
+# slowest modules it imports.
+#
+#   python -m benchmarks.startup [runs]
+
+import os
+import statistics
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# cumulative microseconds of every module imported by statement
+def import_times(statement="import mel"):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    samples = [import_times() for _ in range(runs)]
+    totals = [sample["mel"] for sample in samples]
+    print("import mel: {:.1f} ms median of {} runs".format(
+        statistics.median(totals) / 1000, runs
+    ))
+    modules = {name for sample in samples for name in sample}
+    medians = {
+        name: statistics.median(sample.get(name, 0) for sample in samples)
+        for name in modules if name != "mel"
+    }
+    slowest = sorted(medians.items(), key=lambda item: -item[1])[:10]
+    for name, time in slowest:
+        print("  {:<32} {:>8.1f} ms".format(name, time / 1000))
+
+
+if __name__ == "__main__":
+    main()
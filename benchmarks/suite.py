@@ -0,0 +1,175 @@
+# Measures lexing, parsing and evaluation of generated documents, and
+# the peak memory of all three, saving the results as JSON for
+# benchmarks.compare.
+#
+#   python -m benchmarks.suite [-o results.json] [--size 20000]
+
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+from mel import nodes
+from mel.evaluation import evaluate
+from mel.lexing import TokenStream
+from mel.parsing import Parser
+from mel.utils import Context
+from benchmarks import corpus
+
+
+RESULTS_VERSION = 1
+PHASES = ["lex", "parse", "evaluate"]
+
+# corpus of each case, from its size and seed
+CASES = {
+    "mixed": lambda size, seed: corpus.generate(size, seed=seed),
+    "flat": lambda size, seed: corpus.generate(
+        size, depth=1, width=20, seed=seed
+    ),
+    "deep": lambda size, seed: corpus.generate(
+        size, depth=12, width=2, seed=seed
+    ),
+    "strings": lambda size, seed: corpus.generate(
+        size, literals={"string": 2, "template": 1}, seed=seed
+    ),
+    "comments": lambda size, seed: corpus.generate(
+        size, comments=0.8, seed=seed
+    ),
+    "references": lambda size, seed: corpus.generate(
+        size, references=0.5, seed=seed
+    ),
+    "page": lambda size, seed: corpus.grow("page", size, seed),
+    "person": lambda size, seed: corpus.grow("person", size, seed),
+}
+
+
+# inputs saved by benchmarks.worst, measured as they are
+REGRESSIONS = os.path.join(os.path.dirname(__file__), "regressions")
+
+
+def regressions(directory=REGRESSIONS):
+    texts = {}
+    if not os.path.isdir(directory):
+        return texts
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".mel"):
+            with open(os.path.join(directory, name)) as file:
+                texts[os.path.splitext(name)[0]] = file.read()
+    return texts
+
+
+# every case and regression when cases is empty
+def run(cases=None, size=20000, repeat=3, seed=0):
+    saved = regressions()
+    texts = {}
+    for name in cases or list(CASES) + list(saved):
+        texts[name] = saved[name] if name in saved else CASES[name](
+            size, seed
+        )
+    results = {}
+    for name, text in texts.items():
+        results[name] = measure(text, repeat)
+    return {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {"size": size, "repeat": repeat, "seed": seed},
+        "cases": results,
+    }
+
+
+# best time of each phase over repeat runs, and the peak memory of a
+# separate run, since tracing slows everything down
+def measure(text, repeat):
+    size = len(text.encode("utf-8"))
+    best = {phase: float("inf") for phase in PHASES}
+    for _ in range(repeat):
+        times, stream, tree = _run(text)
+        for phase in PHASES:
+            best[phase] = min(best[phase], times[phase])
+    count = sum(1 for _ in nodes.walk(tree))
+    tracemalloc.start()
+    _run(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {
+        "bytes": size,
+        "tokens": len(stream.tokens),
+        "nodes": count,
+        "peak_memory": peak,
+    }
+    for phase in PHASES:
+        seconds = best[phase]
+        result[phase] = {
+            "seconds": seconds,
+            "mb_per_second": size / seconds / 2 ** 20,
+            "nodes_per_second": count / seconds,
+        }
+    result["lex"]["tokens_per_second"] = len(stream.tokens) / best["lex"]
+    return result
+
+
+def _run(text):
+    times = {}
+    start = time.perf_counter()
+    stream = TokenStream(text)
+    times["lex"] = time.perf_counter() - start
+    start = time.perf_counter()
+    tree = Parser(stream).parse()
+    times["parse"] = time.perf_counter() - start
+    context = Context()
+    context.tree = tree
+    context.text = text
+    start = time.perf_counter()
+    evaluate(tree, context)
+    times["evaluate"] = time.perf_counter() - start
+    return times, stream, tree
+
+
+def report(results):
+    print("{:<16} {:>9} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+        "case", "KB", "lex MB/s", "parse MB/s", "eval MB/s",
+        "parse n/s", "peak KB"
+    ))
+    for name, case in results["cases"].items():
+        print("{:<16} {:>9.1f} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.0f} "
+              "{:>10.1f}".format(
+                  name, case["bytes"] / 1024,
+                  case["lex"]["mb_per_second"],
+                  case["parse"]["mb_per_second"],
+                  case["evaluate"]["mb_per_second"],
+                  case["parse"]["nodes_per_second"],
+                  case["peak_memory"] / 1024,
+              ))
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    parser.add_argument("cases", nargs="*",
+                        help="cases to run, all of them by default")
+    parser.add_argument("-o", "--output", help="JSON file of the results")
+    parser.add_argument("--size", type=int, default=20000,
+                        help="characters of each document")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs of each case, the best one counts")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    known = list(CASES) + list(regressions())
+    unknown = sorted(set(args.cases) - set(known))
+    if unknown:
+        parser.error("unknown cases {}, choose from {}".format(
+            ", ".join(unknown), ", ".join(known)
+        ))
+    results = run(args.cases, args.size, args.repeat, args.seed)
+    report(results)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=1, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
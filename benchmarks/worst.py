@@ -0,0 +1,223 @@
+# Searches for the inputs the parser works hardest on, mutating the
+# documents of examples/ and the strings of tests/. An input's score is
+# the tokens the parser visited plus the backtracks it made, per token.
+# The worst inputs found are shrunk and saved to benchmarks/regressions,
+# where benchmarks.suite measures them.
+#
+#   python -m benchmarks.worst [iterations] [seed] [saved]
+
+import ast
+import collections
+import hashlib
+import os
+import random
+import sys
+import time
+
+from mel.diagnostics.tracing import TracingTokenStream
+from mel.exceptions import LimitError, ParsingError
+from mel.lexing import Lexer
+from mel.limits import Limits
+from mel.parsing import Parser
+from benchmarks.corpus import EXAMPLES, ROOT
+from benchmarks.suite import REGRESSIONS
+
+
+TESTS = os.path.join(ROOT, "tests")
+
+MAX_SIZE = 256
+MIN_TOKENS = 8
+POPULATION = 32
+# seconds before a parse is given up, its work so far still counts
+TIMEOUT = 2
+
+# inserted by mutations
+FRAGMENTS = [
+    "(", ")", "[", "]", "=", "/", "#", "@", "$", "%", "?", ":", "..",
+    "a", "b", "A", "1", "2.5", "true", "'s'", '"t"', "a/b", "a = 1",
+    "(a)", "[1]", "#a", "(a b)", "a/b/c",
+]
+
+
+Cost = collections.namedtuple(
+    "Cost", ["score", "visits", "backtracks", "tokens", "seconds"]
+)
+
+
+# None when text doesn't lex. Parse errors count as work
+def cost(text, timeout=TIMEOUT):
+    try:
+        stream = TracingTokenStream(text, limits=Limits(timeout=timeout))
+    except (ParsingError, LimitError):
+        return None
+    start = time.perf_counter()
+    try:
+        Parser(stream).parse()
+    except (ParsingError, LimitError):
+        pass
+    seconds = time.perf_counter() - start
+    visits = sum(stream.visits)
+    backtracks = sum(stream.restores)
+    tokens = len(stream.tokens)
+    score = (visits + backtracks) / max(tokens, MIN_TOKENS)
+    return Cost(score, visits, backtracks, tokens, seconds)
+
+
+def seeds():
+    texts = set()
+    for name in sorted(os.listdir(EXAMPLES)):
+        with open(os.path.join(EXAMPLES, name)) as file:
+            texts.add(file.read())
+    for name in sorted(os.listdir(TESTS)):
+        if not name.endswith(".py"):
+            continue
+        with open(os.path.join(TESTS, name)) as file:
+            tree = ast.parse(file.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and \
+                    isinstance(node.value, str) and node.value.strip():
+                texts.add(node.value)
+    return sorted(
+        text for text in texts
+        if len(text) <= MAX_SIZE and _spans(text) is not None
+    )
+
+
+# (start, end) of each token of text, None when it doesn't lex
+def _spans(text):
+    try:
+        return [token.index for token in Lexer(text).tokenize()]
+    except ParsingError:
+        return None
+
+
+# evolves the inputs of corpus, the seeds of examples/ and tests/ unless
+# given
+class Search:
+    def __init__(self, seed=0, max_size=MAX_SIZE, corpus=None):
+        self.random = random.Random(seed)
+        self.max_size = max_size
+        self.corpus = seeds() if corpus is None else corpus
+        self.population = []
+        self.seen = set()
+        for text in self.corpus:
+            self.add(text)
+
+    # keeps text when it's among the worst inputs found
+    def add(self, text):
+        if text in self.seen or len(text) > self.max_size:
+            return False
+        self.seen.add(text)
+        found = cost(text)
+        if found is None:
+            return False
+        if len(self.population) >= POPULATION:
+            if found.score <= self.population[-1][0].score:
+                return False
+            self.population.pop()
+        self.population.append((found, text))
+        self.population.sort(key=lambda entry: -entry[0].score)
+        return True
+
+    def run(self, iterations):
+        for _ in range(iterations):
+            self.add(self.mutate(self.pick()))
+        return self.population
+
+    # the worst of three random inputs
+    def pick(self):
+        entries = self.random.sample(
+            self.population, min(3, len(self.population))
+        )
+        return min(entries, key=lambda entry: -entry[0].score)[1]
+
+    def mutate(self, text):
+        spans = _spans(text) or [(0, 0)]
+        start = self.random.randrange(len(spans))
+        end = min(len(spans), start + self.random.randint(1, 4)) - 1
+        head, tail = spans[start][0], spans[end][1]
+        run = text[head:tail]
+        choice = self.random.randrange(6)
+        if choice == 0:
+            middle = ""
+        elif choice == 1:
+            middle = " ".join([run] * self.random.randint(2, 4))
+        elif choice == 2:
+            fragment = self.random.choice(FRAGMENTS)
+            middle = "{} {}".format(fragment, run)
+        elif choice == 3:
+            middle = "(a {})".format(run)
+        elif choice == 4:
+            middle = "[{}]".format(run)
+        else:
+            other = self.random.choice(self.corpus)
+            other_spans = _spans(other) or [(0, 0)]
+            first = self.random.randrange(len(other_spans))
+            last = min(len(other_spans), first + 4) - 1
+            middle = other[other_spans[first][0]:other_spans[last][1]]
+        return "{} {} {}".format(
+            text[:head], middle, text[tail:]
+        ).strip()
+
+
+# removes token runs from text, largest first, while its score doesn't
+# drop below the score it started with. Tokens end up one space apart
+def shrink(text):
+    target = cost(text).score
+    size = len(_spans(text))
+    while size:
+        index = 0
+        while True:
+            spans = _spans(text)
+            if index >= len(spans):
+                break
+            last = min(len(spans), index + size) - 1
+            candidate = (
+                text[:spans[index][0]] + " " + text[spans[last][1]:]
+            ).strip()
+            found = cost(candidate) if candidate else None
+            if found is not None and found.score >= target:
+                text = candidate
+            else:
+                index += size
+        size //= 2
+    return " ".join(text[start:end] for start, end in _spans(text))
+
+
+def save(text, found, directory=REGRESSIONS):
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:8]
+    path = os.path.join(directory, "worst-{}.mel".format(digest))
+    header = "-- {:.1f} visits and backtracks per token, {} tokens\n".format(
+        found.score, found.tokens
+    )
+    with open(path, "w") as file:
+        file.write(header + text + "\n")
+    return path
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    saved = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    search = Search(seed)
+    print("{} seeds".format(len(search.corpus)))
+    search.run(iterations)
+    # reproducers differing only in literal values are the same one
+    kinds = set()
+    for found, text in search.population:
+        if len(kinds) >= saved:
+            break
+        small = shrink(text)
+        kind = tuple(type(token) for token in Lexer(small).tokenize())
+        if kind not in kinds:
+            kinds.add(kind)
+            found = cost(small)
+            path = save(small, found)
+            print("{:>8.1f} per token {:>6} tokens {:>10.6f}s  {}".format(
+                found.score, found.tokens, found.seconds, path
+            ))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,101 @@
+import importlib
+import os
+
+from mel import parsing
 from mel.lexing import TokenStream
 from mel.parsing import Parser
 
 from mel.utils import Context
+from mel.evaluation import evaluate
 from mel.exceptions import MelError, ParsingError
 from mel.exceptions.formatting import ErrorFormatter
 
 
-def lex(text):
+# submodules imported on first use, keeping `import mel` quick
+LAZY_MODULES = frozenset(["compiling", "rendering"])
+
+
+def __getattr__(name):
+    if name in LAZY_MODULES:
+        return importlib.import_module("mel." + name)
+    raise AttributeError("module 'mel' has no attribute {!r}".format(name))
+
+
+def lex(text, limits=None):
     try:
-        return TokenStream(text)
+        return TokenStream(text, limits=limits)
     except ParsingError as error:
         message = ErrorFormatter(error).format()
         raise MelError(message)
 
 
-def create_parser(text, Parser=Parser):
-    stream = lex(text)
+def create_parser(text, Parser=Parser, limits=None):
+    stream = lex(text, limits)
     return Parser(stream)
 
 
-def parse(text, Parser=Parser):
+# limits bound the work of parsing text, raising a LimitError when it
+# goes past them. Trees found in cache aren't parsed again. The cache is
+# keyed by text alone, so other parsers than the default don't use it
+def parse(text, Parser=Parser, cache=None, limits=None):
+    if cache is not None and Parser is parsing.Parser:
+        return cache.fetch(
+            text, lambda text: parse(text, Parser, limits=limits)
+        )
     try:
-        return create_parser(text, Parser).parse()
+        return create_parser(text, Parser, limits).parse()
     except ParsingError as error:
         message = ErrorFormatter(error).format()
         raise MelError(message)
 
 
-def eval(text, context=Context()):
+# parses a file, loading its compiled tree from __melcache__ when fresh.
+# Changed files are looked up by content in parse_cache before parsing
+def parse_file(path, cache=True, parse_cache=None, limits=None):
+    from mel import compiling
+    if cache:
+        tree = compiling.read_cache(path)
+        if tree is not None:
+            return tree
+    with open(path, "r") as file:
+        stat = os.fstat(file.fileno())
+        text = file.read()
+    if cache:
+        tree = compiling.read_cache(path, text, stat)
+        if tree is not None:
+            return tree
+    tree = parse(text, cache=parse_cache, limits=limits)
+    if cache:
+        compiling.write_cache(path, tree, stat)
+    return tree
+
+
+# limits bound the parsing of text, as they do for parse
+def eval(text, context=None, limits=None):
+    context = Context() if context is None else context
     try:
-        tree = parse(text)
+        tree = parse(text, limits=limits)
         context.tree = tree
         context.text = text
-        return tree
+        return evaluate(tree, context)
     except MelError as error:
         raise error
+
+
+def render(text, file, _format=None):
+    from mel import rendering
+    tree = parse(text)
+    rendering.render(tree, file, _format)
+
+
+# what bin/mel prints for a tree: the tree rendered in _format or in the
+# format it sets with (%: format), or else its evaluated value
+def show(tree, file, _format=None, path=None):
+    from mel import rendering
+    if _format is None and rendering.default_format(tree) is None:
+        context = Context()
+        context.tree = tree
+        context.path = path
+        file.write(str(evaluate(tree, context)))
+        return
+    rendering.render(tree, file, _format, path=path)
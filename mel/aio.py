@@ -0,0 +1,144 @@
+import asyncio
+import codecs
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import mel
+from .exceptions import BusyError, MelError
+
+
+DEFAULT_LIMIT = 4
+STREAM_CHUNK = 64 * 1024
+
+
+# runs parsing and evaluation on an executor, off the event loop. At most
+# `limit` jobs are sent to the executor at once and at most `max_waiting`
+# more wait for their turn; callers beyond that get a BusyError.
+# Threads share the GIL with the loop, so a process executor keeps the
+# loop responsive while large documents are parsed.
+# Cancelled or timed out jobs are dropped if they haven't started. Jobs
+# already running can't be interrupted and keep their slot until done,
+# unless the limits given to parse bound their time
+class Runner:
+    def __init__(self, executor=None, limit=DEFAULT_LIMIT, max_waiting=None,
+                 timeout=None):
+        self.executor = executor
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._waiting = 0
+
+    async def run(self, function, *args, timeout=None):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphore(loop)
+        if semaphore.locked() and self._is_full():
+            raise BusyError("Too many jobs waiting to run")
+        self._waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            job = self._executor().submit(function, *args)
+        except BaseException:
+            semaphore.release()
+            raise
+        job.add_done_callback(functools.partial(_release, loop, semaphore))
+        timeout = self.timeout if timeout is None else timeout
+        return await asyncio.wait_for(asyncio.wrap_future(job), timeout)
+
+    def shutdown(self, wait=True):
+        if self.executor is not None:
+            self.executor.shutdown(wait)
+
+    def _executor(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.limit)
+        return self.executor
+
+    # semaphores belong to one event loop
+    def _semaphore(self, loop):
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.limit)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    def _is_full(self):
+        return self.max_waiting is not None and \
+            self._waiting >= self.max_waiting
+
+
+def _release(loop, semaphore, job):
+    try:
+        loop.call_soon_threadsafe(semaphore.release)
+    except RuntimeError:
+        pass
+
+
+_runner = Runner()
+
+
+def configure(executor=None, limit=DEFAULT_LIMIT, max_waiting=None,
+              timeout=None):
+    global _runner
+    _runner = Runner(executor, limit, max_waiting, timeout)
+    return _runner
+
+
+def get_runner():
+    return _runner
+
+
+# API =============================================
+
+async def parse(text, timeout=None, runner=None, limits=None):
+    runner = runner or _runner
+    job = functools.partial(mel.parse, text, limits=limits)
+    return await runner.run(job, timeout=timeout)
+
+
+async def eval(text, timeout=None, runner=None, limits=None):
+    runner = runner or _runner
+    job = functools.partial(mel.eval, text, limits=limits)
+    return await runner.run(job, timeout=timeout)
+
+
+async def parse_file(path, timeout=None, runner=None, limits=None):
+    runner = runner or _runner
+    job = functools.partial(_parse_file, path, limits=limits)
+    return await runner.run(job, timeout=timeout)
+
+
+# trees loaded from __melcache__ read the mapped cache file as they are
+# walked, so they are built whole in the worker before leaving it
+def _parse_file(path, limits=None):
+    from mel import compiling
+    return compiling.materialize(mel.parse_file(path, limits=limits))
+
+
+# reads a document from a StreamReader chunk by chunk, leaving the
+# transport's flow control to slow down the sender, and parses it on
+# the runner once the stream ends. The parser needs the whole text, so
+# only reading is incremental
+async def parse_stream(reader, encoding="utf-8", max_size=None,
+                       timeout=None, runner=None, limits=None):
+    text = await read_stream(reader, encoding, max_size)
+    return await parse(text, timeout, runner, limits)
+
+
+async def read_stream(reader, encoding="utf-8", max_size=None):
+    decoder = codecs.getincrementaldecoder(encoding)()
+    parts = []
+    size = 0
+    while True:
+        chunk = await reader.read(STREAM_CHUNK)
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            message = "Document over {} bytes".format(max_size)
+            raise MelError(message)
+        parts.append(decoder.decode(chunk, final=not chunk))
+        if not chunk:
+            return "".join(parts)
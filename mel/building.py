@@ -0,0 +1,400 @@
+import collections
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
+
+import mel
+from . import compiling, nodes, rendering
+from .exceptions import MelError, ParsingError
+from .importing import Importer, import_paths
+from .parsing.constants import GRAMMAR_VERSION
+from .rendering.base import DEFAULT_FORMAT, default_format
+from .templating import compile_template
+from .utils import Environment
+from .utils.files import signature, source_files
+
+
+DEFAULT_OUTPUT = "_build"
+MANIFEST = ".mel-build.json"
+MANIFEST_VERSION = 2
+
+
+BuildResult = collections.namedtuple(
+    "BuildResult", ["built", "unchanged", "removed", "errors"]
+)
+
+
+# builds every file of a directory into output. A file is rebuilt when
+# it or a file it depends on changed: one defining a name it references
+# or one it imports. A manifest of content hashes keeps the others from
+# being parsed or rendered again. Files are parsed and rendered by a pool
+# of jobs processes, each file parsed once per build. A file is rendered
+# on its own: names of other files are only read through @import
+class Project:
+    def __init__(self, directory, output=None, _format=None, jobs=None,
+                 cache=True):
+        self.directory = os.path.abspath(directory)
+        self.output = os.path.abspath(
+            output or os.path.join(self.directory, DEFAULT_OUTPUT)
+        )
+        self.format = _format
+        self.jobs = jobs
+        self.cache = cache
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.output, MANIFEST)
+
+    def build(self):
+        previous = self._read_manifest()
+        files = self._scan(previous)
+        errors = {}
+        with self._executor() as executor:
+            built = self._analyze(executor, files, errors)
+            graph = dependencies(files)
+            keys = input_keys(files, graph)
+            stale = set()
+            for path, entry in files.items():
+                entry["input"] = keys[path]
+                if self._is_stale(previous.get(path), entry):
+                    stale.add(path)
+            pending = stale - set(built) - set(errors)
+            built += self._render(executor, files, pending, errors)
+        for path in built:
+            self._remove_output(previous.get(path), files[path])
+        removed = sorted(set(previous) - set(files) - set(errors))
+        for path in removed:
+            self._remove_output(previous[path])
+        self._prune_cache(set(files) | set(removed))
+        self._write_manifest({
+            path: entry for path, entry in files.items()
+            if path not in errors
+        })
+        unchanged = len(files) - len(built) - len(stale & set(errors))
+        return BuildResult(len(built), unchanged, len(removed), errors)
+
+    # manifest entries of the sources, by path relative to the directory.
+    # Files are only read when their size or modification time changed
+    def _scan(self, previous):
+        files = {}
+        for source in source_files(self.directory, [self.output]):
+            path = os.path.relpath(source, self.directory)
+            stat = os.stat(source)
+            entry = dict(previous.get(path, {}))
+            current = list(signature(stat))
+            if entry.get("signature") != current:
+                with open(source, "rb") as file:
+                    digest = hashlib.sha256(file.read()).hexdigest()
+                if entry.get("hash") != digest:
+                    entry = {"hash": digest}
+                entry["signature"] = current
+            files[path] = entry
+        return files
+
+    # names defined and referenced by new or changed files, and the
+    # files they import. Those files are stale whatever they depend on,
+    # so they are rendered from the same tree, returning the built ones
+    def _analyze(self, executor, files, errors):
+        futures = {
+            executor.submit(
+                build_file, self.directory, self.output, path,
+                self.format, self.cache
+            ): path
+            for path, entry in files.items() if "defines" not in entry
+        }
+        built = []
+        for future in concurrent.futures.as_completed(futures):
+            path = futures[future]
+            try:
+                analysis, rendered, message = future.result()
+            except (MelError, OSError) as error:
+                errors[path] = str(error)
+                del files[path]
+                continue
+            defines, references, imports = analysis
+            files[path]["defines"] = defines
+            files[path]["references"] = references
+            files[path]["imports"] = sorted(
+                os.path.relpath(target, self.directory) for target in imports
+            )
+            if message is not None:
+                errors[path] = message
+            else:
+                files[path]["output"] = rendered
+                built.append(path)
+        return built
+
+    # renders stale files in any order, as imports are read from their
+    # sources rather than from built output
+    def _render(self, executor, files, stale, errors):
+        futures = {
+            executor.submit(
+                render_file, self.directory, self.output, path,
+                self.format, self.cache
+            ): path
+            for path in sorted(stale)
+        }
+        built = []
+        for future in concurrent.futures.as_completed(futures):
+            path = futures[future]
+            try:
+                files[path]["output"] = future.result()
+                built.append(path)
+            except (MelError, OSError) as error:
+                errors[path] = str(error)
+        return built
+
+    def _is_stale(self, old, entry):
+        if not old or old.get("input") != entry["input"]:
+            return True
+        return not os.path.exists(self._target(old["output"]))
+
+    def _executor(self):
+        if self.jobs == 1:
+            return InlineExecutor()
+        return concurrent.futures.ProcessPoolExecutor(self.jobs)
+
+    def _target(self, output):
+        return os.path.join(self.output, output)
+
+    def _remove_output(self, old, new=None):
+        if not old or "output" not in old:
+            return
+        if new is not None and new.get("output") == old["output"]:
+            return
+        try:
+            os.unlink(self._target(old["output"]))
+        except OSError:
+            pass
+
+    # compiled trees of removed sources, left in their __melcache__
+    def _prune_cache(self, paths):
+        directories = {os.path.dirname(path) for path in paths}
+        for directory in directories:
+            compiling.prune_cache(os.path.join(self.directory, directory))
+
+    # manifests of other grammars, formats or layouts start over
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, "r") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("settings") != self._settings():
+            return {}
+        return manifest.get("files", {})
+
+    def _write_manifest(self, files):
+        os.makedirs(self.output, exist_ok=True)
+        manifest = {"settings": self._settings(), "files": files}
+        data = json.dumps(manifest, indent=1, sort_keys=True)
+        compiling.write_atomic(self.manifest_path, data.encode("utf-8"))
+
+    def _settings(self):
+        return {
+            "version": MANIFEST_VERSION,
+            "grammar": GRAMMAR_VERSION,
+            "format": self.format,
+        }
+
+
+# runs submitted calls right away, for builds without a process pool
+class InlineExecutor(concurrent.futures.Executor):
+    def submit(self, function, *args, **kwargs):
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(function(*args, **kwargs))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+# WORKERS =============================================
+
+def analyze_file(source, cache=True):
+    return analyze(mel.parse_file(source, cache), source)
+
+
+def analyze(tree, source):
+    imports = import_paths(tree, os.path.dirname(source))
+    return sorted(definitions(tree)), sorted(references(tree)), imports
+
+
+# analyzes a file and renders it from the same tree. Other files need the
+# names of a file that doesn't render, so its error is returned with them
+def build_file(directory, output, path, _format=None, cache=True):
+    source = os.path.join(directory, path)
+    tree = mel.parse_file(source, cache)
+    try:
+        rendered = write_output(
+            tree, directory, output, path, _format, cache
+        )
+    except (MelError, OSError) as error:
+        return analyze(tree, source), None, str(error)
+    return analyze(tree, source), rendered, None
+
+
+def render_file(directory, output, path, _format=None, cache=True):
+    tree = mel.parse_file(os.path.join(directory, path), cache)
+    return write_output(tree, directory, output, path, _format, cache)
+
+
+# renders the tree of a file into output, returning the rendered file's
+# path relative to output. Its extension is the format it was rendered
+# with
+def write_output(tree, directory, output, path, _format=None, cache=True):
+    _format = _format or default_format(tree) or DEFAULT_FORMAT
+    file = io.StringIO()
+    rendering.render(
+        tree, file, _format, path=os.path.join(directory, path),
+        environment=Environment(importer=_importer(directory, cache))
+    )
+    rendered = "{}.{}".format(path, _format)
+    target = os.path.join(output, rendered)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    compiling.write_atomic(target, file.getvalue().encode("utf-8"))
+    return rendered
+
+
+# importers of this process, by project directory and cache setting.
+# Projects import documents from under their directory
+_importers = {}
+
+
+def _importer(directory, cache):
+    key = directory, cache
+    if key not in _importers:
+        _importers[key] = Importer(cache=cache, root=directory)
+    return _importers[key]
+
+
+# REFERENCES =============================================
+
+# names a tree's root scope answers to, like "Category" in
+# "(Category ...)" or "title" in "title = 'x'"
+def definitions(tree):
+    names = set()
+    for node in tree:
+        if isinstance(node, nodes.ObjectNode):
+            path = node.key
+        elif isinstance(node, nodes.EqualNode):
+            path = node.path
+        else:
+            continue
+        if isinstance(path, nodes.PathNode) and len(path) == 1:
+            names.add(str(path[0]))
+    return names
+
+
+# names the references of a tree start from, template strings included
+def references(tree):
+    names = set()
+    for node in nodes.walk(tree):
+        if isinstance(node, nodes.ReferenceNode):
+            heads = [node[0]]
+        elif isinstance(node, nodes.TemplateStringNode):
+            heads = _template_heads(node.value)
+        else:
+            continue
+        names.update(
+            str(head) for head in heads if isinstance(head, nodes.KeywordNode)
+        )
+    return names
+
+
+def _template_heads(source):
+    try:
+        template = compile_template(source)
+    except ParsingError:
+        return []
+    return [reference[0] for _, reference in template.slots]
+
+
+# GRAPH =============================================
+
+# the files a file imports, and the ones defining the names it references
+# but doesn't define
+def dependencies(files):
+    definers = collections.defaultdict(set)
+    for path, entry in files.items():
+        for name in entry["defines"]:
+            definers[name].add(path)
+    graph = {}
+    for path, entry in files.items():
+        defined = set(entry["defines"])
+        found = {
+            dependency
+            for name in entry["references"] if name not in defined
+            for dependency in definers.get(name, ())
+        }
+        found.update(
+            target for target in entry.get("imports", ()) if target in files
+        )
+        found.discard(path)
+        graph[path] = sorted(found)
+    return graph
+
+
+# hashes of each file's content and of the inputs of its dependencies.
+# Files of a cycle share theirs
+def input_keys(files, graph):
+    keys = {}
+    for members in components(graph):
+        digest = hashlib.sha256()
+        for path in members:
+            digest.update(files[path]["hash"].encode("ascii"))
+        inputs = {
+            keys[dependency]
+            for path in members for dependency in graph[path]
+            if dependency not in members
+        }
+        for key in sorted(inputs):
+            digest.update(key.encode("ascii"))
+        for path in members:
+            keys[path] = digest.hexdigest()
+    return keys
+
+
+# strongly connected components of graph, each one after the components
+# it depends on (Tarjan's algorithm, without recursion)
+def components(graph):
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    found = []
+    for root in sorted(graph):
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(graph[root]))]
+        while work:
+            node, edges = work[-1]
+            for edge in edges:
+                if edge not in index:
+                    index[edge] = low[edge] = len(index)
+                    stack.append(edge)
+                    on_stack.add(edge)
+                    work.append((edge, iter(graph[edge])))
+                    break
+                if edge in on_stack:
+                    low[node] = min(low[node], index[edge])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    members = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        members.append(member)
+                        if member == node:
+                            break
+                    found.append(sorted(members))
+    return found
@@ -0,0 +1,602 @@
+import array
+import collections
+import hashlib
+import itertools
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+from . import nodes
+from .parsing.constants import GRAMMAR_VERSION
+from .utils.cache import CacheInfo
+
+
+# Compiled trees (.melc) are laid out as:
+#
+#   header | source text | string offsets | node columns | child indexes
+#          | field columns | string data
+#
+# Nodes are numbered breadth first, so children always come after their
+# parents. Node kinds, field names, strings and floats live in the string
+# table. Every column is an array of the narrowest integer type holding
+# its values, with its type code kept in the header. Nodes store how many
+# children and fields they have; where those start is summed on loading
+
+MAGIC = b"MELC"
+FORMAT_VERSION = 2
+CACHE_DIR = "__melcache__"
+EXTENSION = ".melc"
+
+NODE_COLUMNS = ["kinds", "starts", "ends", "child_counts", "field_counts"]
+FIELD_COLUMNS = ["names", "tags", "payloads"]
+COLUMNS = NODE_COLUMNS + ["children"] + FIELD_COLUMNS
+SIGNED_COLUMNS = frozenset(["payloads"])
+
+HEADER = struct.Struct("<4sHH32sQQIIIII{}s".format(len(COLUMNS) + 1))
+# the source mtime and size in the header
+SIGNATURE = struct.Struct("<QQ")
+SIGNATURE_OFFSET = struct.calcsize("<4sHH32s")
+UNSIGNED_TYPES = "BHIQ"
+SIGNED_TYPES = "bhiq"
+
+# field value tags
+NONE, NODE, INT, FLOAT, STRING, TRUE, FALSE, BIG_INT = range(8)
+
+# node attributes that aren't fields
+STRUCTURE = frozenset(["text", "index", "_subnodes"])
+
+Header = collections.namedtuple("Header", [
+    "magic", "format_version", "grammar_version", "source_hash",
+    "source_mtime", "source_size", "text_size", "strings",
+    "nodes", "children", "fields", "typecodes",
+])
+
+
+def source_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+# DUMP =============================================
+
+def dumps(root, mtime=0, size=0):
+    text = root.text
+    encoded = text.encode("utf-8")
+    digest = source_hash(text)
+    strings = _StringTable()
+    string_numbers = strings.numbers
+    kinds, starts, ends = [], [], []
+    child_counts, field_counts = [], []
+    children, names, tags, payloads = [], [], [], []
+    kind_numbers = {}
+    order = [root]
+    numbers = {id(root): 0}
+    # hot loop - methods are bound once and values packed inline
+    for node in order:
+        attributes = node.__dict__
+        cls = type(node)
+        kind = kind_numbers.get(cls)
+        if kind is None:
+            kind = kind_numbers[cls] = strings.add(cls.__name__)
+        kinds.append(kind)
+        start, end = node.index
+        starts.append(start)
+        ends.append(end)
+        subnodes = attributes.get("_subnodes", ())
+        child_counts.append(len(subnodes))
+        for subnode in subnodes:
+            child = numbers.get(id(subnode))
+            if child is None:
+                child = numbers[id(subnode)] = len(order)
+                order.append(subnode)
+            children.append(child)
+        count = 0
+        for name, value in attributes.items():
+            if name in STRUCTURE:
+                continue
+            count += 1
+            name_number = string_numbers.get(name)
+            if name_number is None:
+                name_number = strings.add(name)
+            names.append(name_number)
+            if isinstance(value, nodes.Node):
+                target = numbers.get(id(value))
+                if target is None:
+                    target = numbers[id(value)] = len(order)
+                    order.append(value)
+                tags.append(NODE)
+                payloads.append(target)
+            else:
+                tag, payload = _pack_value(value, strings)
+                tags.append(tag)
+                payloads.append(payload)
+        field_counts.append(count)
+
+    columns = [
+        kinds, starts, ends, child_counts, field_counts, children, names,
+        tags, payloads
+    ]
+    arrays = [_array(strings.offsets(), UNSIGNED_TYPES)]
+    for name, values in zip(COLUMNS, columns):
+        types = SIGNED_TYPES if name in SIGNED_COLUMNS else UNSIGNED_TYPES
+        arrays.append(_array(values, types))
+    typecodes = "".join(column.typecode for column in arrays)
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, GRAMMAR_VERSION, digest,
+        mtime, size, len(encoded), len(strings), len(order),
+        len(children), len(names), typecodes.encode("ascii")
+    )
+    sections = [header, encoded]
+    sections.extend(_bytes(column) for column in arrays)
+    sections.append(strings.data())
+    return b"".join(sections)
+
+
+class _StringTable:
+    def __init__(self):
+        self.numbers = {}
+        self._encoded = []
+
+    def __len__(self):
+        return len(self._encoded)
+
+    def add(self, string):
+        if string not in self.numbers:
+            self.numbers[string] = len(self._encoded)
+            self._encoded.append(string.encode("utf-8"))
+        return self.numbers[string]
+
+    def offsets(self):
+        offsets = [0]
+        for encoded in self._encoded:
+            offsets.append(offsets[-1] + len(encoded))
+        return offsets
+
+    def data(self):
+        return b"".join(self._encoded)
+
+
+def _pack_value(value, strings):
+    if value is None:
+        return NONE, 0
+    if isinstance(value, str):
+        return STRING, strings.add(value)
+    if isinstance(value, bool):
+        return (TRUE if value else FALSE), 0
+    if isinstance(value, int):
+        if -2 ** 63 <= value < 2 ** 63:
+            return INT, value
+        return BIG_INT, strings.add(str(value))
+    if isinstance(value, float):
+        return FLOAT, strings.add(repr(value))
+    raise TypeError("Can't compile {!r}".format(value))
+
+
+# the narrowest array of the given type codes holding every value
+def _array(values, types):
+    low = min(values, default=0)
+    high = max(values, default=0)
+    for typecode in types:
+        bits = 8 * array.array(typecode).itemsize
+        if typecode.isupper():
+            low_bound, high_bound = 0, 2 ** bits
+        else:
+            low_bound, high_bound = -2 ** (bits - 1), 2 ** (bits - 1)
+        if low_bound <= low and high < high_bound:
+            return array.array(typecode, values)
+    raise OverflowError("Can't compile {!r}".format(high))
+
+
+def _bytes(column):
+    if sys.byteorder == "big":
+        column = array.array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+# LOAD =============================================
+
+def read_header(buffer):
+    header = Header(*HEADER.unpack_from(buffer, 0))
+    if header.magic != MAGIC or header.format_version != FORMAT_VERSION:
+        raise ValueError("Not a compiled MEL tree")
+    return header
+
+
+# reads nodes from a compiled buffer. Lazy readers build each node the
+# first time it is reached, with subnodes read on demand
+class Reader:
+    def __init__(self, buffer, lazy=True):
+        self.lazy = lazy
+        self.buffer = memoryview(buffer)
+        self.header = header = read_header(self.buffer)
+        offset = HEADER.size + header.text_size
+        self.text = str(self.buffer[HEADER.size:offset], "utf-8")
+        sizes = [header.strings + 1] + [header.nodes] * len(NODE_COLUMNS)
+        sizes += [header.children] + [header.fields] * len(FIELD_COLUMNS)
+        typecodes = header.typecodes.decode("ascii")
+        names = ["string_offsets"] + COLUMNS
+        for name, typecode, size in zip(names, typecodes, sizes):
+            end = offset + array.array(typecode).itemsize * size
+            column = _column(self.buffer[offset:end], typecode)
+            setattr(self, "_" + name, column)
+            offset = end
+        self._data = self.buffer[offset:]
+        self._first_children = _starts(self._child_counts)
+        self._first_fields = _starts(self._field_counts)
+        self._strings = {}
+        self._nodes = {}
+        self._classes = {}
+
+    def root(self):
+        return self.node(0)
+
+    # frees the views on the buffer, so it can be closed. Nodes not built
+    # yet can't be read afterwards
+    def release(self):
+        for name in ["_string_offsets", "_data"] + ["_" + n for n in COLUMNS]:
+            column = getattr(self, name)
+            if isinstance(column, memoryview):
+                column.release()
+        self.buffer.release()
+
+    def node(self, number):
+        node = self._nodes.get(number)
+        if node is None:
+            node = self._build(number)
+        return node
+
+    # children are numbered after their parents, so building nodes from
+    # the last one reads the whole tree in a single pass
+    def load_all(self):
+        built = [None] * self.header.nodes
+        text = self.text
+        container = nodes.ContainerNode
+        node_class = self._node_class
+        string = self.string
+        value_of = self._value
+        kinds, starts, ends = self._kinds, self._starts, self._ends
+        first_children, child_counts = self._first_children, self._child_counts
+        first_fields, field_counts = self._first_fields, self._field_counts
+        children, names = self._children, self._names
+        tags, payloads = self._tags, self._payloads
+        for number in reversed(range(len(built))):
+            cls = node_class(kinds[number])
+            node = built[number] = cls.__new__(cls)
+            attributes = node.__dict__
+            attributes["text"] = text
+            attributes["index"] = starts[number], ends[number]
+            if issubclass(cls, container):
+                first = first_children[number]
+                attributes["_subnodes"] = [
+                    built[child]
+                    for child in children[first:first + child_counts[number]]
+                ]
+            first = first_fields[number]
+            for field in range(first, first + field_counts[number]):
+                tag = tags[field]
+                if tag == NODE:
+                    value = built[payloads[field]]
+                else:
+                    value = value_of(tag, payloads[field])
+                attributes[string(names[field])] = value
+        self._nodes = dict(enumerate(built))
+        return self.root()
+
+    def string(self, number):
+        string = self._strings.get(number)
+        if string is None:
+            start = self._string_offsets[number]
+            end = self._string_offsets[number + 1]
+            string = str(self._data[start:end], "utf-8")
+            self._strings[number] = string
+        return string
+
+    def child(self, position):
+        return self.node(self._children[position])
+
+    def _build(self, number):
+        cls = self._node_class(self._kinds[number])
+        node = cls.__new__(cls)
+        self._nodes[number] = node
+        node.text = self.text
+        node.index = self._starts[number], self._ends[number]
+        if issubclass(cls, nodes.ContainerNode):
+            first = self._first_children[number]
+            count = self._child_counts[number]
+            if self.lazy:
+                node._subnodes = LazyNodes(self, first, count)
+            else:
+                children = self._children[first:first + count]
+                node._subnodes = [self.node(child) for child in children]
+        first = self._first_fields[number]
+        for field in range(first, first + self._field_counts[number]):
+            value = self._value(self._tags[field], self._payloads[field])
+            setattr(node, self.string(self._names[field]), value)
+        return node
+
+    def _node_class(self, kind):
+        cls = self._classes.get(kind)
+        if cls is None:
+            cls = getattr(nodes, self.string(kind))
+            self._classes[kind] = cls
+        return cls
+
+    def _value(self, tag, payload):
+        if tag == NODE:
+            return self.node(payload)
+        if tag == INT:
+            return payload
+        if tag == STRING:
+            return self.string(payload)
+        if tag == FLOAT:
+            return float(self.string(payload))
+        if tag == BIG_INT:
+            return int(self.string(payload))
+        return {NONE: None, TRUE: True, FALSE: False}[tag]
+
+
+# where the items counted by each node start
+def _starts(counts):
+    return [0, *itertools.accumulate(counts)]
+
+
+def _column(view, typecode):
+    if sys.byteorder == "little":
+        return view.cast(typecode)
+    column = array.array(typecode, bytes(view))
+    column.byteswap()
+    return column
+
+
+# subnodes of a compiled container, read as they are reached. Adding
+# nodes loads them all into a plain list, as do pickle and deepcopy, as
+# the reader's views on the buffer can't be copied
+class LazyNodes:
+    def __init__(self, reader, first, count):
+        self._reader = reader
+        self._first = first
+        self._count = count
+        self._loaded = None
+
+    def __len__(self):
+        if self._loaded is not None:
+            return len(self._loaded)
+        return self._count
+
+    def __iter__(self):
+        if self._loaded is not None:
+            return iter(self._loaded)
+        return (self[position] for position in range(self._count))
+
+    def __getitem__(self, index):
+        if self._loaded is not None:
+            return self._loaded[index]
+        if isinstance(index, slice):
+            return [self[i] for i in range(self._count)[index]]
+        position = range(self._count)[index]
+        return self._reader.child(self._first + position)
+
+    def append(self, node):
+        if self._loaded is None:
+            self._loaded = list(self)
+        self._loaded.append(node)
+
+    def __reduce__(self):
+        return list, (), None, iter(self)
+
+
+# builds every node of a lazily loaded tree, so threads can share it
+def materialize(tree):
+    for node in nodes.walk(tree):
+        subnodes = node.__dict__.get("_subnodes")
+        if isinstance(subnodes, LazyNodes):
+            node._subnodes = list(subnodes)
+    return tree
+
+
+def loads(buffer, lazy=False):
+    reader = Reader(buffer, lazy)
+    return reader.root() if lazy else reader.load_all()
+
+
+def load_file(path, lazy=True):
+    return loads(_map_file(path), lazy)
+
+
+def _map_file(path):
+    with open(path, "rb") as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# CACHE FILES =============================================
+
+def cache_path(path):
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, CACHE_DIR, name + EXTENSION)
+
+
+# removes the cache files of a directory whose sources are gone
+def prune_cache(directory):
+    try:
+        entries = list(os.scandir(os.path.join(directory, CACHE_DIR)))
+    except OSError:
+        return
+    for entry in entries:
+        name = entry.name
+        if not name.endswith(EXTENSION):
+            continue
+        if os.path.exists(os.path.join(directory, name[:-len(EXTENSION)])):
+            continue
+        try:
+            os.unlink(entry.path)
+        except OSError:
+            pass
+
+
+# the compiled tree of path, if its cache file is fresh. Given the text
+# of path, and its stat from before it was read, a cache file of the same
+# text is fresh too, and takes the new mtime so it isn't hashed again
+def read_cache(path, text=None, stat=None):
+    try:
+        stat = stat or os.stat(path)
+        reader = Reader(_map_file(cache_path(path)))
+    except (OSError, ValueError, struct.error):
+        return
+    header = reader.header
+    if header.grammar_version != GRAMMAR_VERSION:
+        return
+    if (header.source_mtime, header.source_size) == _signature(stat):
+        return reader.root()
+    if text is not None and header.source_hash == source_hash(text):
+        _write_signature(cache_path(path), stat)
+        return reader.root()
+
+
+# readers only compare the signature, so it's written in place
+def _write_signature(path, stat):
+    try:
+        with open(path, "r+b") as file:
+            file.seek(SIGNATURE_OFFSET)
+            file.write(SIGNATURE.pack(*_signature(stat)))
+    except OSError:
+        pass
+
+
+# stat is the one of path before its text was read, so a file changed
+# since then looks stale rather than fresh
+def write_cache(path, tree, stat=None):
+    try:
+        mtime, size = _signature(stat or os.stat(path))
+        target = cache_path(path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        write_atomic(target, dumps(tree, mtime, size))
+    except OSError:
+        return False
+    return True
+
+
+def write_atomic(path, data):
+    directory = os.path.dirname(path)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _signature(stat):
+    return stat.st_mtime_ns, stat.st_size
+
+
+# PARSE CACHE =============================================
+
+# compiled trees stored by the hash of their source, shared by every
+# file with the same content. The least recently used trees are removed
+# once the directory grows past maxsize bytes
+class ParseCache:
+    def __init__(self, directory, maxsize=256 * 1024 * 1024):
+        self.directory = directory
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+
+    def path(self, text):
+        digest = source_hash(text).hex()
+        name = "{}.g{}.f{}{}".format(
+            digest[2:], GRAMMAR_VERSION, FORMAT_VERSION, EXTENSION
+        )
+        return os.path.join(self.directory, digest[:2], name)
+
+    def get(self, text):
+        path = self.path(text)
+        try:
+            reader = Reader(_map_file(path))
+        except (OSError, ValueError, struct.error):
+            self.misses += 1
+            return
+        if reader.header.source_hash != source_hash(text):
+            self.misses += 1
+            return
+        self.hits += 1
+        _touch(path)
+        return reader.root()
+
+    def set(self, text, tree):
+        path = self.path(text)
+        data = dumps(tree)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomic(path, data)
+        except OSError:
+            return
+        if self._size is None:
+            self._size = sum(size for _, _, size in self._entries())
+        else:
+            self._size += len(data)
+        if self._size > self.maxsize:
+            self.evict()
+
+    def fetch(self, text, parse):
+        tree = self.get(text)
+        if tree is None:
+            tree = parse(text)
+            self.set(text, tree)
+        return tree
+
+    def evict(self):
+        entries = sorted(self._entries())
+        size = sum(entry_size for _, _, entry_size in entries)
+        for _, path, entry_size in entries:
+            if size <= self.maxsize:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            size -= entry_size
+        self._size = size
+
+    def info(self):
+        size = sum(entry_size for _, _, entry_size in self._entries())
+        return CacheInfo(self.hits, self.misses, self.maxsize, size)
+
+    # (last use, path, size) of every stored tree
+    def _entries(self):
+        try:
+            shards = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            try:
+                entries = list(os.scandir(shard.path))
+            except OSError:
+                continue
+            for entry in entries:
+                if not entry.name.endswith(EXTENSION):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                yield stat.st_mtime_ns, entry.path, stat.st_size
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME")
+    base = base or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "mel")
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
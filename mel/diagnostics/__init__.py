@@ -0,0 +1,3 @@
+from .tracing import Heatmap, Span, TracingTokenStream, heatmap  # noqa
+from .profiling import Profiler, RuleStats, profile  # noqa
+from .memory import MemoryReport, Usage, memory_report  # noqa
@@ -0,0 +1,34 @@
+from ..lexing import TokenStream
+from ..parsing import Parser
+from ..parsing.base import ParserMap
+
+
+# records what parsers do through subclasses of the parser classes, made
+# on demand with the Mixin of the recorder. Parsing without a recorder
+# runs the original classes and pays nothing for it
+class Instrument:
+    Mixin = None
+
+    def __init__(self):
+        self._classes = {}
+
+    def parse(self, text, Parser=Parser):
+        parser = self.instrument(Parser)(TokenStream(text))
+        return parser.parse()
+
+    def instrument(self, cls):
+        if cls not in self._classes:
+            bases = self.Mixin, cls
+            self._classes[cls] = type(cls.__name__, bases, {"recorder": self})
+        return self._classes[cls]
+
+
+# base of the mixins, keeping the subparsers instrumented too
+class Instrumented:
+    recorder = None
+
+    def _get_parser(self, _id, stream):
+        if _id not in self.subparsers:
+            Parser = self.recorder.instrument(ParserMap.get(_id))
+            self.subparsers[_id] = Parser(stream, subparsers=self.subparsers)
+        return self.subparsers[_id]
@@ -0,0 +1,191 @@
+import collections
+import sys
+import tracemalloc
+
+from .. import nodes
+from ..lexing import TokenStream
+from ..parsing import Parser
+from .instrumenting import Instrument, Instrumented
+
+
+Usage = collections.namedtuple("Usage", ["count", "bytes"])
+
+
+# where the memory of a parsed document goes. Sizes by class come from
+# sys.getsizeof over each object and what only it holds, counting shared
+# objects once and the source text apart. Traced sizes are the growth
+# tracemalloc saw while lexing and parsing, and the peak of both
+class MemoryReport:
+    def __init__(self):
+        self.source_chars = 0
+        self.source_bytes = 0
+        self.encoded_bytes = 0
+        # objects holding the source text, keeping all of it alive
+        self.source_references = 0
+        self.tokens = {}
+        self.nodes = {}
+        # lists returned by parse_zero_many and dropped once added to nodes
+        self.lists = Usage(0, 0)
+        self.traced_tokens = 0
+        self.traced_tree = 0
+        self.traced_peak = 0
+
+    @property
+    def token_bytes(self):
+        return sum(usage.bytes for usage in self.tokens.values())
+
+    @property
+    def node_bytes(self):
+        return sum(usage.bytes for usage in self.nodes.values())
+
+    # bytes kept by a parsed tree per byte of source
+    @property
+    def tree_ratio(self):
+        return (self.node_bytes + self.source_bytes) / \
+            max(self.encoded_bytes, 1)
+
+    def format(self):
+        lines = [
+            "source: {} chars, {} bytes encoded, {} bytes in memory, "
+            "held by {} objects".format(
+                self.source_chars, self.encoded_bytes, self.source_bytes,
+                self.source_references
+            ),
+            "tree: {:.1f} bytes per source byte, tokens {:.1f} more".format(
+                self.tree_ratio,
+                self.token_bytes / max(self.encoded_bytes, 1)
+            ),
+            "traced: tokens {}, tree {}, peak {} bytes".format(
+                self.traced_tokens, self.traced_tree, self.traced_peak
+            ),
+            "intermediate lists: {} lists, {} bytes".format(*self.lists),
+        ]
+        for title, usages in (("tokens", self.tokens), ("nodes", self.nodes)):
+            lines.append("")
+            lines.append(_table(title, usages))
+        return "\n".join(lines)
+
+
+def _table(title, usages):
+    rows = [[title, "count", "bytes"]]
+    total = Usage(0, 0)
+    ranked = sorted(usages.items(), key=lambda item: -item[1].bytes)
+    for name, usage in ranked:
+        rows.append([name, str(usage.count), str(usage.bytes)])
+        total = Usage(total.count + usage.count, total.bytes + usage.bytes)
+    rows.append(["total", str(total.count), str(total.bytes)])
+    widths = [max(len(row[column]) for row in rows) for column in range(3)]
+    return "\n".join(
+        "  ".join([
+            row[0].ljust(widths[0]), row[1].rjust(widths[1]),
+            row[2].rjust(widths[2])
+        ])
+        for row in rows
+    )
+
+
+# sizes the lists parse_zero_many returns before they are dropped
+class ListRecorder(Instrument):
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+        self.bytes = 0
+
+    def record(self, result):
+        self.count += 1
+        self.bytes += sys.getsizeof(result)
+        return result
+
+
+class ListRecording(Instrumented):
+    def parse_zero_many(self, rule):
+        return self.recorder.record(super().parse_zero_many(rule))
+
+    def parse_zero_many_alternative(self, *rules):
+        result = super().parse_zero_many_alternative(*rules)
+        return self.recorder.record(result)
+
+
+ListRecorder.Mixin = ListRecording
+
+
+# the document is parsed once, by a parser recording its lists. Recording
+# keeps two counters, so it adds next to nothing to the traced sizes
+def memory_report(text, Parser=Parser):
+    report = MemoryReport()
+    recorder = ListRecorder()
+    RecordingParser = recorder.instrument(Parser)
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        stream = TokenStream(text)
+        lexed = tracemalloc.get_traced_memory()[0]
+        tree = RecordingParser(stream).parse()
+        parsed, report.traced_peak = tracemalloc.get_traced_memory()
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    report.traced_tokens = lexed - start
+    report.traced_tree = parsed - lexed
+    report.lists = Usage(recorder.count, recorder.bytes)
+    report.source_chars = len(text)
+    report.source_bytes = sys.getsizeof(text)
+    report.encoded_bytes = len(text.encode("utf-8"))
+    seen = {id(text)}
+    report.tokens = _usages(stream.tokens, seen)
+    tree_nodes = list(nodes.walk(tree))
+    report.nodes = _usages(tree_nodes, seen)
+    report.source_references = sum(
+        1 for item in stream.tokens + tree_nodes
+        if getattr(item, "text", None) is text
+    )
+    return report
+
+
+def _usages(objects, seen):
+    counts = collections.Counter()
+    sizes = collections.Counter()
+    for item in objects:
+        name = type(item).__name__
+        counts[name] += 1
+        sizes[name] += _own_size(item, seen)
+    return {name: Usage(counts[name], sizes[name]) for name in counts}
+
+
+# the size of an object, its attributes dict and the attribute values
+# nobody else holds yet. Nodes are sized apart, so they aren't followed.
+# Slots are part of the object's own size, only their values are added.
+# Dicts sharing their keys with other instances don't count the keys
+def _own_size(item, seen):
+    size = sys.getsizeof(item)
+    seen.add(id(item))
+    stack = _slot_values(item)
+    if hasattr(item, "__dict__"):
+        size += sys.getsizeof(item.__dict__)
+        stack.extend(vars(item).values())
+    while stack:
+        value = stack.pop()
+        if id(value) in seen or isinstance(value, nodes.Node):
+            continue
+        seen.add(id(value))
+        size += sys.getsizeof(value)
+        if isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return size
+
+
+def _slot_values(item):
+    values = []
+    for cls in type(item).__mro__:
+        slots = cls.__dict__.get("__slots__", ())
+        for name in [slots] if isinstance(slots, str) else slots:
+            if name in ("__dict__", "__weakref__"):
+                continue
+            try:
+                values.append(getattr(item, name))
+            except AttributeError:
+                pass
+    return values
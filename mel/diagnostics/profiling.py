@@ -0,0 +1,146 @@
+import collections
+import time
+
+from ..exceptions import ParsingError
+from ..parsing import Parser
+from .instrumenting import Instrument, Instrumented
+
+
+COLUMNS = [
+    "rule", "attempts", "successes", "failures", "backtracks", "tokens",
+    "total ms", "self ms",
+]
+
+
+# counters of one grammar rule. Failures are attempts rolled back by
+# read_rule, backtracks the alternatives that failed before one of the
+# rule's parse_alternative calls matched or gave up
+class RuleStats:
+    __slots__ = [
+        "attempts", "successes", "failures", "backtracks", "tokens",
+        "total_time", "self_time",
+    ]
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def __repr__(self):
+        fields = ", ".join(
+            "{}={}".format(name, getattr(self, name))
+            for name in self.__slots__
+        )
+        return "RuleStats({})".format(fields)
+
+
+class Profiled(Instrumented):
+    def read_rule(self, rule):
+        read = super().read_rule
+        return self.recorder.measure(rule, self.stream, lambda: read(rule))
+
+    def parse_alternative(self, *rules):
+        choose = super().parse_alternative
+        return self.recorder.backtracks(self.id, lambda: choose(*rules))
+
+
+# records time and token counts per grammar rule. Times are in
+# nanoseconds, and the total time of recursive rules counts their
+# outermost attempts only
+class Profiler(Instrument):
+    Mixin = Profiled
+
+    def __init__(self):
+        super().__init__()
+        self.rules = collections.defaultdict(RuleStats)
+        # self time of each chain of rules, for flame graphs
+        self.stacks = collections.Counter()
+        self._frames = []
+        self._active = collections.Counter()
+
+    def measure(self, rule, stream, read):
+        stats = self.rules[rule]
+        stats.attempts += 1
+        self._active[rule] += 1
+        # rule, time spent in subrules, subrules failed
+        frame = [rule, 0, 0]
+        self._frames.append(frame)
+        index = stream.save()
+        start = time.perf_counter_ns()
+        try:
+            node = read()
+        except ParsingError:
+            stats.failures += 1
+            if len(self._frames) > 1:
+                self._frames[-2][2] += 1
+            raise
+        else:
+            stats.successes += 1
+            stats.tokens += stream.save() - index
+            return node
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            self._active[rule] -= 1
+            if not self._active[rule]:
+                stats.total_time += elapsed
+            stats.self_time += elapsed - frame[1]
+            stack = ";".join(rule for rule, _, _ in self._frames)
+            self.stacks[stack] += elapsed - frame[1]
+            self._frames.pop()
+            if self._frames:
+                self._frames[-1][1] += elapsed
+
+    def backtracks(self, rule, choose):
+        frame = self._frames[-1] if self._frames else [rule, 0, 0]
+        failed = frame[2]
+        try:
+            return choose()
+        finally:
+            self.rules[rule].backtracks += frame[2] - failed
+
+    # rows of COLUMNS, the rules with the most self time first
+    def table(self):
+        rows = []
+        ranked = sorted(
+            self.rules.items(), key=lambda item: item[1].self_time,
+            reverse=True
+        )
+        for rule, stats in ranked:
+            rows.append([
+                rule, stats.attempts, stats.successes, stats.failures,
+                stats.backtracks, stats.tokens,
+                stats.total_time / 1e6, stats.self_time / 1e6,
+            ])
+        return rows
+
+    def format_table(self):
+        rows = [COLUMNS] + [
+            [
+                "{:.3f}".format(value) if isinstance(value, float)
+                else str(value)
+                for value in row
+            ]
+            for row in self.table()
+        ]
+        widths = [max(len(row[column]) for row in rows)
+                  for column in range(len(COLUMNS))]
+        lines = []
+        for row in rows:
+            cells = [row[0].ljust(widths[0])] + [
+                cell.rjust(width) for cell, width in zip(row[1:], widths[1:])
+            ]
+            lines.append("  ".join(cells))
+        return "\n".join(lines)
+
+    # "root;expression;object 1200" lines, self time in microseconds, as
+    # read by flamegraph.pl and speedscope
+    def collapsed(self):
+        return "\n".join(
+            "{} {}".format(stack, time_ns // 1000)
+            for stack, time_ns in sorted(self.stacks.items())
+        )
+
+
+def profile(text, Parser=Parser):
+    profiler = Profiler()
+    profiler.parse(text, Parser)
+    return profiler
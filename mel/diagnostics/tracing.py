@@ -0,0 +1,142 @@
+import collections
+
+from ..exceptions import ParsingError
+from ..lexing import Lexer, TokenStream
+from ..parsing import Parser
+
+
+# marks from cold to hot, one per token character
+SHADES = " .:-=+*#%@"
+
+
+Span = collections.namedtuple(
+    "Span", ["start", "end", "line", "column", "visits", "reads", "restores"]
+)
+
+
+# a token stream counting, per token index, how many times the parser
+# looked at the token, consumed it and restored the stream to it
+class TracingTokenStream(TokenStream):
+    def __init__(self, text, Lexer=Lexer, limits=None):
+        super().__init__(text, Lexer, limits)
+        self.visits = [0] * len(self.tokens)
+        self.reads = [0] * len(self.tokens)
+        self.restores = [0] * len(self.tokens)
+
+    def restore(self, index):
+        if index != self.index and index < len(self.restores):
+            self.restores[index] += 1
+        super().restore(index)
+
+    def read(self, token=None):
+        index = self.index
+        current = super().read(token)
+        if index < len(self.reads):
+            self.reads[index] += 1
+        return current
+
+    def peek(self, offset=0):
+        index = self.index + offset
+        if 0 <= index < len(self.visits):
+            self.visits[index] += 1
+        return super().peek(offset)
+
+
+# where a parse spent its token visits. Tokens read more than once were
+# parsed again after a rule backtracked past them
+class Heatmap:
+    def __init__(self, stream, error=None):
+        self.stream = stream
+        self.error = error
+
+    @property
+    def tokens(self):
+        return self.stream.tokens
+
+    @property
+    def rereads(self):
+        return sum(max(reads - 1, 0) for reads in self.stream.reads)
+
+    # runs of neighbour tokens with the same counts. The ones read the
+    # most come first, as parsing them again is what backtracking costs
+    def spans(self, limit=10):
+        stream = self.stream
+        runs = []
+        for index, token in enumerate(self.tokens):
+            counts = (
+                stream.visits[index], stream.reads[index],
+                stream.restores[index]
+            )
+            if runs and runs[-1][1] == counts:
+                runs[-1][0].append(token)
+            else:
+                runs.append(([token], counts))
+        spans = [
+            Span(
+                run[0].index[0], run[-1].index[1], run[0].line,
+                run[0].column, *counts
+            )
+            for run, counts in runs
+        ]
+        spans.sort(key=lambda span: (-span.reads, -span.visits, span.start))
+        return spans[:limit]
+
+    # the source with a line of SHADES under each line's tokens, scaled to
+    # the most visited token. Lines start with their most visits
+    def format(self):
+        text = self.stream.text
+        lines = text.splitlines()
+        hottest = max(self.stream.visits, default=0) or 1
+        heat = [0] * len(lines)
+        marks = [[] for _ in lines]
+        for index, token in enumerate(self.tokens):
+            if token.line >= len(lines):
+                continue
+            visits = self.stream.visits[index]
+            heat[token.line] = max(heat[token.line], visits)
+            shade = SHADES[(len(SHADES) - 1) * visits // hottest]
+            end = len(lines[token.line])
+            length = min(len(token), end - token.column)
+            marks[token.line].append((token.column, shade * length))
+        digits = len(str(len(lines)))
+        width = len(str(max(heat, default=0)))
+        output = []
+        for number, line in enumerate(lines):
+            prefix = "{} | {} | ".format(
+                str(number + 1).zfill(digits), str(heat[number]).rjust(width)
+            )
+            output.append(prefix + line)
+            if marks[number]:
+                output.append(" " * len(prefix) + _marks(marks[number]))
+        return "\n".join(output)
+
+    def format_spans(self, limit=10):
+        text = self.stream.text
+        lines = []
+        for span in self.spans(limit):
+            snippet = text[span.start:span.end].splitlines()[0][:40]
+            lines.append(
+                "line {}, column {}: {} visits, {} reads, {} restores "
+                "{!r}".format(
+                    span.line + 1, span.column + 1, span.visits, span.reads,
+                    span.restores, snippet
+                )
+            )
+        return "\n".join(lines)
+
+
+def _marks(marks):
+    line = ""
+    for column, shade in marks:
+        line = line.ljust(column) + shade
+    return line.rstrip()
+
+
+# the heatmap of parsing text, kept with the error when the parse fails
+def heatmap(text, Parser=Parser):
+    stream = TracingTokenStream(text)
+    try:
+        Parser(stream).parse()
+    except ParsingError as error:
+        return Heatmap(stream, error)
+    return Heatmap(stream)
@@ -0,0 +1,337 @@
+from . import importing, metrics, nodes
+from .exceptions import EvaluationError, MelError, ParsingError
+from .exceptions.formatting import ErrorFormatter
+from .resolving import enclosing_scopes, fans_out, link_parents
+from .templating import compile_template
+from .tokens import Token
+
+
+# key holding the values of an object that aren't named
+VALUES_KEY = ":"
+
+
+# decorator - register evaluator classes in EvaluatorMap
+def evaluator(cls):
+    EvaluatorMap.set(cls)
+    return cls
+
+
+# references evaluator instances by the node class they evaluate
+class EvaluatorMap:
+    _map = {}
+
+    @classmethod
+    def set(cls, _evaluator):
+        cls._map[_evaluator.Node] = _evaluator()
+
+    @classmethod
+    def table(cls):
+        return dict(cls._map)
+
+
+# EVALUATION =============================================
+
+# walks a tree without recursion, evaluating the dependencies of a node
+# before building its value. Values are memoized by node identity, so
+# subtrees reached many times through references are evaluated once
+class Evaluation:
+    def __init__(self, context, resolver=None, parents=None):
+        self.context = context
+        if resolver is None:
+            resolver, parents = importing.scope(context.tree, context)
+        self.resolver = resolver
+        self.memo = {}
+        self.parents = parents
+        self.plans = {}
+
+    def run(self, root):
+        self.parents.update(link_parents(root))
+        memo = self.memo
+        active = set()
+        stack = [(root, None)]
+        while stack:
+            node, dependencies = stack[-1]
+            key = id(node)
+            if key in memo:
+                stack.pop()
+                continue
+            _evaluator = self.dispatch(node)
+            if dependencies is None:
+                dependencies = _evaluator.expand(node, self)
+                stack[-1] = node, dependencies
+                active.add(key)
+                self._push(stack, active, node, dependencies)
+                continue
+            stack.pop()
+            active.discard(key)
+            values = [memo[id(dependency)] for dependency in dependencies]
+            memo[key] = _evaluator.build(node, values, self)
+        return memo[id(root)]
+
+    def resolve(self, reference, origin):
+        scopes = enclosing_scopes(self.parents, origin)
+        selection = self.resolver.resolve(reference, scopes)
+        if selection is None:
+            return []
+        if fans_out(reference):
+            return list(selection)
+        return [selection]
+
+    def dispatch(self, node):
+        table = self.context.evaluators
+        cls = type(node)
+        try:
+            return table[cls]
+        except KeyError:
+            pass
+        for base in cls.__mro__[1:]:
+            if base in table:
+                table[cls] = table[base]
+                return table[cls]
+        raise EvaluationError("No evaluator for {!r}".format(node))
+
+    def _push(self, stack, active, node, dependencies):
+        for dependency in reversed(dependencies):
+            key = id(dependency)
+            if key in self.memo:
+                continue
+            if key in active:
+                message = "Circular reference in {!r}".format(node)
+                raise EvaluationError(message)
+            stack.append((dependency, None))
+
+
+def evaluate(tree, context):
+    started = metrics.start()
+    try:
+        value = Evaluation(context).run(tree)
+    except MelError as error:
+        metrics.error(error)
+        raise error
+    if started is not None:
+        metrics.evaluated(started)
+    return value
+
+
+# BASE EVALUATOR =============================================
+
+class BaseEvaluator:
+    Node = None
+
+    def expand(self, node, evaluation):
+        return ()
+
+    def build(self, node, values, evaluation):
+        return str(node)
+
+
+# STRUCTS =============================================
+
+@evaluator
+class RootEvaluator(BaseEvaluator):
+    Node = nodes.RootNode
+
+    def expand(self, node, evaluation):
+        return list(node)
+
+    def build(self, node, values, evaluation):
+        return _struct(node, values)
+
+
+@evaluator
+class ObjectEvaluator(RootEvaluator):
+    Node = nodes.ObjectNode
+
+    # a cached struct is read once and kept for build, as the entry may be
+    # evicted before then, by another thread or its TTL. A miss is stored
+    # by build without a second lookup, so it is counted once
+    def expand(self, node, evaluation):
+        key = node.cache_key
+        if key is not None:
+            cached = evaluation.context.cache.get(key)
+            if cached is not None:
+                evaluation.plans[id(node)] = cached
+                return ()
+        return list(node)
+
+    def build(self, node, values, evaluation):
+        key = node.cache_key
+        if key is None:
+            return _struct(node, values)
+        if id(node) in evaluation.plans:
+            return evaluation.plans.pop(id(node))
+        value = _struct(node, values)
+        evaluation.context.cache.set(key, value)
+        return value
+
+
+# imports only bring names into scope, so they aren't part of the value
+def _struct(node, values):
+    struct = {}
+    groups = set()
+    for subnode, value in zip(node, values):
+        if importing.is_import(subnode):
+            continue
+        if isinstance(subnode, nodes.EqualNode):
+            struct[str(subnode.path)] = value
+        elif isinstance(subnode, nodes.RelationNode):
+            constraints = struct.setdefault(str(subnode.path), {})
+            if isinstance(constraints, dict):
+                constraints[subnode.sign] = value
+        elif isinstance(subnode, nodes.TagKeywordNode):
+            struct[str(subnode)] = value
+        elif _is_named(subnode):
+            _add(struct, groups, str(subnode.key), value)
+        else:
+            struct.setdefault(VALUES_KEY, []).append(value)
+    return struct
+
+
+# objects sharing a key are gathered in a list
+def _add(struct, groups, key, value):
+    if key not in struct:
+        struct[key] = value
+    elif key in groups:
+        struct[key].append(value)
+    else:
+        struct[key] = [struct[key], value]
+        groups.add(key)
+
+
+def _is_named(node):
+    if not isinstance(node, nodes.ObjectNode):
+        return False
+    return not isinstance(node.key, nodes.AnonymKeyNode)
+
+
+@evaluator
+class RelationEvaluator(BaseEvaluator):
+    Node = nodes.RelationNode
+
+    def expand(self, node, evaluation):
+        return [node.value]
+
+    def build(self, node, values, evaluation):
+        return values[0]
+
+
+# VALUES =============================================
+
+@evaluator
+class ListEvaluator(BaseEvaluator):
+    Node = nodes.ListNode
+
+    def expand(self, node, evaluation):
+        return list(node)
+
+    def build(self, node, values, evaluation):
+        return values
+
+
+@evaluator
+class ReferenceEvaluator(BaseEvaluator):
+    Node = nodes.ReferenceNode
+
+    def expand(self, node, evaluation):
+        return evaluation.resolve(node, node)
+
+    def build(self, node, values, evaluation):
+        return _reference_value(node, values)
+
+
+def _reference_value(reference, values):
+    if fans_out(reference):
+        return values
+    return values[0] if values else None
+
+
+@evaluator
+class LiteralEvaluator(BaseEvaluator):
+    Node = nodes.LiteralNode
+
+    def build(self, node, values, evaluation):
+        return node.value
+
+
+@evaluator
+class TemplateStringEvaluator(BaseEvaluator):
+    Node = nodes.TemplateStringNode
+
+    # slots are resolved from the template's own scope, as compiled
+    # references are shared by every template with the same source. A
+    # slot naming nothing is an error, like a slot that isn't a reference
+    def expand(self, node, evaluation):
+        template = _compile(node)
+        plan = []
+        targets = []
+        for (_, reference), offset in zip(template.slots, template.offsets):
+            slot_targets = evaluation.resolve(reference, node)
+            if not slot_targets and not fans_out(reference):
+                raise _template_error(
+                    node, offset,
+                    "Undefined reference {{{}}} in template string".format(
+                        reference
+                    )
+                )
+            plan.append(len(slot_targets))
+            targets.extend(slot_targets)
+        evaluation.plans[id(node)] = plan
+        return targets
+
+    def build(self, node, values, evaluation):
+        template = _compile(node)
+        sizes = iter(evaluation.plans.pop(id(node)))
+        position = 0
+
+        def render_slot(reference):
+            nonlocal position
+            start, position = position, position + next(sizes)
+            value = _reference_value(reference, values[start:position])
+            return to_text(value)
+
+        return template.render(render_slot)
+
+
+def _compile(node):
+    try:
+        return compile_template(node.value)
+    except ParsingError as error:
+        raise _template_error(
+            node, error.index, "Invalid reference in template string"
+        )
+
+
+# an error at offset in a template string's value, pointed at in its
+# document. The value is the source between the quotes, unescaped
+def _template_error(node, offset, message):
+    index = node.index[0] + 1 + offset
+    text = node.text
+    token = Token(text, (index, index))
+    token.line = text.count("\n", 0, index)
+    token.column = index - text.rfind("\n", 0, index) - 1
+    formatter = ErrorFormatter(ParsingError(token, message))
+    return EvaluationError(formatter.format())
+
+
+@evaluator
+class TagEvaluator(BaseEvaluator):
+    Node = nodes.TagKeywordNode
+
+    def build(self, node, values, evaluation):
+        return True
+
+
+@evaluator
+class NodeEvaluator(BaseEvaluator):
+    Node = nodes.Node
+
+
+# evaluated values as they are written in text
+def to_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, list):
+        return " ".join(to_text(item) for item in value)
+    return str(value)
@@ -3,9 +3,26 @@ class MelError(Exception):
 
 
 class ParsingError(MelError):
-    def __init__(self, token):
-        super().__init__()
+    def __init__(self, token, message=""):
+        super().__init__(message)
         self.text = token.text
         self.index = token.index[0]
         self.line = token.line
         self.column = token.column
+
+
+class EvaluationError(MelError):
+    pass
+
+
+class BusyError(MelError):
+    pass
+
+
+# a parse went past one of its limits or was cancelled. limit names the
+# limit, stats the work done until then
+class LimitError(MelError):
+    def __init__(self, message, limit, stats=None):
+        super().__init__(message)
+        self.limit = limit
+        self.stats = stats or {}
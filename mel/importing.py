@@ -0,0 +1,145 @@
+import collections
+import os
+import threading
+
+import mel
+from . import metrics, nodes
+from .exceptions import EvaluationError, MelError
+from .resolving import ReferenceResolver, link_parents
+from .utils.cache import Cache
+
+
+# "(@import 'base' 'shared/colors')" makes the names defined by other
+# documents visible to references. Paths are relative to the importing
+# document, or to the working directory when it has no path. Absolute
+# paths and paths going up with ".." must stay under the importer's root,
+# or else under the directory of the document being evaluated
+IMPORT_KEY = "@import"
+
+
+# a parsed document shared by every document importing it
+class Module:
+    def __init__(self, path, tree):
+        self.path = path
+        self.tree = tree
+        self.parents = link_parents(tree)
+        self.imports = import_paths(tree, os.path.dirname(path))
+
+
+# parses imported documents at most once, keeping their modules by path,
+# modification time and size. Modules aren't copied into the importing
+# trees, so one module serves every document importing it. Documents are
+# imported from under root, when it's given
+class Importer:
+    def __init__(self, maxsize=1024, cache=True, parse_cache=None,
+                 root=None):
+        self.modules = Cache(maxsize=maxsize)
+        self.cache = cache
+        self.parse_cache = parse_cache
+        self.root = root
+
+    def load(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            raise EvaluationError("Can't import {!r}".format(path))
+        key = path, stat.st_mtime_ns, stat.st_size
+        return self.modules.fetch(key, lambda: self._load(path))
+
+    # the modules a tree imports and the ones they import, depth first,
+    # in the order their names are looked up
+    def imports(self, tree, path=None):
+        found = {}
+        chain = ()
+        directory = os.getcwd()
+        if path is not None:
+            chain = (os.path.abspath(path),)
+            directory = os.path.dirname(chain[0])
+        root = os.path.abspath(self.root or directory)
+        self._collect(import_paths(tree, directory), chain, found, root)
+        return list(found.values())
+
+    # walks imports with a stack of the paths left in each importing
+    # document, as chains of imports may be longer than recursion allows
+    def _collect(self, paths, chain, found, root):
+        stack = [(iter(paths), chain)]
+        while stack:
+            remaining, chain = stack[-1]
+            path = next(remaining, None)
+            if path is None:
+                stack.pop()
+                continue
+            if path in chain:
+                cycle = " -> ".join(chain + (path,))
+                raise EvaluationError("Circular import: {}".format(cycle))
+            if path in found:
+                continue
+            self._check(path, root)
+            module = found[path] = self.load(path)
+            stack.append((iter(module.imports), chain + (path,)))
+
+    def _check(self, path, root):
+        if os.path.commonpath([root, path]) != root:
+            raise EvaluationError(
+                "Can't import {!r} from outside of {!r}".format(path, root)
+            )
+
+    def _load(self, path):
+        try:
+            tree = mel.parse_file(path, self.cache, self.parse_cache)
+        except OSError:
+            raise EvaluationError("Can't import {!r}".format(path))
+        except MelError as error:
+            raise EvaluationError("In {!r}: {}".format(path, error))
+        return Module(path, tree)
+
+
+_importer = None
+_importer_lock = threading.Lock()
+
+
+# the importer of environments that don't bring their own, shared by the
+# whole process
+def default_importer():
+    global _importer
+    if _importer is None:
+        with _importer_lock:
+            if _importer is None:
+                importer = Importer()
+                metrics.track_cache("imports", importer.modules)
+                _importer = importer
+    return _importer
+
+
+# absolute paths of the documents a tree imports
+def import_paths(tree, directory):
+    paths = []
+    if not isinstance(tree, nodes.ContainerNode):
+        return paths
+    for node in tree:
+        if not is_import(node):
+            continue
+        for value in node:
+            if not isinstance(value, nodes.StringNode):
+                message = "Imports take file paths, not {!r}".format(value)
+                raise EvaluationError(message)
+            paths.append(os.path.abspath(os.path.join(directory, value.value)))
+    return paths
+
+
+def is_import(node):
+    if not isinstance(node, nodes.ObjectNode):
+        return False
+    key = node.key
+    if not isinstance(key, nodes.PathNode) or len(key) != 1:
+        return False
+    return str(key[0]) == IMPORT_KEY
+
+
+# resolver and parent links of a tree, seeing the modules it imports
+def scope(tree, context):
+    importer = context.environment.importer
+    modules = importer.imports(tree, context.path)
+    resolver = ReferenceResolver(tree, [module.tree for module in modules])
+    parents = collections.ChainMap({}, *(module.parents for module in modules))
+    return resolver, parents
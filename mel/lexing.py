@@ -1,21 +1,37 @@
-from . import tokens
-from .exceptions import ParsingError
+from . import metrics, tokens
+from .exceptions import MelError, ParsingError
 
 
 class Lexer:
-    def __init__(self, text):
+    def __init__(self, text, guard=None):
         self.text = text
         self.index = 0
         self.line = 0
         self.column = 0
+        self.guard = guard
 
     def tokenize(self):
+        started = metrics.start()
+        try:
+            _tokens = self._tokenize()
+        except MelError as error:
+            metrics.error(error)
+            raise error
+        if started is not None:
+            metrics.lexed(self.text, started)
+        return _tokens
+
+    def _tokenize(self):
         _tokens = []
+        if self.guard is not None:
+            self.guard.start(self.text)
         while self.index < len(self.text):
             token = self.lex()
             self._update_counters(token)
             if not token.skip:
                 _tokens.append(token)
+                if self.guard is not None:
+                    self.guard.lexed(len(_tokens))
         return _tokens
 
     def lex(self):
@@ -44,9 +60,15 @@ class Lexer:
         self.line += max(1, len(lines) - 1)
 
 
+# limits, when given, are enforced by the lexer and by the parsers
+# reading the stream
 class TokenStream:
-    def __init__(self, text, Lexer=Lexer):
-        self.lexer = Lexer(text)
+    guard = None
+
+    def __init__(self, text, Lexer=Lexer, limits=None):
+        if limits is not None:
+            self.guard = limits.guard()
+        self.lexer = Lexer(text, self.guard)
         self.tokens = self.lexer.tokenize()
         self.text = text
         self.index = 0
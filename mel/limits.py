@@ -0,0 +1,118 @@
+import threading
+import time
+
+from .exceptions import LimitError
+
+
+# the clock and the cancel token are looked at once every this many
+# tokens lexed or rules read
+CHECK_INTERVAL = 256
+
+
+# bounds on the work of parsing one document, None for no bound. Sizes
+# count characters, timeout is in seconds from the start of lexing and
+# backtracks are rules that failed after reading tokens. A parse that
+# goes past one raises a LimitError
+class Limits:
+    def __init__(self, max_size=None, max_tokens=None, max_depth=None,
+                 timeout=None, max_backtracks=None, cancel=None):
+        self.max_size = max_size
+        self.max_tokens = max_tokens
+        self.max_depth = max_depth
+        self.timeout = timeout
+        self.max_backtracks = max_backtracks
+        self.cancel = cancel
+
+    def guard(self):
+        return Guard(self)
+
+
+# stops the parses holding it, from any thread, at their next check
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+# counts the work of one parse against its limits. The lexer and the
+# parser share it through their token stream
+class Guard:
+    def __init__(self, limits):
+        self.limits = limits
+        self.started = time.monotonic()
+        self.size = 0
+        self.tokens = 0
+        self.rules = 0
+        self.depth = 0
+        self.deepest = 0
+        self.backtracks = 0
+        # furthest token a rule started at
+        self.position = 0
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "tokens": self.tokens,
+            "rules": self.rules,
+            "depth": self.deepest,
+            "backtracks": self.backtracks,
+            "position": self.position,
+            "elapsed": time.monotonic() - self.started,
+        }
+
+    def start(self, text):
+        self.size = len(text)
+        limit = self.limits.max_size
+        if limit is not None and self.size > limit:
+            self.fail("size", "Document of {} characters, over the limit "
+                      "of {}".format(self.size, limit))
+
+    def lexed(self, count):
+        self.tokens = count
+        limit = self.limits.max_tokens
+        if limit is not None and count > limit:
+            self.fail("tokens", "Document over {} tokens".format(limit))
+        if not count % CHECK_INTERVAL:
+            self.check()
+
+    def enter(self, index):
+        self.rules += 1
+        self.depth += 1
+        if index > self.position:
+            self.position = index
+        if self.depth > self.deepest:
+            self.deepest = self.depth
+            limit = self.limits.max_depth
+            if limit is not None and self.depth > limit:
+                self.fail("depth", "Document nested over {} rules "
+                          "deep".format(limit))
+        if not self.rules % CHECK_INTERVAL:
+            self.check()
+
+    def leave(self):
+        self.depth -= 1
+
+    def backtrack(self):
+        self.backtracks += 1
+        limit = self.limits.max_backtracks
+        if limit is not None and self.backtracks > limit:
+            self.fail("backtracks", "Parse over {} backtracks".format(limit))
+
+    # cancellation and timeout
+    def check(self):
+        cancel = self.limits.cancel
+        if cancel is not None and cancel.cancelled:
+            self.fail("cancel", "Parse cancelled")
+        timeout = self.limits.timeout
+        if timeout is not None and \
+                time.monotonic() - self.started > timeout:
+            self.fail("timeout", "Parse over {} seconds".format(timeout))
+
+    def fail(self, limit, message):
+        raise LimitError(message, limit, self.stats())
@@ -0,0 +1,702 @@
+import bisect
+import collections
+import json
+import queue
+import re
+import threading
+
+from . import nodes
+from .exceptions import LimitError, ParsingError
+from .lexing import TokenStream
+from .reparsing import Document
+from .resolving import (
+    UNSCOPED, ReferenceResolver, enclosing_scopes, link_parents
+)
+
+
+# seconds without messages before edited documents are parsed again
+DEFAULT_DEBOUNCE = 0.15
+# lines of a definition shown when hovering a reference to it
+HOVER_LINES = 8
+
+NEWLINE = re.compile(r"\r\n|\r|\n")
+
+# LSP symbol kinds
+CLASS = 5
+PROPERTY = 7
+VARIABLE = 13
+OBJECT = 19
+
+KIND_NAMES = {
+    CLASS: "concept", PROPERTY: "property", VARIABLE: "alias",
+    OBJECT: "object",
+}
+
+# JSON-RPC error codes
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+SERVER_NOT_INITIALIZED = -32002
+
+
+Symbol = collections.namedtuple(
+    "Symbol", ["name", "kind", "node", "key", "children"]
+)
+
+
+# JSON-RPC MESSAGES =============================================
+
+# the next message of a stream of Content-Length framed JSON, None at
+# the end of the stream
+def read_message(file):
+    length = None
+    while True:
+        line = file.readline()
+        if not line:
+            return
+        line = line.strip()
+        if not line:
+            break
+        name, _, value = line.decode("ascii").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    if length is None:
+        return
+    return json.loads(file.read(length).decode("utf-8"))
+
+
+def write_message(file, message):
+    body = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    file.write(b"Content-Length: " + str(len(body)).encode("ascii"))
+    file.write(b"\r\n\r\n" + body)
+    file.flush()
+
+
+# LINES =============================================
+
+# converts between offsets in a text and LSP positions. Characters count
+# UTF-16 code units unless the client agreed to count code points
+class Lines:
+    def __init__(self, text, utf16=True, starts=None):
+        self.text = text
+        self.utf16 = utf16
+        if starts is None:
+            starts = [0] + _line_ends(text, 0, len(text))
+        self.starts = starts
+
+    def offset(self, position):
+        line = min(position["line"], len(self.starts) - 1)
+        start = self.starts[line]
+        end = self._end(line)
+        character = position["character"]
+        if self.utf16:
+            character = _code_points(self.text[start:end], character)
+        return min(start + character, end)
+
+    def position(self, offset):
+        line = bisect.bisect_right(self.starts, offset) - 1
+        start = self.starts[line]
+        character = offset - start
+        if self.utf16:
+            character = _code_units(self.text[start:offset])
+        return {"line": line, "character": character}
+
+    def range(self, start, end):
+        return {"start": self.position(start), "end": self.position(end)}
+
+    # the lines of the text with text[start:end] replaced. Line starts
+    # before the edit are kept and the ones after it are shifted
+    def replace(self, start, end, new):
+        text = self.text[:start] + new + self.text[end:]
+        first = bisect.bisect_right(self.starts, start)
+        last = bisect.bisect_right(self.starts, end)
+        delta = len(new) - (end - start)
+        # a "\r" around the edit may now be part of a "\r\n" break
+        first = max(first - 1, 1)
+        begin = self.starts[first - 1]
+        stop = min(end + delta + 1, len(text))
+        while stop < len(text) and text[stop - 1] == "\r":
+            stop += 1
+        middle = _line_ends(text, begin, stop)
+        starts = self.starts[:first]
+        starts.extend(middle)
+        starts.extend(
+            line + delta for line in self.starts[last:]
+            if line + delta > (middle[-1] if middle else begin)
+        )
+        return Lines(text, self.utf16, starts)
+
+    def _end(self, line):
+        if line + 1 < len(self.starts):
+            return self.starts[line + 1]
+        return len(self.text)
+
+
+def _line_ends(text, start, end):
+    return [
+        match.end() for match in NEWLINE.finditer(text, start, end)
+    ]
+
+
+def _code_units(text):
+    if text.isascii():
+        return len(text)
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _code_points(line, units):
+    if line.isascii():
+        return units
+    count = 0
+    for index, character in enumerate(line):
+        if count >= units:
+            return index
+        count += 2 if ord(character) > 0xFFFF else 1
+    return len(line)
+
+
+# DOCUMENTS =============================================
+
+# a reparsed document raising the ParsingError of a text that doesn't
+# parse, keeping its position for diagnostics
+class SourceDocument(Document):
+    def parse(self, text):
+        return self.Parser(TokenStream(text)).parse()
+
+
+# an open document: its text as edited, and the tree and indexes of its
+# text when last parsed. Edits only change the text, the tree follows
+# on refresh, so bursts of edits are parsed once
+class OpenDocument:
+    def __init__(self, uri, text, version=None, utf16=True):
+        self.uri = uri
+        self.version = version
+        self.lines = Lines(text, utf16)
+        # the lines of the text last parsed, which the indexes refer to
+        self.parsed_lines = self.lines
+        self.model = None
+        self.error = None
+        self.index = Index()
+        self.dirty = True
+        # the diagnostics the client was last sent
+        self.published = None
+
+    @property
+    def text(self):
+        return self.lines.text
+
+    def change(self, changes, version=None):
+        for change in changes:
+            if "range" not in change:
+                self.lines = Lines(change["text"], self.lines.utf16)
+                continue
+            start = self.lines.offset(change["range"]["start"])
+            end = self.lines.offset(change["range"]["end"])
+            self.lines = self.lines.replace(start, end, change["text"])
+        self.version = version
+        self.dirty = True
+
+    # parses the text if it changed. Documents that stop parsing keep
+    # the indexes of their last tree
+    def refresh(self):
+        if not self.dirty:
+            return False
+        self.dirty = False
+        try:
+            if self.model is None:
+                self.model = SourceDocument(self.text)
+            else:
+                self.model.update(self.text)
+        except (ParsingError, LimitError) as error:
+            self.error = error
+            return True
+        self.error = None
+        self.parsed_lines = self.lines
+        self.index.update(self.model.tree)
+        return True
+
+    def diagnostics(self):
+        if self.error is None:
+            return []
+        if isinstance(self.error, ParsingError):
+            start = min(self.error.index, len(self.text))
+        else:
+            start = 0
+        end = start
+        while end < len(self.text) and not self.text[end].isspace():
+            end += 1
+        if isinstance(self.error, LimitError):
+            message = str(self.error)
+        elif start >= len(self.text.rstrip()):
+            message = "Unexpected end of document"
+        else:
+            message = "Unexpected {!r}".format(self.text[start:end])
+        return [{
+            "range": self.lines.range(start, end),
+            "severity": 1,
+            "source": "mel",
+            "message": message,
+        }]
+
+
+# INDEXES =============================================
+
+# the outline of each top level expression of a tree. Unchanged
+# expressions keep theirs across reparses, as offsets in an outline are
+# relative to its expression, which reparsing moves as a whole
+class Index:
+    def __init__(self):
+        self.tree = None
+        self.outlines = {}
+        self.starts = []
+
+    def update(self, tree):
+        outlines = {}
+        for expression in tree:
+            outline = self.outlines.get(id(expression))
+            if outline is None or outline.expression is not expression:
+                outline = Outline(expression)
+            outlines[id(expression)] = outline
+        self.tree = tree
+        self.outlines = outlines
+        self.starts = [expression.index[0] for expression in tree]
+
+    def document_symbols(self, lines):
+        if self.tree is None:
+            return []
+        return [
+            symbol for expression in self.tree
+            for symbol in self.outlines[id(expression)].document_symbols(lines)
+        ]
+
+    # the innermost reference or symbol key at offset, with the top
+    # level expression holding it
+    def at(self, offset):
+        if self.tree is None:
+            return None, None
+        position = bisect.bisect_right(self.starts, offset) - 1
+        if position < 0:
+            return None, None
+        expression = self.tree[position]
+        if offset > expression.index[1]:
+            return None, expression
+        return self.outlines[id(expression)].at(offset), expression
+
+
+class Outline:
+    def __init__(self, expression):
+        self.expression = expression
+        self.symbols = _symbols([expression])
+        # symbol kinds by the id of their key
+        self.kinds = {}
+        for symbol in _walk_symbols(self.symbols):
+            self.kinds[id(symbol.key)] = symbol.kind
+        targets = [symbol.key for symbol in _walk_symbols(self.symbols)]
+        # the node whose scopes each reference resolves in
+        self.anchors = {}
+        for reference, anchor in _references(expression):
+            self.anchors[id(reference)] = anchor
+            targets.append(reference)
+        base = expression.index[0]
+        targets.sort(key=lambda node: (node.index[0], -node.index[1]))
+        self.targets = targets
+        # offsets from the expression's start, unchanged when it moves
+        self.starts = [node.index[0] - base for node in targets]
+        self._parents = None
+        self._document_symbols = None
+
+    # the target starting last before offset among the ones holding it
+    def at(self, offset):
+        relative = offset - self.expression.index[0]
+        position = bisect.bisect_right(self.starts, relative) - 1
+        while position >= 0:
+            node = self.targets[position]
+            if node.index[0] <= offset <= node.index[1]:
+                return node
+            position -= 1
+
+    # the symbols as LSP DocumentSymbols. They are built again only when
+    # the expression starts at another character. When it only moves to
+    # another line, the lines of their positions are shifted in place, so
+    # a result holds until the next call, like a response until it's sent
+    def document_symbols(self, lines):
+        position = lines.position(self.expression.index[0])
+        line, character = position["line"], position["character"]
+        cached = self._document_symbols
+        if cached is None or cached.character != character:
+            symbols = [_symbol_json(symbol, lines) for symbol in self.symbols]
+            cached = self._document_symbols = SymbolCache(
+                line, character, symbols, _positions(symbols)
+            )
+        elif cached.line != line:
+            delta = line - cached.line
+            for item in cached.positions:
+                item["line"] += delta
+            cached.line = line
+        return cached.symbols
+
+    # parents of the expression's values, linked on the first definition
+    # asked for in it
+    @property
+    def parents(self):
+        if self._parents is None:
+            self._parents = link_parents(self.expression)
+        return self._parents
+
+
+def _symbols(children):
+    symbols = []
+    for node in children:
+        if isinstance(node, nodes.ObjectNode):
+            key = node.key
+            kind = OBJECT
+            if isinstance(key, nodes.PathNode) and len(key) and \
+                    isinstance(key[0], nodes.ConceptKeywordNode):
+                kind = CLASS
+            symbols.append(Symbol(
+                str(key), kind, node, key, _symbols(node)
+            ))
+        elif isinstance(node, nodes.EqualNode):
+            path = node.path
+            kind = PROPERTY
+            if isinstance(path, nodes.PathNode) and len(path) and \
+                    isinstance(path[0], nodes.AliasKeywordNode):
+                kind = VARIABLE
+            value = node.value
+            children = _symbols(value) \
+                if isinstance(value, nodes.ObjectNode) else []
+            symbols.append(Symbol(str(path), kind, node, path, children))
+    return symbols
+
+
+def _walk_symbols(symbols):
+    for symbol in symbols:
+        yield symbol
+        yield from _walk_symbols(symbol.children)
+
+
+# (reference, anchor) of the references of an expression. The anchor
+# is the reference or, when link_parents leaves it out, as it's in a key
+# or another reference, its closest ancestor that it links
+def _references(expression):
+    stack = [(expression, expression, True)]
+    while stack:
+        node, anchor, linked = stack.pop()
+        if linked:
+            anchor = node
+        if isinstance(node, nodes.ReferenceNode):
+            yield node, anchor
+        linking = set()
+        if not linked or isinstance(node, UNSCOPED):
+            pass
+        elif isinstance(node, nodes.RelationNode):
+            linking.add(id(node.value))
+        elif isinstance(node, nodes.ContainerNode):
+            linking.update(id(child) for child in node)
+        for value in nodes.children(node):
+            stack.append((value, anchor, id(value) in linking))
+
+
+# SERVER =============================================
+
+_handlers = {}
+
+
+# decorator - register LanguageServer methods as handlers of an LSP method
+def handler(name):
+    def register(method):
+        _handlers[name] = method
+        return method
+    return register
+
+
+# answers an editor over LSP. Messages are handled one at a time;
+# documents edited since they were last parsed are parsed once messages
+# stop coming for debounce seconds, or right away when a request needs
+# them. send receives every message for the client
+class LanguageServer:
+    def __init__(self, send, debounce=DEFAULT_DEBOUNCE):
+        self.send = send
+        self.debounce = debounce
+        self.documents = {}
+        self.utf16 = True
+        self.initialized = False
+        self.shutdown = False
+        self.exited = False
+
+    @property
+    def dirty(self):
+        return any(document.dirty for document in self.documents.values())
+
+    def handle(self, message):
+        method = message.get("method")
+        function = _handlers.get(method)
+        if "id" not in message:
+            if function is None:
+                return
+            try:
+                function(self, message.get("params") or {})
+            except Exception as error:
+                self._log("{}: {}".format(method, error))
+            return
+        if function is None:
+            self._error(message["id"], METHOD_NOT_FOUND,
+                        "Unknown method {!r}".format(method))
+        elif not self.initialized and method != "initialize":
+            self._error(message["id"], SERVER_NOT_INITIALIZED,
+                        "The server isn't initialized")
+        else:
+            try:
+                result = function(self, message.get("params") or {})
+            except Exception as error:
+                self._error(message["id"], INTERNAL_ERROR, str(error))
+            else:
+                self.send({
+                    "jsonrpc": "2.0", "id": message["id"], "result": result
+                })
+
+    # parses the edited documents, publishing their diagnostics
+    def flush(self):
+        for document in self.documents.values():
+            self._refresh(document)
+
+    # handles the messages of input until the client exits
+    def run(self, input):
+        messages = queue.Queue()
+        reader = threading.Thread(
+            target=_read_messages, args=(input, messages), daemon=True
+        )
+        reader.start()
+        while not self.exited:
+            try:
+                timeout = self.debounce if self.dirty else None
+                message = messages.get(timeout=timeout)
+            except queue.Empty:
+                self.flush()
+                continue
+            if message is None:
+                break
+            self.handle(message)
+
+    # parses a document if it changed, publishing its diagnostics when
+    # they changed too
+    def _refresh(self, document):
+        if not document.refresh():
+            return
+        diagnostics = document.diagnostics()
+        if diagnostics != document.published:
+            document.published = diagnostics
+            self.send({
+                "jsonrpc": "2.0",
+                "method": "textDocument/publishDiagnostics",
+                "params": {
+                    "uri": document.uri,
+                    "version": document.version,
+                    "diagnostics": diagnostics,
+                },
+            })
+
+    def _log(self, message):
+        self.send({
+            "jsonrpc": "2.0", "method": "window/logMessage",
+            "params": {"type": 1, "message": message},
+        })
+
+    def _error(self, _id, code, message):
+        self.send({
+            "jsonrpc": "2.0", "id": _id,
+            "error": {"code": code, "message": message},
+        })
+
+    # the document of a request, parsed
+    def _document(self, params):
+        document = self.documents[params["textDocument"]["uri"]]
+        self._refresh(document)
+        return document
+
+    # LIFECYCLE =============================================
+
+    @handler("initialize")
+    def _initialize(self, params):
+        general = params.get("capabilities", {}).get("general", {})
+        encodings = general.get("positionEncodings", [])
+        self.utf16 = "utf-32" not in encodings
+        self.initialized = True
+        return {
+            "capabilities": {
+                "positionEncoding": "utf-16" if self.utf16 else "utf-32",
+                "textDocumentSync": {"openClose": True, "change": 2},
+                "documentSymbolProvider": True,
+                "definitionProvider": True,
+                "hoverProvider": True,
+            },
+            "serverInfo": {"name": "mel"},
+        }
+
+    @handler("shutdown")
+    def _shutdown(self, params):
+        self.shutdown = True
+
+    @handler("exit")
+    def _exit(self, params):
+        self.exited = True
+
+    # SYNCHRONIZATION =============================================
+
+    @handler("textDocument/didOpen")
+    def _did_open(self, params):
+        item = params["textDocument"]
+        document = OpenDocument(
+            item["uri"], item["text"], item.get("version"), self.utf16
+        )
+        self.documents[item["uri"]] = document
+
+    @handler("textDocument/didChange")
+    def _did_change(self, params):
+        item = params["textDocument"]
+        document = self.documents.get(item["uri"])
+        if document is not None:
+            document.change(params["contentChanges"], item.get("version"))
+
+    @handler("textDocument/didClose")
+    def _did_close(self, params):
+        uri = params["textDocument"]["uri"]
+        if self.documents.pop(uri, None) is not None:
+            self.send({
+                "jsonrpc": "2.0",
+                "method": "textDocument/publishDiagnostics",
+                "params": {"uri": uri, "diagnostics": []},
+            })
+
+    # QUERIES =============================================
+
+    @handler("textDocument/documentSymbol")
+    def _document_symbol(self, params):
+        document = self._document(params)
+        return document.index.document_symbols(document.parsed_lines)
+
+    @handler("textDocument/definition")
+    def _definition(self, params):
+        document = self._document(params)
+        target = _definition(document, params["position"])
+        if target is None:
+            return None
+        return {
+            "uri": document.uri,
+            "range": document.parsed_lines.range(*target.index),
+        }
+
+    @handler("textDocument/hover")
+    def _hover(self, params):
+        document = self._document(params)
+        lines = document.parsed_lines
+        offset = lines.offset(params["position"])
+        node, expression = document.index.at(offset)
+        if node is None:
+            return None
+        if isinstance(node, nodes.ReferenceNode):
+            target = _definition(document, params["position"])
+            if target is None:
+                text = "{}: not defined".format(node)
+            else:
+                text = _excerpt(str(target))
+        else:
+            kind = document.index.outlines[id(expression)].kinds[id(node)]
+            text = "{} {}".format(KIND_NAMES[kind], node)
+        return {
+            "contents": {
+                "kind": "markdown", "value": "```mel\n{}\n```".format(text)
+            },
+            "range": lines.range(*node.index),
+        }
+
+
+def _read_messages(input, messages):
+    while True:
+        try:
+            message = read_message(input)
+        except (ValueError, OSError):
+            message = None
+        messages.put(message)
+        # a thread still reading at exit blocks the interpreter's shutdown
+        if message is None or message.get("method") == "exit":
+            return
+
+
+# the DocumentSymbols of an outline, built when its expression started
+# at line and character, with every position dict in them
+class SymbolCache:
+    def __init__(self, line, character, symbols, positions):
+        self.line = line
+        self.character = character
+        self.symbols = symbols
+        self.positions = positions
+
+
+def _positions(symbols):
+    found = []
+    stack = list(symbols)
+    while stack:
+        symbol = stack.pop()
+        for name in ("range", "selectionRange"):
+            found.append(symbol[name]["start"])
+            found.append(symbol[name]["end"])
+        stack.extend(symbol["children"])
+    return found
+
+
+def _symbol_json(symbol, lines):
+    return {
+        "name": symbol.name or ":",
+        "kind": symbol.kind,
+        "range": lines.range(*symbol.node.index),
+        "selectionRange": lines.range(*symbol.key.index),
+        "children": [_symbol_json(child, lines) for child in symbol.children],
+    }
+
+
+# the object or relation defining what the reference at position points
+# to, in the document itself
+def _definition(document, position):
+    offset = document.parsed_lines.offset(position)
+    node, expression = document.index.at(offset)
+    if not isinstance(node, nodes.ReferenceNode):
+        return
+    outline = document.index.outlines[id(expression)]
+    anchor = outline.anchors[id(node)]
+    scopes = list(enclosing_scopes(outline.parents, anchor))
+    resolver = DefinitionResolver(document.index.tree)
+    selection = resolver.resolve(node, scopes)
+    if not isinstance(selection, nodes.Node):
+        return
+    return resolver.relations.get(id(selection), selection)
+
+
+# a resolver keeping the relations whose values its lookups return
+class DefinitionResolver(ReferenceResolver):
+    def __init__(self, scope, imports=()):
+        super().__init__(scope, imports)
+        self.relations = {}
+
+    def lookup(self, scope, keyword):
+        found = super().lookup(scope, keyword)
+        if found is not None:
+            for node in scope:
+                if isinstance(node, nodes.EqualNode) and node.value is found:
+                    self.relations[id(found)] = node
+                    break
+        return found
+
+
+def _excerpt(text):
+    lines = text.splitlines()
+    if len(lines) > HOVER_LINES:
+        lines = lines[:HOVER_LINES] + ["..."]
+    return "\n".join(lines)
+
+
+def serve(input, output, debounce=DEFAULT_DEBOUNCE):
+    server = LanguageServer(
+        lambda message: write_message(output, message), debounce
+    )
+    server.run(input)
+    return 0 if server.shutdown else 1
@@ -0,0 +1,342 @@
+import bisect
+import threading
+import time
+import weakref
+
+from . import nodes
+
+
+# upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1,
+    2.5, 5, 10,
+)
+# upper bounds of the size buckets, in tokens or nodes
+SIZE_BUCKETS = tuple(4 ** power for power in range(1, 11))
+
+
+# a value that only goes up, one per set of label values
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self.values)
+        if not self.labels and not values:
+            values[()] = 0
+        return [
+            (self.name, dict(zip(self.labels, labels)), value)
+            for labels, value in sorted(values.items())
+        ]
+
+    # values by their label value, or by the tuple of them when there are
+    # many labels
+    def snapshot(self):
+        with self._lock:
+            if not self.labels:
+                return self.values.get((), 0)
+            if len(self.labels) == 1:
+                return {
+                    labels[0]: value for labels, value in self.values.items()
+                }
+            return dict(self.values)
+
+
+# counts of observed values under each bucket bound, with their sum.
+# Snapshots count each bucket apart, the Prometheus text cumulatively
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += count
+            samples.append((
+                self.name + "_bucket", {"le": _format(bound)}, cumulative
+            ))
+        samples.append((self.name + "_sum", {}, total))
+        samples.append((self.name + "_count", {}, cumulative))
+        return samples
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        return {
+            "count": sum(counts),
+            "sum": total,
+            "buckets": dict(zip(self.buckets + (float("inf"),), counts)),
+        }
+
+
+# hits and misses of caches, read when metrics are collected. Caches
+# are held weakly and dropped once garbage collected
+class CacheCounter:
+    type = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.caches = {}
+        self._lock = threading.Lock()
+
+    def track(self, label, cache):
+        with self._lock:
+            self.caches[label] = weakref.ref(cache)
+
+    def samples(self):
+        samples = []
+        for label, counts in sorted(self.snapshot().items()):
+            for result, key in [("hit", "hits"), ("miss", "misses")]:
+                labels = {"cache": label, "result": result}
+                samples.append((self.name, labels, counts[key]))
+        return samples
+
+    def snapshot(self):
+        with self._lock:
+            caches = dict(self.caches)
+        found = {}
+        for label, reference in caches.items():
+            cache = reference()
+            if cache is None:
+                with self._lock:
+                    self.caches.pop(label, None)
+                continue
+            found[label] = {"hits": cache.hits, "misses": cache.misses}
+        return found
+
+
+# metrics of a process, by name. Disabled registries ignore updates
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.enabled = True
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, buckets))
+
+    def cache_counter(self, name, help):
+        return self._add(CacheCounter(name, help))
+
+    def snapshot(self):
+        return {
+            name: metric.snapshot() for name, metric in self.metrics.items()
+        }
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+
+REGISTRY = Registry()
+
+DOCUMENTS = REGISTRY.counter(
+    "mel_documents_parsed_total", "Documents parsed"
+)
+LEXED = REGISTRY.counter(
+    "mel_lexed_characters_total", "Characters of source lexed"
+)
+LEX_SECONDS = REGISTRY.histogram(
+    "mel_lex_seconds", "Time lexing a source"
+)
+PARSE_SECONDS = REGISTRY.histogram(
+    "mel_parse_seconds", "Time parsing a document's tokens"
+)
+EVAL_SECONDS = REGISTRY.histogram(
+    "mel_eval_seconds", "Time evaluating a tree"
+)
+ERRORS = REGISTRY.counter(
+    "mel_errors_total", "Errors raised, by kind", ["kind"]
+)
+TOKENS = REGISTRY.histogram(
+    "mel_document_tokens", "Tokens of each document parsed", SIZE_BUCKETS
+)
+NODES = REGISTRY.histogram(
+    "mel_tree_nodes", "Nodes of each tree parsed", SIZE_BUCKETS
+)
+CACHES = REGISTRY.cache_counter(
+    "mel_cache_lookups_total", "Cache lookups, by cache and result"
+)
+
+
+def enable(enabled=True):
+    REGISTRY.enabled = enabled
+
+
+def snapshot():
+    return REGISTRY.snapshot()
+
+
+def track_cache(label, cache):
+    CACHES.track(label, cache)
+
+
+# HOOKS =============================================
+
+# called by the lexer, the parser and evaluate. The time of a lex, parse
+# or evaluation starts with start, None when metrics are disabled
+
+def start():
+    if REGISTRY.enabled:
+        return time.perf_counter()
+
+
+def lexed(text, started):
+    LEX_SECONDS.observe(time.perf_counter() - started)
+    LEXED.inc(amount=len(text))
+
+
+def parsed(tree, tokens, started):
+    PARSE_SECONDS.observe(time.perf_counter() - started)
+    DOCUMENTS.inc()
+    TOKENS.observe(tokens)
+    NODES.observe(sum(1 for _ in nodes.walk(tree)))
+
+
+def evaluated(started):
+    EVAL_SECONDS.observe(time.perf_counter() - started)
+
+
+def error(exception):
+    if REGISTRY.enabled:
+        ERRORS.inc((type(exception).__name__,))
+
+
+# EXPORTERS =============================================
+
+# the metrics in Prometheus' text exposition format
+def prometheus_text(registry=REGISTRY):
+    lines = []
+    for name, metric in sorted(registry.metrics.items()):
+        lines.append("# HELP {} {}".format(name, metric.help))
+        lines.append("# TYPE {} {}".format(name, metric.type))
+        for sample, labels, value in metric.samples():
+            lines.append("{}{} {}".format(
+                sample, _labels(labels), _format(value)
+            ))
+    return "\n".join(lines) + "\n"
+
+
+# for the textfile collector of Prometheus' node exporter
+def write_prometheus(path, registry=REGISTRY):
+    from .compiling import write_atomic
+    write_atomic(path, prometheus_text(registry).encode("utf-8"))
+
+
+# serves the metrics at http://host:port/metrics from a daemon thread,
+# returning the server. Local only unless told otherwise
+def serve_prometheus(port, host="127.0.0.1", registry=REGISTRY):
+    import http.server
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text(registry).encode("utf-8")
+            self.send_response(200)
+            self.send_header(
+                "Content-Type", "text/plain; version=0.0.4; charset=utf-8"
+            )
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+# calls export with the registry every interval seconds from a daemon
+# thread, like write_prometheus or a callback logging snapshots
+class Reporter:
+    def __init__(self, export, interval=60, registry=REGISTRY):
+        self.export = export
+        self.interval = interval
+        self.registry = registry
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    # stops reporting after a last export
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.export(self.registry)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.export(self.registry)
+
+
+# an export for Reporter handing snapshots to callback, like a logger's
+# info method
+def logging_export(callback):
+    return lambda registry: callback(registry.snapshot())
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(key, _escape(value))
+        for key, value in sorted(labels.items())
+    )
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    value = str(value)
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace(
+        "\n", "\\n"
+    )
+
+
+def _format(value):
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
@@ -16,9 +16,6 @@ class Node:
         id = self.id.upper()
         return template.format(id, self)
 
-    def eval(self):
-        return
-
 
 class ContainerNode(Node):
     def __init__(self):
@@ -33,12 +30,41 @@ class ContainerNode(Node):
             yield node
 
     def __getitem__(self, index):
+        if isinstance(index, slice):
+            indexes = range(len(self._subnodes))[index]
+            return NodeView(self._subnodes, indexes)
         return self._subnodes[index]
 
     def add(self, *nodes):
         for node in nodes:
             self._subnodes.append(node)
 
+    def view(self, start=None, end=None):
+        indexes = range(len(self._subnodes))[start:end]
+        return NodeView(self._subnodes, indexes)
+
+
+# lazy, zero-copy window over a container's subnodes
+class NodeView:
+    def __init__(self, nodes, indexes):
+        self._nodes = nodes
+        self._indexes = indexes
+
+    def __len__(self):
+        return len(self._indexes)
+
+    def __iter__(self):
+        for index in self._indexes:
+            yield self._nodes[index]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return NodeView(self._nodes, self._indexes[index])
+        return self._nodes[self._indexes[index]]
+
+    def __repr__(self):
+        return "VIEW({!r})".format(self._indexes)
+
 
 # ABSTRACT STRUCTS =================================================
 
@@ -47,6 +73,15 @@ class KeyStructNode(ContainerNode):
         super().__init__()
         self.key = Node()
 
+    # structs keyed by a $name path are memoization points
+    @property
+    def cache_key(self):
+        key = self.key
+        if not isinstance(key, PathNode) or not len(key):
+            return
+        if isinstance(key[0], CacheKeywordNode):
+            return str(key)
+
 
 # ROOT STRUCT =========================================================
 
@@ -59,9 +94,6 @@ class RootNode(ContainerNode):
 class ObjectNode(KeyStructNode):
     id = "object"
 
-    def eval(self):
-        return str(self)
-
 
 # QUERY STRUCTS =================================================
 
@@ -195,6 +227,13 @@ class RangeNode(Node):
         self.start = None
         self.end = None
 
+    # ranges are inclusive: 0..3 takes four items, ..-1 goes to the last
+    def slice(self):
+        end = self.end
+        if end is not None:
+            end = end + 1 or None
+        return slice(self.start, end)
+
 
 # LITERAL ========================================================
 
@@ -205,9 +244,6 @@ class LiteralNode(Node):
         super().__init__()
         self.value = None
 
-    def eval(self, _):
-        return self.value
-
 
 class IntNode(LiteralNode):
     id = "int"
@@ -247,3 +283,28 @@ class MetaPathNode(Node):
 
 class WildcardNode(Node):
     id = "wildcard"
+
+
+# WALKING ========================================================
+
+# the nodes a node holds: its subnodes, then the nodes of its fields
+def children(node):
+    found = list(node) if isinstance(node, ContainerNode) else []
+    for value in vars(node).values():
+        if isinstance(value, Node):
+            found.append(value)
+    return found
+
+
+# every node of a tree once, without recursion. A node's children are
+# read after it is yielded, so they can be replaced in the meantime
+def walk(tree):
+    seen = set()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        yield node
+        stack.extend(children(node))
@@ -1,23 +1,41 @@
-from .constants import ROOT
-from .base import BaseParser
+import importlib
 
-from ..exceptions import ParsingError
+from .constants import ROOT, RULE_MODULES
+from .base import BaseParser
 
-from . import ( # noqa
-    root,
-    keyword,
-    literal,
-    path,
-    reference,
-    relation,
-    struct,
-    value,
-)
+from .. import metrics
+from ..exceptions import LimitError, MelError, ParsingError
 
 
 class Parser(BaseParser):
     def parse(self):
-        node = self.read_rule(ROOT)
+        started = metrics.start()
+        try:
+            node = self._parse()
+        except MelError as error:
+            metrics.error(error)
+            raise error
+        if started is not None:
+            metrics.parsed(node, len(self.stream.tokens), started)
+        return node
+
+    def _parse(self):
+        try:
+            node = self.read_rule(ROOT)
+        except RecursionError:
+            guard = self.stream.guard
+            stats = guard.stats() if guard is not None else {}
+            raise LimitError("Document nested too deep to parse", "depth",
+                             stats)
         if not self.stream.is_eof():
             self.error(ParsingError)
         return node
+
+
+# parser modules are imported on first use
+def __getattr__(name):
+    if name in RULE_MODULES.values():
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError("module {!r} has no attribute {!r}".format(
+        __name__, name
+    ))
@@ -1,6 +1,8 @@
 import functools
+import importlib
 
 from ..exceptions import ParsingError
+from .constants import RULE_MODULES
 
 
 # decorator - add stream data to node instance via parser method
@@ -22,7 +24,8 @@ def subparser(cls):
     return cls
 
 
-# references parser classes by its id
+# references parser classes by its id. The module of a rule registers
+# its parsers when the rule is first needed
 class ParserMap:
     _map = {}
 
@@ -32,6 +35,9 @@ class ParserMap:
 
     @classmethod
     def get(cls, _id):
+        if _id not in cls._map and _id in RULE_MODULES:
+            module = "." + RULE_MODULES[_id]
+            importlib.import_module(module, __package__)
         return cls._map.get(_id)
 
 
@@ -55,12 +61,28 @@ class BaseParser:
     def read_rule(self, rule):
         parser = self._get_parser(rule, self.stream)
         index = self.stream.save()
+        if self.stream.guard is not None:
+            return self._read_guarded(parser, index, self.stream.guard)
         try:
             return parser.parse()
         except ParsingError as error:
             self.stream.restore(index)
             raise error
 
+    # read_rule counting depth, backtracks and time against the limits
+    # of the stream
+    def _read_guarded(self, parser, index, guard):
+        guard.enter(index)
+        try:
+            return parser.parse()
+        except ParsingError as error:
+            if self.stream.index != index:
+                guard.backtrack()
+            self.stream.restore(index)
+            raise error
+        finally:
+            guard.leave()
+
     def parse_alternative(self, *rules):
         for rule in rules:
             try:
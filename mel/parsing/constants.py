@@ -1,3 +1,6 @@
+# bump when a change in tokens or rules changes the trees produced
+GRAMMAR_VERSION = 1
+
 ROOT = 'root'
 LIST = 'list'
 EXPRESSION = 'expression'
@@ -45,3 +48,48 @@ LITERAL = 'literal'
 RANGE = 'range'
 LEFT_BOUND_RANGE = 'left range'
 RIGHT_BOUND_RANGE = 'right range'
+
+# modules defining the parser of each rule, imported when first read
+RULE_MODULES = {
+    NAME: 'keyword',
+    CONCEPT: 'keyword',
+    TAG: 'keyword',
+    LOG: 'keyword',
+    ALIAS: 'keyword',
+    CACHE: 'keyword',
+    FORMAT: 'keyword',
+    DOC: 'keyword',
+    KEYWORD: 'keyword',
+    INT: 'literal',
+    FLOAT: 'literal',
+    BOOLEAN: 'literal',
+    STRING: 'literal',
+    TEMPLATE_STRING: 'literal',
+    LITERAL: 'literal',
+    RANGE: 'literal',
+    RIGHT_BOUND_RANGE: 'literal',
+    LEFT_BOUND_RANGE: 'literal',
+    LIST: 'literal',
+    WILDCARD: 'literal',
+    CHILD_PATH: 'path',
+    META_PATH: 'path',
+    PATH: 'path',
+    CHILD_REFERENCE: 'reference',
+    REFERENCE: 'reference',
+    RELATION: 'relation',
+    EQUAL: 'relation',
+    DIFFERENT: 'relation',
+    GREATER_THAN: 'relation',
+    GREATER_THAN_EQUAL: 'relation',
+    LESS_THAN: 'relation',
+    LESS_THAN_EQUAL: 'relation',
+    IN: 'relation',
+    NOT_IN: 'relation',
+    ROOT: 'root',
+    ANONYM_KEY: 'struct',
+    DEFAULT_DOC: 'struct',
+    DEFAULT_FORMAT: 'struct',
+    OBJECT: 'struct',
+    QUERY: 'struct',
+    VALUE: 'value',
+}
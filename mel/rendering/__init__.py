@@ -0,0 +1,20 @@
+import importlib
+
+from .writer import BufferedWriter  # noqa
+from .base import (  # noqa
+    RENDERER_MODULES,
+    Renderer,
+    RendererMap,
+    default_format,
+    render,
+    renderer
+)
+
+
+# renderer modules are imported on first use
+def __getattr__(name):
+    if name in RENDERER_MODULES.values():
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError("module {!r} has no attribute {!r}".format(
+        __name__, name
+    ))
@@ -0,0 +1,187 @@
+import importlib
+
+from .. import importing, nodes
+from ..evaluation import Evaluation, to_text
+from ..exceptions import EvaluationError, MelError
+from ..resolving import enclosing_scopes, fans_out, link_parents
+from ..utils import Context
+from .writer import BufferedWriter
+
+
+DEFAULT_FORMAT = "json"
+ENTRY_POINT_GROUP = "mel.renderers"
+
+# modules of the builtin renderers, imported when their format is used
+RENDERER_MODULES = {
+    "css": "css",
+    "html": "html",
+    "json": "json",
+    "xml": "xml",
+}
+
+
+# decorator - register renderer classes in RendererMap
+def renderer(cls):
+    RendererMap.set(cls)
+    return cls
+
+
+# references renderer classes by format id. Renderers from other packages
+# are found through the "mel.renderers" entry point group
+class RendererMap:
+    _map = {}
+    _loaded = False
+
+    @classmethod
+    def set(cls, _renderer):
+        cls._map[_renderer.id] = _renderer
+
+    @classmethod
+    def get(cls, _id):
+        if _id not in cls._map and _id in RENDERER_MODULES:
+            module = "." + RENDERER_MODULES[_id]
+            importlib.import_module(module, __package__)
+        if _id not in cls._map and not cls._loaded:
+            cls.load_entry_points()
+        return cls._map.get(_id)
+
+    @classmethod
+    def load_entry_points(cls):
+        cls._loaded = True
+        for entry_point in _entry_points(ENTRY_POINT_GROUP):
+            cls.set(entry_point.load())
+
+
+def _entry_points(group):
+    from importlib import metadata
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        return entry_points.select(group=group)
+    return entry_points.get(group, [])
+
+
+# SESSION =============================================
+
+# state of one rendering pass, shared by every renderer taking part in
+# it. Renderers expand nodes into items: strings written as they are,
+# lists of items, callables returning items, nodes to expand and the ids
+# of references whose targets have been written
+class Session:
+    def __init__(self, tree, writer, resolve=True, path=None,
+                 environment=None):
+        self.tree = tree
+        self.writer = writer
+        self.context = Context(environment)
+        self.context.tree = tree
+        self.context.path = path
+        self.resolver, self.parents = importing.scope(tree, self.context)
+        if resolve:
+            self.parents.update(link_parents(tree))
+        self._active = set()
+        self._renderers = {}
+
+    def renderer(self, _id):
+        if _id not in self._renderers:
+            Renderer = RendererMap.get(_id)
+            if Renderer is None:
+                raise MelError("Unknown format {!r}".format(_id))
+            self._renderers[_id] = Renderer(self)
+        return self._renderers[_id]
+
+    def run(self, _renderer, node):
+        write = self.writer.write
+        stack = [(_renderer, _renderer.document(node))]
+        while stack:
+            _renderer, item = stack.pop()
+            if isinstance(item, str):
+                write(item)
+            elif isinstance(item, list):
+                stack.extend((_renderer, sub) for sub in reversed(item))
+            elif isinstance(item, int):
+                self._active.discard(item)
+            elif isinstance(item, nodes.Node):
+                stack.append(self._expand(_renderer, item))
+            else:
+                stack.append((_renderer, item()))
+        self.writer.flush()
+
+    def _expand(self, _renderer, node):
+        _format = format_key(node)
+        if _format is None or not _renderer.nested_formats:
+            return _renderer, _renderer.expand(node)
+        _renderer = self.renderer(_format)
+        return _renderer, _renderer.document(node)
+
+    # targets of a reference and whether it fans out, marking the
+    # reference active until its id item is reached
+    def enter(self, reference):
+        key = id(reference)
+        if key in self._active:
+            message = "Circular reference in {!r}".format(reference)
+            raise EvaluationError(message)
+        self._active.add(key)
+        scopes = enclosing_scopes(self.parents, reference)
+        selection = self.resolver.resolve(reference, scopes)
+        if fans_out(reference):
+            return list(selection or ()), True
+        return selection, False
+
+    def evaluate(self, node):
+        evaluation = Evaluation(self.context, self.resolver, self.parents)
+        return evaluation.run(node)
+
+    def text(self, node):
+        return to_text(self.evaluate(node))
+
+
+# BASE RENDERER =============================================
+
+class Renderer:
+    id = None
+    nested_formats = True
+
+    def __init__(self, session):
+        self.session = session
+
+    # items for a node rendered as a whole document in this format
+    def document(self, node):
+        return self.expand(node)
+
+    def expand(self, node):
+        raise NotImplementedError
+
+
+# "(%html ...)" objects are rendered with the html renderer
+def format_key(node):
+    if not isinstance(node, nodes.ObjectNode):
+        return
+    key = node.key
+    if isinstance(key, nodes.PathNode) and len(key) == 1:
+        if isinstance(key[0], nodes.FormatKeywordNode):
+            return key[0].value
+
+
+# "(%: html)" sets the format of the struct holding it
+def default_format(struct):
+    for node in struct:
+        if not isinstance(node, nodes.ObjectNode):
+            continue
+        if isinstance(node.key, nodes.DefaultFormatKeyNode) and len(node):
+            value = node[0]
+            if isinstance(value, nodes.LiteralNode):
+                return str(value.value)
+            return str(value)
+
+
+def is_default_format(node):
+    if not isinstance(node, nodes.ObjectNode):
+        return False
+    return isinstance(node.key, nodes.DefaultFormatKeyNode)
+
+
+def render(tree, file, _format=None, buffer_size=64 * 1024, path=None,
+           environment=None):
+    writer = BufferedWriter(file, buffer_size)
+    session = Session(tree, writer, path=path, environment=environment)
+    _format = _format or default_format(tree) or DEFAULT_FORMAT
+    session.run(session.renderer(_format), tree)
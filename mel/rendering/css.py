@@ -0,0 +1,75 @@
+import re
+
+from .. import nodes
+from ..exceptions import MelError
+from .base import Renderer, renderer
+
+
+# objects become rules, relations their declarations and nested objects
+# rules for descendant selectors: (nav color = 'red' (a margin = 0))
+# is written as "nav{color:red}nav a{margin:0}"
+@renderer
+class CSSRenderer(Renderer):
+    id = "css"
+
+    def document(self, node):
+        return self.rules(node, "")
+
+    def expand(self, node):
+        if isinstance(node, nodes.ObjectNode):
+            return self.rules(node, "")
+        return []
+
+    def rules(self, node, selector):
+        items = []
+        declarations = self.declarations(node)
+        if selector and declarations:
+            items.append("{}{{{}}}".format(selector, declarations))
+        for subnode in node:
+            if not _is_rule(subnode):
+                continue
+            key = self.name(str(subnode.key))
+            child = " ".join(filter(None, [selector, key]))
+            items.append(self._deferred(subnode, child))
+        return items
+
+    def declarations(self, node):
+        return ";".join(
+            "{}:{}".format(
+                self.name(str(subnode.path)),
+                self.escape(self.session.text(subnode.value))
+            )
+            for subnode in node
+            if isinstance(subnode, nodes.EqualNode)
+        )
+
+    # selectors and properties are written as they are, so they can't
+    # end a declaration or open and close a block
+    def name(self, name):
+        if SEPARATORS.search(name) is not None:
+            raise MelError("Can't use {!r} as a name in {}".format(
+                name, self.id
+            ))
+        return name
+
+    # values are data: characters that would end the declaration, start a
+    # comment or string, or close a <style> element become CSS escapes
+    def escape(self, text):
+        return UNSAFE.sub(_escape, text)
+
+    def _deferred(self, node, selector):
+        return lambda: self.rules(node, selector)
+
+
+SEPARATORS = re.compile(r"[{};]")
+UNSAFE = re.compile(r"[{};\\\"'<>\n\r\f]|/(?=\*)")
+
+
+def _escape(match):
+    return "\\{:x} ".format(ord(match.group()))
+
+
+def _is_rule(node):
+    if not isinstance(node, nodes.ObjectNode):
+        return False
+    return isinstance(node.key, nodes.PathNode)
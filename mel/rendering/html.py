@@ -0,0 +1,126 @@
+import html
+import re
+
+from .. import nodes
+from ..exceptions import MelError
+from ..importing import is_import
+from .base import Renderer, is_default_format, renderer
+
+
+# objects become elements, relations and tags become attributes and the
+# other values become their content. Text is escaped a whole run at once
+@renderer
+class HTMLRenderer(Renderer):
+    id = "html"
+    void_elements = frozenset([
+        "area", "base", "br", "col", "embed", "hr", "img", "input",
+        "link", "meta", "source", "track", "wbr",
+    ])
+
+    def escape(self, text):
+        return html.escape(text, quote=False)
+
+    def escape_attribute(self, text):
+        return html.escape(text, quote=True)
+
+    # "--" can't appear inside comments, and would end them in html
+    def escape_comment(self, text):
+        return DASHES.sub("- ", self.escape(text))
+
+    # element and attribute names are written as they are, so they must
+    # be names in the format
+    def name(self, name):
+        if NAME.match(name) is None:
+            raise MelError("Can't use {!r} as a name in {}".format(
+                name, self.id
+            ))
+        return name
+
+    def document(self, node):
+        return self.content(node)
+
+    def expand(self, node):
+        if isinstance(node, nodes.ObjectNode):
+            return self.element(node)
+        if isinstance(node, (nodes.RootNode, nodes.ListNode)):
+            return self.content(node)
+        if isinstance(node, nodes.ReferenceNode):
+            return self.reference(node)
+        return [self.escape(self.session.text(node))]
+
+    def content(self, node):
+        return [
+            subnode for subnode in node
+            if not isinstance(subnode, ATTRIBUTES)
+            and not is_default_format(subnode)
+        ]
+
+    def reference(self, node):
+        selection, many = self.session.enter(node)
+        if selection is None:
+            return [id(node)]
+        targets = selection if many else [selection]
+        return list(targets) + [id(node)]
+
+    def element(self, node):
+        key = node.key
+        if isinstance(key, nodes.DefaultFormatKeyNode) or is_import(node):
+            return []
+        if isinstance(key, nodes.AnonymKeyNode):
+            return self.content(node)
+        if _is_doc(key):
+            text = " ".join(self.session.text(sub) for sub in node)
+            return ["<!-- ", self.escape_comment(text), " -->"]
+        name = self.name(str(key))
+        attributes = self.attributes(node)
+        content = self.content(node)
+        if name in self.void_elements:
+            return [self.void_element(name, attributes, content)]
+        if not content:
+            return [self.empty_element(name, attributes)]
+        start = "<{}{}>".format(name, attributes)
+        return [start, content, "</{}>".format(name)]
+
+    def attributes(self, node):
+        attributes = []
+        for subnode in node:
+            if isinstance(subnode, nodes.TagKeywordNode):
+                attributes.append(self.flag(self.name(subnode.value)))
+            elif isinstance(subnode, nodes.RelationNode):
+                value = self.session.text(subnode.value)
+                attributes.append(
+                    self.attribute(self.name(str(subnode.path)), value)
+                )
+        return "".join(attributes)
+
+    def attribute(self, name, value):
+        return ' {}="{}"'.format(name, self.escape_attribute(value))
+
+    def flag(self, name):
+        return " " + name
+
+    # <input type="text" value="42" />
+    def void_element(self, name, attributes, content):
+        if content:
+            value = " ".join(self.session.text(sub) for sub in content)
+            attributes += self.attribute("value", value)
+        return "<{}{} />".format(name, attributes)
+
+    def empty_element(self, name, attributes):
+        return "<{0}{1}></{0}>".format(name, attributes)
+
+
+ATTRIBUTES = (nodes.RelationNode, nodes.TagKeywordNode)
+
+# names valid in both html and xml
+NAME = re.compile(r"[A-Za-z_][-A-Za-z0-9_.:]*\Z")
+# a dash followed by another one
+DASHES = re.compile(r"-(?=-)")
+
+
+def _is_doc(key):
+    if isinstance(key, nodes.DefaultDocKeyNode):
+        return True
+    if isinstance(key, nodes.PathNode) and len(key) == 1:
+        return isinstance(key[0], nodes.DocKeywordNode)
+    return False
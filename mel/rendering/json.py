@@ -0,0 +1,180 @@
+import io
+import json
+
+from .. import nodes
+from ..evaluation import VALUES_KEY
+from ..importing import is_import
+from .base import Renderer, Session, renderer
+from .writer import BufferedWriter
+
+
+MEMBER = "member"
+VALUE = "value"
+RESOLVE = "resolve"
+SOURCE = "source"
+
+# shapes of the members collected from a struct
+SINGLE = "single"
+GROUP = "group"
+CONSTRAINTS = "constraints"
+
+
+# how each kind of expression is written. With the defaults the output
+# matches json.dumps(mel.eval(text)); VALUE moves the expression to the
+# struct values list, SOURCE writes references as their source text
+class Mapping:
+    def __init__(
+        self,
+        objects=MEMBER,
+        relations=MEMBER,
+        tags=MEMBER,
+        references=RESOLVE
+    ):
+        self.objects = objects
+        self.relations = relations
+        self.tags = tags
+        self.references = references
+
+
+# writes a tree as JSON without building the evaluated value
+@renderer
+class JSONRenderer(Renderer):
+    id = "json"
+    nested_formats = False
+
+    def __init__(self, session, mapping=None):
+        super().__init__(session)
+        self.mapping = mapping or Mapping()
+
+    def expand(self, node):
+        if isinstance(node, (nodes.RootNode, nodes.ObjectNode)):
+            return self._struct(node)
+        if isinstance(node, nodes.ListNode):
+            return _sequence(list(node))
+        if isinstance(node, nodes.ReferenceNode):
+            return self._reference(node)
+        if isinstance(node, nodes.TemplateStringNode):
+            return [json.dumps(self.session.evaluate(node))]
+        if isinstance(node, nodes.LiteralNode):
+            return [json.dumps(node.value)]
+        if isinstance(node, nodes.TagKeywordNode):
+            return ["true"]
+        # reached through fan-out references, which select the relations
+        if isinstance(node, nodes.RelationNode):
+            return [node.value]
+        return [json.dumps(str(node))]
+
+    def _struct(self, node):
+        items = ["{"]
+        for key, (shape, payload) in self._members(node).items():
+            if len(items) > 1:
+                items.append(",")
+            items.append(json.dumps(key) + ":")
+            if shape == SINGLE:
+                items.append(payload)
+            elif shape == GROUP:
+                items.extend(_sequence(payload))
+            else:
+                items.extend(_constraints(payload))
+        items.append("}")
+        return items
+
+    # groups the struct expressions by key, in the order evaluation does
+    def _members(self, node):
+        members = {}
+        groups = set()
+        values = []
+        for subnode in node:
+            if is_import(subnode):
+                continue
+            key, item = self._member(subnode)
+            if key is None:
+                values.append(item)
+            elif isinstance(subnode, nodes.EqualNode):
+                members[key] = SINGLE, item
+            elif isinstance(subnode, nodes.RelationNode):
+                shape, payload = members.setdefault(key, (CONSTRAINTS, {}))
+                if shape == CONSTRAINTS:
+                    payload[subnode.sign] = item
+            elif not isinstance(subnode, nodes.ObjectNode):
+                members[key] = SINGLE, item
+            elif key not in members:
+                members[key] = SINGLE, item
+            elif key in groups:
+                members[key][1].append(item)
+            else:
+                members[key] = GROUP, [members[key][1], item]
+                groups.add(key)
+        if values:
+            members.setdefault(VALUES_KEY, (GROUP, values))
+        return members
+
+    def _member(self, node):
+        mapping = self.mapping
+        if isinstance(node, nodes.RelationNode):
+            if mapping.relations == MEMBER:
+                return str(node.path), node.value
+            return None, _raw_object(
+                ("path", json.dumps(str(node.path))),
+                ("sign", json.dumps(node.sign)),
+                ("value", node.value),
+            )
+        if isinstance(node, nodes.TagKeywordNode):
+            if mapping.tags == MEMBER:
+                return str(node), "true"
+            return None, json.dumps(str(node))
+        if isinstance(node, nodes.ObjectNode):
+            if isinstance(node.key, nodes.AnonymKeyNode):
+                return None, node
+            if mapping.objects == MEMBER:
+                return str(node.key), node
+            return None, _raw_object((str(node.key), node))
+        return None, node
+
+    def _reference(self, node):
+        if self.mapping.references == SOURCE:
+            return [json.dumps(str(node))]
+        selection, many = self.session.enter(node)
+        if many:
+            items = _sequence(selection)
+        else:
+            items = ["null" if selection is None else selection]
+        return items + [id(node)]
+
+
+def _sequence(items):
+    sequence = ["["]
+    for item in items:
+        if len(sequence) > 1:
+            sequence.append(",")
+        sequence.append(item)
+    sequence.append("]")
+    return sequence
+
+
+def _constraints(constraints):
+    return _raw_object(*((sign, node) for sign, node in constraints.items()))
+
+
+def _raw_object(*members):
+    items = ["{"]
+    for key, value in members:
+        if len(items) > 1:
+            items.append(",")
+        items.append(json.dumps(key) + ":")
+        items.append(value)
+    items.append("}")
+    return items
+
+
+def dump(tree, file, mapping=None, buffer_size=64 * 1024):
+    mapping = mapping or Mapping()
+    writer = BufferedWriter(file, buffer_size)
+    session = Session(tree, writer, mapping.references == RESOLVE)
+    session.run(JSONRenderer(session, mapping), tree)
+
+
+def dumps(tree, mapping=None):
+    file = io.StringIO()
+    dump(tree, file, mapping)
+    return file.getvalue()
@@ -0,0 +1,19 @@
+# collects small writes and hands them to the file in large chunks
+class BufferedWriter:
+    def __init__(self, file, size=64 * 1024):
+        self.file = file
+        self.size = size
+        self._chunks = []
+        self._length = 0
+
+    def write(self, text):
+        self._chunks.append(text)
+        self._length += len(text)
+        if self._length >= self.size:
+            self.flush()
+
+    def flush(self):
+        if self._chunks:
+            self.file.write("".join(self._chunks))
+        self._chunks.clear()
+        self._length = 0
@@ -0,0 +1,22 @@
+from xml.sax.saxutils import escape, quoteattr
+
+from .base import renderer
+from .html import HTMLRenderer
+
+
+@renderer
+class XMLRenderer(HTMLRenderer):
+    id = "xml"
+    void_elements = frozenset()
+
+    def escape(self, text):
+        return escape(text)
+
+    def attribute(self, name, value):
+        return " {}={}".format(name, quoteattr(value))
+
+    def flag(self, name):
+        return self.attribute(name, "true")
+
+    def empty_element(self, name, attributes):
+        return "<{}{}/>".format(name, attributes)
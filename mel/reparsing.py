@@ -0,0 +1,164 @@
+import mel
+from . import nodes
+from .exceptions import ParsingError
+from .lexing import TokenStream
+from .parsing import Parser
+
+
+# characters lexed as whitespace between top level expressions
+GAP = frozenset(" \t\f\v\r\n;,")
+
+
+# A parsed text kept up to date by reparsing only the top level
+# expressions an edit touched. Expressions before the edit keep their
+# index, since their slice of the text didn't change, and the ones after
+# it are shifted. Both are updated in place and read the new text, so
+# trees returned by earlier updates are invalidated by the next one and
+# should be copied to be kept. Edits that can't be confined to a region,
+# such as an opened string running past it, are parsed in full, raising
+# MelError and keeping the last tree when the new text doesn't parse
+class Document:
+    def __init__(self, text, Parser=Parser):
+        self.Parser = Parser
+        self._replace(text, self.parse(text))
+
+    # parses a whole text, when an edit can't be confined to a region
+    def parse(self, text):
+        return mel.parse(text, self.Parser)
+
+    def update(self, text):
+        if text == self.text:
+            return self.tree
+        expressions = list(self.tree)
+        first, last = _region(expressions, self.text, text)
+        delta = len(text) - len(self.text)
+        start = expressions[first].index[0] if first > 0 else 0
+        end = len(text)
+        if last < len(expressions):
+            end = expressions[last - 1].index[1] + delta
+        try:
+            reparsed = _parse_region(text, start, end, self.Parser)
+        except ParsingError:
+            return self._replace(text, self.parse(text))
+        for expression in expressions[first:last]:
+            del self._subtrees[id(expression)]
+        for expression in expressions[:first]:
+            _move(self._subtrees[id(expression)], text, 0)
+        for expression in reparsed:
+            subtree = self._subtrees[id(expression)] = _subtree(expression)
+            _move(subtree, text, start)
+        for expression in expressions[last:]:
+            _move(self._subtrees[id(expression)], text, delta)
+        root = nodes.RootNode()
+        root.add(*expressions[:first], *reparsed, *expressions[last:])
+        root.text = text
+        if len(root):
+            root.index = root[0].index[0], root[-1].index[1]
+        else:
+            root.index = len(text), len(text)
+        self.text = text
+        self.tree = root
+        return root
+
+    def _replace(self, text, tree):
+        self.text = text
+        self.tree = tree
+        # nodes of each top level expression, by expression id
+        self._subtrees = {
+            id(expression): _subtree(expression) for expression in tree
+        }
+        return tree
+
+
+# range of top level expressions to reparse: the ones around the edit
+# and their neighbours, widened until gaps bound it
+def _region(expressions, old_text, text):
+    change_start, change_end = _changed_span(old_text, text)
+    first = 0
+    while first < len(expressions) - 1 and \
+            expressions[first + 1].index[0] < change_start:
+        first += 1
+    last = first
+    while last < len(expressions) and \
+            expressions[last].index[0] <= change_end:
+        last += 1
+    first = max(first - 1, 0)
+    last = min(last + 1, len(expressions))
+    while first > 0 and not _gap_before(expressions[first], old_text):
+        first -= 1
+    while last < len(expressions) and \
+            not _gap_after(expressions[last - 1], old_text):
+        last += 1
+    return first, last
+
+
+# the span of old_text replaced by the edit. Slices are compared in
+# halving steps, which is quicker than comparing characters one by one
+def _changed_span(old_text, text):
+    limit = min(len(old_text), len(text))
+    prefix = _common_length(
+        lambda size: old_text[:size] == text[:size], limit
+    )
+    suffix = _common_length(
+        lambda size: old_text[len(old_text) - size:] ==
+        text[len(text) - size:],
+        limit - prefix
+    )
+    return prefix, len(old_text) - suffix
+
+
+def _common_length(matches, limit):
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if matches(middle):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _gap_before(node, text):
+    start = node.index[0]
+    return start == 0 or text[start - 1] in GAP
+
+
+def _gap_after(node, text):
+    end = node.index[1]
+    return end == len(text) or text[end] in GAP
+
+
+# the expressions of text[start:end], indexed from start. Regions ending
+# before the text must end on a token, or a comment or string may run
+# past them
+def _parse_region(text, start, end, Parser):
+    source = text[start:end]
+    stream = TokenStream(source)
+    root = Parser(stream).parse()
+    if end < len(text):
+        if not stream.tokens or stream.tokens[-1].index[1] != len(source):
+            raise ParsingError(stream.peek(-1))
+    return list(root)
+
+
+def _move(subtree, text, delta):
+    for node in subtree:
+        start, end = node.index
+        node.index = start + delta, end + delta
+        node.text = text
+
+
+# the nodes of an expression sharing its text
+def _subtree(expression):
+    text = expression.text
+    found = []
+    seen = set()
+    stack = [expression]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen or node.text is not text:
+            continue
+        seen.add(id(node))
+        found.append(node)
+        stack.extend(nodes.children(node))
+    return found
@@ -0,0 +1,217 @@
+import operator
+
+from . import nodes
+
+
+# relation nodes as comparisons between an object value and a query value
+OPERATORS = {
+    nodes.EqualNode: operator.eq,
+    nodes.DifferentNode: operator.ne,
+    nodes.GreaterThanNode: operator.gt,
+    nodes.GreaterThanEqualNode: operator.ge,
+    nodes.LessThanNode: operator.lt,
+    nodes.LessThanEqualNode: operator.le,
+    nodes.InNode: lambda value, options: value in options,
+    nodes.NotInNode: lambda value, options: value not in options,
+}
+
+# sub-references that select many nodes at once
+FAN_OUT = (
+    nodes.QueryNode,
+    nodes.WildcardNode,
+    nodes.RangeNode,
+    nodes.ListNode,
+)
+
+
+# containers whose subnodes aren't values in a scope
+UNSCOPED = (nodes.ReferenceNode, nodes.PathNode)
+
+
+# query subnodes that filter objects instead of being default values
+FILTERS = (nodes.RelationNode, nodes.TagKeywordNode)
+
+
+# resolves references against a scope, returning the target node, a
+# NodeView over a container's subnodes or a generator when the reference
+# fans out (wildcards, ranges, lists). Nothing is copied: chains like
+# catalog/*/images/0..3 are only walked as the result is consumed
+class ReferenceResolver:
+    def __init__(self, scope, imports=()):
+        self.scope = scope
+        # roots of imported documents, searched after scope
+        self.imports = imports
+
+    # keyword heads are looked up from the innermost scope outwards, then
+    # in the imported roots. Queries always search the outermost scope
+    def resolve(self, reference, scopes=()):
+        head = reference[0]
+        selection, many = None, False
+        if not isinstance(head, nodes.QueryNode):
+            for scope in (*scopes, self.scope, *self.imports):
+                selection, many = self.select(scope, head)
+                if selection is not None:
+                    break
+        else:
+            selection, many = self.select(self.scope, head)
+        for step in reference[1:]:
+            if selection is None:
+                return
+            if many:
+                selection = self._expand(selection, step)
+            else:
+                selection, many = self.select(selection, step)
+        return selection
+
+    def lookup(self, scope, keyword):
+        if not isinstance(scope, nodes.ContainerNode):
+            return
+        for node in scope:
+            if isinstance(node, nodes.ObjectNode):
+                if _path_matches(node.key, keyword):
+                    return node
+            elif isinstance(node, nodes.EqualNode):
+                if _path_matches(node.path, keyword):
+                    return node.value
+            elif isinstance(node, nodes.TagKeywordNode):
+                if _keyword_matches(node, keyword):
+                    return node
+
+    # objects in scope matching the query key and relations. The query
+    # values are defaults, returned when nothing matches
+    def query(self, scope, query):
+        found = False
+        for node in _objects(scope, query.key):
+            if all(_satisfies(node, constraint) for constraint in query):
+                found = True
+                yield node
+        if found:
+            return
+        for node in query:
+            if not isinstance(node, FILTERS):
+                yield node
+
+    def select(self, node, step):
+        if isinstance(step, nodes.KeywordNode):
+            return self.lookup(node, step), False
+        if not isinstance(node, nodes.ContainerNode):
+            return None, False
+        if isinstance(step, nodes.QueryNode):
+            return self.query(node, step), True
+        if isinstance(step, nodes.WildcardNode):
+            return node.view(), True
+        if isinstance(step, nodes.RangeNode):
+            return node[step.slice()], True
+        if isinstance(step, nodes.IntNode):
+            return _item(node, step.value), False
+        if isinstance(step, nodes.ListNode):
+            return self._lookup_many(node, step), True
+        return None, False
+
+    def _expand(self, selection, step):
+        for node in selection:
+            result, many = self.select(node, step)
+            if result is None:
+                continue
+            if many:
+                yield from result
+            else:
+                yield result
+
+    def _lookup_many(self, node, _list):
+        for item in _list:
+            if not isinstance(item, nodes.ReferenceNode) or len(item) > 1:
+                continue
+            result = self.lookup(node, item[0])
+            if result is not None:
+                yield result
+
+
+# maps the id of every value node to its parent, for scoped lookups
+def link_parents(root):
+    parents = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, nodes.RelationNode):
+            children = [node.value]
+        elif isinstance(node, UNSCOPED):
+            continue
+        elif isinstance(node, nodes.ContainerNode):
+            children = node
+        else:
+            continue
+        for child in children:
+            parents[id(child)] = node
+            stack.append(child)
+    return parents
+
+
+# the structs enclosing a node, innermost first
+def enclosing_scopes(parents, node):
+    while id(node) in parents:
+        node = parents[id(node)]
+        if isinstance(node, nodes.KeyStructNode):
+            yield node
+
+
+def fans_out(reference):
+    return any(isinstance(step, FAN_OUT) for step in reference)
+
+
+def _item(node, index):
+    try:
+        return node[index]
+    except IndexError:
+        return
+
+
+def _objects(scope, key):
+    if not isinstance(scope, nodes.ContainerNode):
+        return
+    anonym = isinstance(key, nodes.AnonymKeyNode)
+    for node in scope:
+        if not isinstance(node, nodes.ObjectNode):
+            continue
+        if anonym or str(node.key) == str(key):
+            yield node
+
+
+def _satisfies(_object, constraint):
+    if isinstance(constraint, nodes.TagKeywordNode):
+        return any(
+            isinstance(node, nodes.TagKeywordNode)
+            and _keyword_matches(node, constraint)
+            for node in _object
+        )
+    if not isinstance(constraint, nodes.RelationNode):
+        return True
+    compare = OPERATORS[type(constraint)]
+    for node in _object:
+        if not isinstance(node, nodes.EqualNode):
+            continue
+        if str(node.path) != str(constraint.path):
+            continue
+        try:
+            return compare(_literal(node.value), _literal(constraint.value))
+        except TypeError:
+            return False
+    return False
+
+
+def _literal(node):
+    if isinstance(node, nodes.LiteralNode):
+        return node.value
+    if isinstance(node, nodes.ListNode):
+        return [_literal(item) for item in node]
+    return str(node)
+
+
+def _path_matches(path, keyword):
+    if not isinstance(path, nodes.PathNode) or len(path) != 1:
+        return False
+    return _keyword_matches(path[0], keyword)
+
+
+def _keyword_matches(node, keyword):
+    return node.id == keyword.id and node.value == keyword.value
@@ -0,0 +1,177 @@
+import io
+import json
+import os
+import socket
+import socketserver
+import stat
+import threading
+import time
+
+import mel
+from . import compiling, metrics
+from .exceptions import MelError
+from .utils.cache import Cache
+
+
+DEFAULT_IDLE_TIMEOUT = 600
+
+
+# renders documents for clients of a Unix socket, keeping the grammar,
+# renderers and parsed trees warm between requests. Each client sends a
+# JSON line with a "path" or a "text" and an optional "format", and gets
+# back a JSON line with the "output", as bin/mel prints it, or an
+# "error". The server shuts down after idle_timeout seconds without
+# clients. Documents parsed past limits get an error, leaving the server
+# free for the next ones.
+#
+# Clients are trusted with every file the server's user can read, so the
+# socket is only open to that user, from the moment it is created
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, path, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 parse_cache=None, trees=256, limits=None):
+        _remove_stale_socket(path)
+        super().__init__(path, RequestHandler)
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.parse_cache = parse_cache
+        self.trees = Cache(maxsize=trees)
+        self.limits = limits
+        metrics.track_cache("server trees", self.trees)
+        if parse_cache is not None:
+            metrics.track_cache("parse", parse_cache)
+        self._clients = 0
+        self._last_request = time.monotonic()
+        self._lock = threading.Lock()
+
+    def server_bind(self):
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+    def serve_forever(self, poll_interval=0.5):
+        if self.idle_timeout is not None:
+            watcher = threading.Thread(target=self._watch_idle, daemon=True)
+            watcher.start()
+        try:
+            super().serve_forever(poll_interval)
+        finally:
+            self.server_close()
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def respond(self, line):
+        try:
+            request = json.loads(line)
+            return {"output": self.render(request)}
+        except MelError as error:
+            return {"error": str(error)}
+        except OSError as error:
+            return {"error": "Can't read {!r}".format(error.filename)}
+        except (ValueError, KeyError, TypeError) as error:
+            return {"error": "Bad request: {}".format(error)}
+
+    def render(self, request):
+        file = io.StringIO()
+        mel.show(
+            self.tree(request), file, request.get("format"),
+            path=request.get("path")
+        )
+        return file.getvalue()
+
+    # parsed trees are kept while their source is unchanged
+    def tree(self, request):
+        if "text" in request:
+            text = request["text"]
+            key = "text", compiling.source_hash(text)
+            return self.trees.fetch(key, lambda: self._parse(text))
+        path = request["path"]
+        stat = os.stat(path)
+        key = "path", path, stat.st_mtime_ns, stat.st_size
+        cache = request.get("cache", True)
+        return self.trees.fetch(key, lambda: self._parse_file(path, cache))
+
+    def enter(self):
+        with self._lock:
+            self._clients += 1
+
+    def leave(self):
+        with self._lock:
+            self._clients -= 1
+            self._last_request = time.monotonic()
+
+    def _parse(self, text):
+        tree = mel.parse(text, cache=self.parse_cache, limits=self.limits)
+        return compiling.materialize(tree)
+
+    def _parse_file(self, path, cache):
+        parse_cache = self.parse_cache if cache else None
+        tree = mel.parse_file(path, cache, parse_cache, self.limits)
+        return compiling.materialize(tree)
+
+    def _watch_idle(self):
+        while True:
+            time.sleep(min(self.idle_timeout, 1))
+            with self._lock:
+                idle = time.monotonic() - self._last_request
+                if self._clients == 0 and idle >= self.idle_timeout:
+                    break
+        self.shutdown()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        self.server.enter()
+        try:
+            response = self.server.respond(line)
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+        finally:
+            self.server.leave()
+
+
+# a socket left by a server that didn't exit cleanly. Other files are
+# left in place
+def _remove_stale_socket(path):
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise MelError("{!r} exists and isn't a socket".format(path))
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise MelError("A server is already listening on {!r}".format(path))
+    finally:
+        client.close()
+
+
+def serve(path, idle_timeout=DEFAULT_IDLE_TIMEOUT, parse_cache=None,
+          limits=None):
+    with Server(path, idle_timeout, parse_cache, limits=limits) as server:
+        server.serve_forever()
+
+
+# sends one request to a server, returning its response
+def request(path, payload, timeout=None):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(path)
+        client.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+        with client.makefile("rb") as file:
+            return json.loads(file.readline())
@@ -0,0 +1,55 @@
+from multiprocessing import shared_memory
+
+from .compiling import Reader, dumps
+
+
+# a compiled tree in shared memory, read through read only views of the
+# segment. The buffer is stored once per machine, while each process
+# decodes its own copy of the source text and builds the nodes it
+# reaches. Nodes not built yet can't be read once the tree is closed
+class SharedTree:
+    def __init__(self, name, buffer, on_close):
+        self.name = name
+        self._reader = Reader(buffer)
+        self._on_close = on_close
+
+    @property
+    def tree(self):
+        return self._reader.root()
+
+    def close(self):
+        if self._reader is None:
+            return
+        self._reader.release()
+        self._reader = None
+        self._on_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# the publisher owns the segment and removes it on closing
+def publish(tree, name=None):
+    data = dumps(tree)
+    memory = shared_memory.SharedMemory(name, create=True, size=len(data))
+    memory.buf[:len(data)] = data
+
+    def close():
+        memory.close()
+        memory.unlink()
+
+    return SharedTree(memory.name, memory.buf.toreadonly(), close)
+
+
+# only the publisher removes the segment. Before Python 3.13 attaching
+# registers it with the resource tracker too, which is shared with the
+# workers multiprocessing starts, so it isn't removed when they exit
+def attach(name):
+    try:
+        memory = shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        memory = shared_memory.SharedMemory(name)
+    return SharedTree(name, memory.buf.toreadonly(), memory.close)
@@ -0,0 +1,78 @@
+import functools
+import re
+
+from .lexing import TokenStream
+from .parsing.constants import REFERENCE
+from .parsing.base import ParserMap
+from .exceptions import ParsingError
+
+
+# {{ and }} are escaped braces, {path/to/value} is a reference segment
+SEGMENT = re.compile(r"\{\{|\}\}|\{([^{}]*)\}")
+ESCAPES = {"{{": "{", "}}": "}"}
+
+
+# template strings compiled into literal parts and reference slots.
+# Slots that aren't references raise a ParsingError indexed in source
+class Template:
+    def __init__(self, source):
+        self.source = source
+        self.parts = []
+        self.slots = []
+        # index in source of each slot's reference
+        self.offsets = []
+        self._compile()
+
+    def __repr__(self):
+        return "TEMPLATE({!r})".format(self.source)
+
+    def render(self, resolve):
+        if not self.slots:
+            return self.parts[0] if self.parts else ""
+        parts = self.parts[:]
+        for index, reference in self.slots:
+            parts[index] = resolve(reference)
+        return "".join(parts)
+
+    def _compile(self):
+        literal = []
+        position = 0
+        for match in SEGMENT.finditer(self.source):
+            literal.append(self.source[position:match.start()])
+            position = match.end()
+            if match.group(1) is None:
+                literal.append(ESCAPES[match.group()])
+                continue
+            self._add_literal(literal)
+            offset = match.start(1) + len(match[1]) - len(match[1].lstrip())
+            self.slots.append(
+                (len(self.parts), _parse_reference(match[1], offset))
+            )
+            self.offsets.append(offset)
+            self.parts.append("")
+        literal.append(self.source[position:])
+        self._add_literal(literal)
+
+    def _add_literal(self, literal):
+        text = "".join(literal)
+        literal.clear()
+        if text:
+            self.parts.append(text)
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_template(source):
+    return Template(source)
+
+
+def _parse_reference(text, offset):
+    try:
+        stream = TokenStream(text.strip())
+        Parser = ParserMap.get(REFERENCE)
+        reference = Parser(stream).parse()
+        if not stream.is_eof():
+            stream.error(ParsingError)
+    except ParsingError as error:
+        error.index += offset
+        raise error
+    return reference
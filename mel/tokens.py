@@ -2,6 +2,21 @@ import re
 import functools
 
 
+# compiles its pattern the first time it is read, replacing itself in
+# the class with the compiled regex
+class LazyRegex:
+    def __init__(self, pattern):
+        self.pattern = pattern
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        regex = re.compile(self.pattern)
+        setattr(owner, self.name, regex)
+        return regex
+
+
 @functools.lru_cache()
 def subclasses():
     subclasses = Token.__subclasses__()
@@ -42,7 +57,7 @@ class Token:
 
 class NullToken(Token):
     id = "null"
-    regex = re.compile(r"\0")
+    regex = LazyRegex(r"\0")
 
     def __init__(self, text="", index=None):
         super().__init__(text, index or (0, 0))
@@ -50,13 +65,13 @@ class NullToken(Token):
 
 class WhitespaceToken(Token):
     id = "whitespace"
-    regex = re.compile(r"([^\S\n\r]|;|,)+")
+    regex = LazyRegex(r"([^\S\n\r]|;|,)+")
     skip = True
 
 
 class NewlineToken(Token):
     id = "newline"
-    regex = re.compile(r"\r|\r?\n")
+    regex = LazyRegex(r"\r|\r?\n")
     skip = True
 
     @property
@@ -66,14 +81,14 @@ class NewlineToken(Token):
 
 class CommentToken(Token):
     id = "comment"
-    regex = re.compile(r"--[^\n\r]*")
+    regex = LazyRegex(r"--[^\n\r]*")
     priority = 2
     skip = True
 
 
 class StringToken(Token):
     id = "string"
-    regex = re.compile(r"'[^']*'")
+    regex = LazyRegex(r"'[^']*'")
 
     @property
     def value(self):
@@ -86,7 +101,7 @@ class StringToken(Token):
 
 class TemplateStringToken(Token):
     id = "template-string"
-    regex = re.compile(r'"[^"]*"')
+    regex = LazyRegex(r'"[^"]*"')
 
     @property
     def value(self):
@@ -99,7 +114,7 @@ class TemplateStringToken(Token):
 
 class FloatToken(Token):
     id = "float"
-    regex = re.compile(r"-?\d*\.\d+([eE][-+]?\d+)?\b")
+    regex = LazyRegex(r"-?\d*\.\d+([eE][-+]?\d+)?\b")
     priority = 1
 
     @property
@@ -109,7 +124,7 @@ class FloatToken(Token):
 
 class IntToken(Token):
     id = "int"
-    regex = re.compile(r"-?\d+\b")
+    regex = LazyRegex(r"-?\d+\b")
 
     @property
     def value(self):
@@ -118,7 +133,7 @@ class IntToken(Token):
 
 class BooleanToken(Token):
     id = "boolean"
-    regex = re.compile(r"([tT]rue|[fF]alse)\b")
+    regex = LazyRegex(r"([tT]rue|[fF]alse)\b")
     priority = 1
 
     @property
@@ -129,152 +144,152 @@ class BooleanToken(Token):
 
 class NameToken(Token):
     id = "name"
-    regex = re.compile(r"[a-z]\w*")
+    regex = LazyRegex(r"[a-z]\w*")
 
 
 class ConceptToken(Token):
     id = "concept"
-    regex = re.compile(r"[A-Z]\w*")
+    regex = LazyRegex(r"[A-Z]\w*")
 
 
 class LogPrefixToken(Token):
     id = "!"
-    regex = re.compile(r"!")
+    regex = LazyRegex(r"!")
 
 
 class AliasPrefixToken(Token):
     id = "@"
-    regex = re.compile(r"@")
+    regex = LazyRegex(r"@")
 
 
 class CachePrefixToken(Token):
     id = "$"
-    regex = re.compile(r"\$")
+    regex = LazyRegex(r"\$")
 
 
 class TagPrefixToken(Token):
     id = "#"
-    regex = re.compile(r"#")
+    regex = LazyRegex(r"#")
 
 
 class FormatPrefixToken(Token):
     id = "%"
-    regex = re.compile(r"%")
+    regex = LazyRegex(r"%")
 
 
 class DefaultFormatKeyToken(Token):
     id = "%:"
-    regex = re.compile(r"%:")
+    regex = LazyRegex(r"%:")
     priority = 1
 
 
 class DocPrefixToken(Token):
     id = "?"
-    regex = re.compile(r"\?")
+    regex = LazyRegex(r"\?")
 
 
 class DefaultDocKeyToken(Token):
     id = "?:"
-    regex = re.compile(r"\?:")
+    regex = LazyRegex(r"\?:")
     priority = 1
 
 
 class ChildPathToken(Token):
     id = "/"
-    regex = re.compile(r"/")
+    regex = LazyRegex(r"/")
 
 
 class MetaNodeToken(Token):
     id = "."
-    regex = re.compile(r"\.")
+    regex = LazyRegex(r"\.")
 
 
 class RangeToken(Token):
     id = ".."
-    regex = re.compile(r"\.\.")
+    regex = LazyRegex(r"\.\.")
     priority = 1
 
 
 class AnonymKeyToken(Token):
     id = ":"
-    regex = re.compile(r":")
+    regex = LazyRegex(r":")
 
 
 class EqualToken(Token):
     id = "="
-    regex = re.compile(r"=")
+    regex = LazyRegex(r"=")
 
 
 class DifferentToken(Token):
     id = "!="
-    regex = re.compile(r"!=")
+    regex = LazyRegex(r"!=")
     priority = 1
 
 
 class GreaterThanToken(Token):
     id = ">"
-    regex = re.compile(r">")
+    regex = LazyRegex(r">")
 
 
 class GreaterThanEqualToken(Token):
     id = ">="
-    regex = re.compile(r">=")
+    regex = LazyRegex(r">=")
     priority = 1
 
 
 class LessThanToken(Token):
     id = "<"
-    regex = re.compile(r"<")
+    regex = LazyRegex(r"<")
 
 
 class LessThanEqualToken(Token):
     id = "<="
-    regex = re.compile(r"<=")
+    regex = LazyRegex(r"<=")
     priority = 1
 
 
 class InToken(Token):
     id = "><"
-    regex = re.compile(r"><")
+    regex = LazyRegex(r"><")
     priority = 1
 
 
 class NotInToken(Token):
     id = "<>"
-    regex = re.compile(r"<>")
+    regex = LazyRegex(r"<>")
     priority = 1
 
 
 class WildcardToken(Token):
     id = "*"
-    regex = re.compile(r"\*")
+    regex = LazyRegex(r"\*")
 
 
 class StartObjectToken(Token):
     id = "("
-    regex = re.compile(r"\(")
+    regex = LazyRegex(r"\(")
 
 
 class EndObjectToken(Token):
     id = ")"
-    regex = re.compile(r"\)")
+    regex = LazyRegex(r"\)")
 
 
 class StartQueryToken(Token):
     id = "{"
-    regex = re.compile(r"\{")
+    regex = LazyRegex(r"\{")
 
 
 class EndQueryToken(Token):
     id = "}"
-    regex = re.compile(r"\}")
+    regex = LazyRegex(r"\}")
 
 
 class StartListToken(Token):
     id = "["
-    regex = re.compile(r"\[")
+    regex = LazyRegex(r"\[")
 
 
 class EndListToken(Token):
     id = "]"
-    regex = re.compile(r"\]")
+    regex = LazyRegex(r"\]")
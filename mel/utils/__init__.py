@@ -1,3 +1,9 @@
+from .cache import Cache
+from .locks import StripedLock  # noqa
+from ..evaluation import EvaluatorMap
+from ..importing import default_importer
+
+
 class Index:  # pragma: nocover
     def __init__(self, start=0, end=None):
         self.start = start
@@ -7,9 +13,28 @@ class Index:  # pragma: nocover
         return all([self.start, self.end])
 
 
+# state shared by many evaluations, possibly from many threads at once:
+# the $cache entries, and the importer's parsed modules. Both guard
+# themselves with striped locks. The grammar is compiled once per process
+# on import and only read after that
+class Environment:
+    def __init__(self, cache=None, importer=None):
+        self.cache = Cache() if cache is None else cache
+        self.importer = importer or default_importer()
+
+
+# state of a single evaluation. A context may be reused by later
+# evaluations, but must not be shared by concurrent ones
 class Context:
-    def __init__(self):
+    def __init__(self, environment=None):
+        self.environment = environment or Environment()
         self.tree = {}
-        self.evaluators = {}
+        self.evaluators = EvaluatorMap.table()
         self.text = ""
         self.stream = None
+        # source of the tree, imports are relative to it
+        self.path = None
+
+    @property
+    def cache(self):
+        return self.environment.cache
@@ -0,0 +1,141 @@
+import collections
+import threading
+import time
+
+from .locks import StripedLock
+
+
+CacheInfo = collections.namedtuple(
+    "CacheInfo", ["hits", "misses", "maxsize", "currsize"]
+)
+
+
+# sentinel - tells a cached None apart from a missing key
+_MISSING = object()
+
+
+# LRU cache with optional TTL, backed by an optional persistent store.
+# Safe to share between threads: entries are guarded by one short lived
+# lock and fetch computes each key once, holding only that key's stripe
+class Cache:
+    def __init__(self, maxsize=128, ttl=None, backend=None, clock=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.RLock()
+        self._stripes = StripedLock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key) is not _MISSING
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        with self._lock:
+            self._store(key, value, expires)
+            if self.backend:
+                self.backend.set(key, value, expires)
+
+    def fetch(self, key, compute):
+        with self._stripes[key]:
+            value = self.get(key, _MISSING)
+            if value is _MISSING:
+                value = compute()
+                self.set(key, value)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+            if self.backend:
+                self.backend.clear()
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self))
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None and self.backend:
+            entry = self.backend.get(key)
+            if entry is not None:
+                self._store(key, *entry)
+        if entry is None:
+            return _MISSING
+        value, expires = entry
+        if expires is not None and expires <= self.clock():
+            self._entries.pop(key, None)
+            if self.backend:
+                self.backend.delete(key)
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key, value, expires):
+        self._entries[key] = value, expires
+        self._entries.move_to_end(key)
+        if self.maxsize is None:
+            return
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+# persistent backend - entries survive between processes and builds.
+# sqlite3 and pickle are slow to import, so they are imported on use
+class SqliteBackend:
+    def __init__(self, path):
+        import sqlite3
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key TEXT PRIMARY KEY, value BLOB, expires REAL)"
+        )
+        self._db.commit()
+
+    def get(self, key):
+        import pickle
+        row = self._db.execute(
+            "SELECT value, expires FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return
+        value, expires = row
+        return pickle.loads(value), expires
+
+    def set(self, key, value, expires):
+        import pickle
+        self._db.execute(
+            "REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value), expires)
+        )
+        self._db.commit()
+
+    def delete(self, key):
+        self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+        self._db.commit()
+
+    def clear(self):
+        self._db.execute("DELETE FROM cache")
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
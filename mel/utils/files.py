@@ -0,0 +1,33 @@
+import os
+
+
+# directories holding generated files rather than sources
+SKIPPED_DIRECTORIES = frozenset(["__melcache__", "__pycache__"])
+
+
+# the file at path, or the files under it when it's a directory, in a
+# stable order. Hidden files and the directories in skipped are left out
+def source_files(path, skipped=()):
+    if not os.path.isdir(path):
+        return [path]
+    skipped = {os.path.abspath(directory) for directory in skipped}
+    found = []
+    for directory, directories, files in os.walk(path):
+        directories[:] = sorted(
+            name for name in directories
+            if not _hidden(name) and name not in SKIPPED_DIRECTORIES
+            and os.path.abspath(os.path.join(directory, name)) not in skipped
+        )
+        found.extend(
+            os.path.join(directory, name)
+            for name in sorted(files) if not _hidden(name)
+        )
+    return found
+
+
+def signature(stat):
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _hidden(name):
+    return name.startswith(".")
@@ -0,0 +1,14 @@
+import threading
+
+
+# a fixed pool of locks shared by keys of the same hash bucket, so keys
+# don't contend on one global lock and no lock is created per key
+class StripedLock:
+    def __init__(self, stripes=16):
+        self._locks = [threading.RLock() for _ in range(stripes)]
+
+    def __len__(self):
+        return len(self._locks)
+
+    def __getitem__(self, key):
+        return self._locks[hash(key) % len(self._locks)]
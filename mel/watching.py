@@ -0,0 +1,76 @@
+import os
+import threading
+
+from .exceptions import MelError
+from .parsing import Parser
+from .reparsing import Document
+from .utils.files import signature, source_files
+
+
+DEFAULT_INTERVAL = 0.2
+
+
+# keeps the trees of a file, or of every file under a directory, up to
+# date by polling their modification times. Changed files are reread and
+# reparsed incrementally, then on_change gets each path with its new tree
+# or with the MelError raised by its text
+class Watcher:
+    def __init__(self, path, on_change, interval=DEFAULT_INTERVAL,
+                 Parser=Parser):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self.Parser = Parser
+        self.documents = {}
+        self._signatures = {}
+        self._stopped = threading.Event()
+
+    def run(self):
+        self.poll()
+        while not self._stopped.wait(self.interval):
+            self.poll()
+
+    def stop(self):
+        self._stopped.set()
+
+    # the paths changed since the last poll, all of them on the first
+    def poll(self):
+        signatures = {}
+        for path in self.paths():
+            try:
+                signatures[path] = signature(os.stat(path))
+            except OSError:
+                pass
+        for path in set(self.documents) - set(signatures):
+            del self.documents[path]
+        changed = sorted(
+            path for path, current in signatures.items()
+            if self._signatures.get(path) != current
+        )
+        self._signatures = signatures
+        for path in changed:
+            self._update(path)
+        return changed
+
+    def paths(self):
+        return source_files(self.path)
+
+    def _update(self, path):
+        try:
+            with open(path, "r") as file:
+                text = file.read()
+        except (OSError, UnicodeDecodeError):
+            # read again on the next poll
+            self._signatures.pop(path, None)
+            return
+        try:
+            if path in self.documents:
+                tree = self.documents[path].update(text)
+            else:
+                document = Document(text, self.Parser)
+                self.documents[path] = document
+                tree = document.tree
+        except MelError as error:
+            self.on_change(path, error)
+        else:
+            self.on_change(path, tree)
@@ -0,0 +1,166 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import mel
+from mel import aio
+from mel.exceptions import BusyError, LimitError, MelError
+from mel.limits import Limits
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def stream(*chunks):
+    async def create():
+        reader = asyncio.StreamReader()
+        for chunk in chunks:
+            reader.feed_data(chunk)
+        reader.feed_eof()
+        return reader
+    return create()
+
+
+# blocks executor threads until released
+class Gate:
+    def __init__(self):
+        self.event = threading.Event()
+
+    def wait(self, value):
+        self.event.wait(5)
+        return value
+
+
+# API ===========================================
+
+def test_parse_returns_tree():
+    tree = run(aio.parse("(a b=1)"))
+    assert str(tree[0]) == "(a b=1)"
+
+
+def test_eval_returns_value():
+    assert run(aio.eval("(a b=1)")) == {"a": {"b": 1}}
+
+
+def test_eval_takes_limits():
+    with pytest.raises(LimitError):
+        run(aio.eval("(a b=1)", limits=Limits(max_tokens=3)))
+
+
+def test_parse_file(tmp_path):
+    path = tmp_path / "doc.mel"
+    path.write_text("(a)")
+    tree = run(aio.parse_file(str(path)))
+    assert str(tree) == "(a)"
+
+
+def test_errors_are_raised_in_the_caller():
+    with pytest.raises(MelError):
+        run(aio.parse("(a"))
+
+
+def test_process_executor():
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        runner = aio.Runner(executor)
+        assert run(aio.eval("(a b=1)", runner=runner)) == {"a": {"b": 1}}
+
+
+def test_process_executor_parses_cached_files(tmp_path):
+    path = tmp_path / "a.mel"
+    path.write_text("(a (b c=1))")
+    mel.parse_file(str(path))
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        runner = aio.Runner(executor)
+        tree = run(aio.parse_file(str(path), runner=runner))
+    assert str(tree[0][0]) == "(b c=1)"
+
+
+# STREAMS ===========================================
+
+def test_parse_stream_reads_every_chunk():
+    async def parse():
+        reader = await stream(b"(a ", "n='\xe9".encode()[:-1],
+                              "\xe9".encode()[-1:] + b"')")
+        return await aio.parse_stream(reader)
+    tree = run(parse())
+    assert str(tree) == "(a n='\xe9')"
+
+
+def test_parse_stream_limits_size():
+    async def parse():
+        reader = await stream(b"(a)" * 10)
+        return await aio.parse_stream(reader, max_size=10)
+    with pytest.raises(MelError):
+        run(parse())
+
+
+# BACKPRESSURE ===========================================
+
+def test_jobs_over_limit_wait_for_a_slot():
+    gate = Gate()
+    runner = aio.Runner(limit=1)
+
+    async def main():
+        first = asyncio.ensure_future(runner.run(gate.wait, 1))
+        second = asyncio.ensure_future(runner.run(gate.wait, 2))
+        await asyncio.sleep(0.05)
+        assert runner._waiting == 1
+        gate.event.set()
+        return await asyncio.gather(first, second)
+
+    assert run(main()) == [1, 2]
+    runner.shutdown()
+
+
+def test_jobs_over_max_waiting_are_refused():
+    gate = Gate()
+    runner = aio.Runner(limit=1, max_waiting=1)
+
+    async def main():
+        jobs = [asyncio.ensure_future(runner.run(gate.wait, i))
+                for i in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(BusyError):
+            await runner.run(gate.wait, 3)
+        gate.event.set()
+        return await asyncio.gather(*jobs)
+
+    assert run(main()) == [0, 1]
+    runner.shutdown()
+
+
+def test_timeout_keeps_slot_until_job_ends():
+    gate = Gate()
+    runner = aio.Runner(limit=1)
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await runner.run(gate.wait, 1, timeout=0.01)
+        assert runner._semaphore(asyncio.get_running_loop()).locked()
+        gate.event.set()
+        return await runner.run(gate.wait, 2, timeout=1)
+
+    assert run(main()) == 2
+    runner.shutdown()
+
+
+def test_cancelled_waiting_job_never_runs():
+    gate = Gate()
+    ran = []
+    runner = aio.Runner(limit=1)
+
+    async def main():
+        first = asyncio.ensure_future(runner.run(gate.wait, 1))
+        second = asyncio.ensure_future(runner.run(ran.append, 2))
+        await asyncio.sleep(0.05)
+        second.cancel()
+        gate.event.set()
+        await first
+        await asyncio.sleep(0.05)
+
+    run(main())
+    assert ran == []
+    runner.shutdown()
@@ -0,0 +1,90 @@
+import pytest
+
+import mel
+from benchmarks import compare, corpus, worst
+from benchmarks.suite import PHASES
+
+
+def run(**cases):
+    return {"settings": {}, "cases": {
+        name: {
+            **{phase: {"seconds": seconds} for phase in PHASES},
+            "peak_memory": memory,
+        }
+        for name, (seconds, memory) in cases.items()
+    }}
+
+
+# CORPUS ===========================================
+
+def test_generate_is_deterministic_for_a_seed():
+    assert corpus.generate(2000, seed=3) == corpus.generate(2000, seed=3)
+    assert corpus.generate(2000, seed=3) != corpus.generate(2000, seed=4)
+
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"depth": 5, "width": 2, "comments": 0.5, "references": 0.5},
+    {"literals": {"list": 1, "template": 1}},
+])
+def test_generated_documents_parse(options):
+    text = corpus.generate(2000, **options)
+    assert len(text) >= 2000
+    mel.parse(text)
+
+
+def test_grow_is_deterministic_for_a_seed():
+    text = corpus.grow("person", 1000, seed=1)
+    assert text == corpus.grow("person", 1000, seed=1)
+    assert len(text) >= 1000
+    mel.parse(text)
+
+
+# COMPARE ===========================================
+
+def test_compare_pairs_cases_of_both_runs():
+    old = run(small=(1.0, 100), gone=(1.0, 100))
+    new = run(small=(1.5, 100), added=(1.0, 100))
+    changes = compare.compare(old, new)
+    assert {change[0] for change in changes} == {"small"}
+    assert ("small", "parse seconds", 1.0, 1.5, 0.5) in changes
+    assert ("small", "peak memory", 100, 100, 0.0) in changes
+
+
+@pytest.mark.parametrize("seconds, memory, flagged", [
+    (1.05, 100, []),
+    (1.2, 100, ["lex seconds", "parse seconds", "evaluate seconds"]),
+    (0.5, 120, ["peak memory"]),
+])
+def test_regressions_past_threshold(seconds, memory, flagged):
+    changes = compare.compare(
+        run(case=(1.0, 100)), run(case=(seconds, memory))
+    )
+    found = compare.regressions(changes, threshold=0.1)
+    assert [change[1] for change in found] == flagged
+
+
+def test_regressions_use_the_given_threshold():
+    changes = compare.compare(run(case=(1.0, 100)), run(case=(1.2, 100)))
+    assert compare.regressions(changes, threshold=0.5) == []
+
+
+# WORST ===========================================
+
+SEEDS = ["(a b=1)", "x = [1 2]", "(a (b c) #d)", "a/b = 'c'"]
+
+
+def test_search_finds_inputs_worse_than_its_seeds():
+    search = worst.Search(seed=1, corpus=SEEDS)
+    population = search.run(100)
+    best = max(worst.cost(text).score for text in SEEDS)
+    assert population[0][0].score > best
+    again = worst.Search(seed=1, corpus=SEEDS).run(100)
+    assert again[0][1] == population[0][1]
+
+
+def test_shrink_keeps_the_score():
+    text = "(a (a)  (b  (a c)   'c' )  #"
+    small = worst.shrink(text)
+    assert worst.cost(small).score >= worst.cost(text).score
+    assert len(small) < len(text)
@@ -0,0 +1,193 @@
+import json
+
+import pytest
+
+import mel
+from mel import building, parse
+
+
+def write(directory, files):
+    for name, text in files.items():
+        path = directory / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+
+def build(directory, **options):
+    return building.Project(str(directory), jobs=1, **options).build()
+
+
+@pytest.fixture
+def site(tmp_path):
+    write(tmp_path, {
+        "categories": "(Category (news title='News'))",
+        "pages/home": "(page category = Category/news)",
+        "pages/about": "(%: html)\n(about title = 'About')",
+    })
+    return tmp_path
+
+
+# REFERENCES ===========================================
+
+@pytest.mark.parametrize("text, names", [
+    ("(Category (news))", {"Category"}),
+    ("a = 1 b = 2 #tag", {"a", "b"}),
+    ("(a/b 1) a/b = 1", set()),
+    ("x y", set()),
+])
+def test_definitions(text, names):
+    assert building.definitions(parse(text)) == names
+
+
+@pytest.mark.parametrize("text, names", [
+    ("x = Category/news", {"Category"}),
+    ("(page [a b/c] {Query})", {"a", "b"}),
+    ("title = 'by {author/name}'", set()),
+    ('title = "by {author/name}"', {"author"}),
+    ('title = "bad {("', set()),
+    ("(a 1 2)", set()),
+])
+def test_references(text, names):
+    assert building.references(parse(text)) == names
+
+
+# GRAPH ===========================================
+
+def test_dependencies():
+    files = {
+        "a": {"defines": ["A"], "references": ["B", "A"]},
+        "b": {"defines": ["B"], "references": ["C"]},
+        "c": {"defines": [], "references": ["A"], "imports": ["b", "d"]},
+    }
+    assert building.dependencies(files) == {
+        "a": ["b"], "b": [], "c": ["a", "b"]
+    }
+
+
+@pytest.mark.parametrize("graph, expected", [
+    ({"a": ["b"], "b": ["c"], "c": []}, [["c"], ["b"], ["a"]]),
+    ({"a": ["b"], "b": ["a"], "c": ["a"]}, [["a", "b"], ["c"]]),
+    ({"a": ["a"]}, [["a"]]),
+    ({"a": [], "b": []}, [["a"], ["b"]]),
+])
+def test_components(graph, expected):
+    assert building.components(graph) == expected
+
+
+def test_input_keys_follow_dependencies():
+    graph = {"a": ["b"], "b": [], "c": []}
+    files = {path: {"hash": "00"} for path in graph}
+    keys = building.input_keys(files, graph)
+    files["b"]["hash"] = "11"
+    changed = building.input_keys(files, graph)
+    assert keys["a"] != changed["a"]
+    assert keys["c"] == changed["c"]
+
+
+# BUILDS ===========================================
+
+def test_build_renders_every_file(site):
+    result = build(site)
+    assert result == building.BuildResult(3, 0, 0, {})
+    output = site / "_build"
+    assert json.loads((output / "pages/home.json").read_text()) == {
+        "page": {"category": None}
+    }
+    assert (output / "pages/about.html").exists()
+    assert (output / "categories.json").exists()
+
+
+def test_rebuild_skips_unchanged_files(site):
+    build(site)
+    assert build(site) == building.BuildResult(0, 3, 0, {})
+
+
+def test_rebuild_follows_dependencies(site):
+    build(site)
+    write(site, {"categories": "(Category (news title='Latest'))"})
+    assert build(site) == building.BuildResult(2, 1, 0, {})
+
+
+def test_rebuild_follows_imports(site):
+    write(site, {
+        "base": "title = 'Base'",
+        "pages/home": "(@import '../base') (page name = title)",
+    })
+    build(site)
+    write(site, {"base": "title = 'New'"})
+    assert build(site) == building.BuildResult(2, 2, 0, {})
+    assert json.loads((site / "_build/pages/home.json").read_text())[
+        "page"] == {"name": "New"}
+
+
+def test_files_are_parsed_once(site, monkeypatch):
+    write(site, {"base": "title = 'Base'"})
+    build(site, cache=False)
+    write(site, {"base": "title = 'New'"})
+    parsed = []
+    parse_file = mel.parse_file
+
+    def count(path, *args, **kwargs):
+        parsed.append(path)
+        return parse_file(path, *args, **kwargs)
+
+    monkeypatch.setattr(mel, "parse_file", count)
+    write(site, {"categories": "(Category (news title='Latest'))"})
+    build(site, cache=False)
+    assert sorted(parsed) == sorted(
+        str(site / name) for name in ["base", "categories", "pages/home"]
+    )
+
+
+def test_touched_files_are_hashed(site):
+    build(site)
+    write(site, {"pages/about": "(%: html)\n(about title = 'About')"})
+    assert build(site).built == 0
+
+
+def test_removed_files_lose_their_output(site):
+    build(site)
+    (site / "pages/about").unlink()
+    assert build(site).removed == 1
+    assert not (site / "_build/pages/about.html").exists()
+
+
+def test_removed_files_lose_their_cache(site):
+    build(site)
+    cache = site / "pages/__melcache__"
+    assert (cache / "about.melc").exists()
+    (site / "pages/about").unlink()
+    (cache / "notes.txt").write_text("kept")
+    build(site)
+    assert not (cache / "about.melc").exists()
+    assert (cache / "home.melc").exists()
+    assert (cache / "notes.txt").exists()
+
+
+def test_changed_format_replaces_output(site):
+    build(site)
+    write(site, {"pages/about": "(about title = 'About')"})
+    build(site)
+    assert not (site / "_build/pages/about.html").exists()
+    assert (site / "_build/pages/about.json").exists()
+
+
+def test_errors_are_reported_and_retried(site):
+    write(site, {"bad": "(a"})
+    result = build(site)
+    assert list(result.errors) == ["bad"]
+    assert result.built == 3
+    assert list(build(site).errors) == ["bad"]
+    write(site, {"bad": "(a)"})
+    assert build(site) == building.BuildResult(1, 3, 0, {})
+
+
+def test_other_settings_rebuild_everything(site):
+    build(site)
+    assert build(site, _format="json").built == 3
+
+
+def test_build_with_process_pool(site):
+    project = building.Project(str(site), jobs=2, cache=False)
+    assert project.build().built == 3
+    assert project.build().unchanged == 3
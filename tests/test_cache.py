@@ -0,0 +1,134 @@
+import pytest
+
+import mel
+from mel.utils import Context, Environment
+from mel.utils.cache import Cache, SqliteBackend
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+# LRU ===========================================
+
+def test_get_and_set():
+    cache = Cache()
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+
+def test_cached_none_is_a_hit():
+    cache = Cache()
+    cache.set("a", None)
+    assert "a" in cache
+    assert cache.fetch("a", lambda: 42) is None
+
+
+def test_least_recently_used_is_evicted():
+    cache = Cache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "a" in cache
+    assert "b" not in cache
+    assert len(cache) == 2
+
+
+def test_fetch_computes_once():
+    cache = Cache()
+    calls = []
+    for _ in range(3):
+        cache.fetch("key", lambda: calls.append(1) or len(calls))
+    assert calls == [1]
+
+
+def test_statistics():
+    cache = Cache(maxsize=10)
+    cache.get("a")
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("a")
+    assert tuple(cache.info()) == (2, 1, 10, 1)
+
+
+# TTL ===========================================
+
+def test_entries_expire():
+    clock = Clock()
+    cache = Cache(ttl=10, clock=clock)
+    cache.set("a", 1)
+    clock.now = 9
+    assert cache.get("a") == 1
+    clock.now = 10
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+# PERSISTENCE ===========================================
+
+@pytest.fixture
+def database(tmp_path):
+    return str(tmp_path / "cache.db")
+
+
+def test_sqlite_backend_survives_instances(database):
+    Cache(backend=SqliteBackend(database)).set("a", {"x": [1, 2]})
+    cache = Cache(backend=SqliteBackend(database))
+    assert cache.get("a") == {"x": [1, 2]}
+    assert cache.info().hits == 1
+
+
+def test_sqlite_backend_respects_ttl(database):
+    clock = Clock()
+    Cache(ttl=5, backend=SqliteBackend(database), clock=clock).set("a", 1)
+    clock.now = 6
+    cache = Cache(backend=SqliteBackend(database), clock=clock)
+    assert cache.get("a") is None
+
+
+# CACHE KEYWORD ===========================================
+
+def test_cache_keyword_object_is_memoized():
+    context = Context()
+    first = mel.eval("($thumb 'a')", context)
+    second = mel.eval("($thumb 'b')", context)
+    assert first == second == {"$thumb": {":": ["a"]}}
+    assert context.cache.info().hits == 1
+
+
+def test_cache_keyword_miss_is_counted_once():
+    context = Context()
+    mel.eval("($thumb 'a')", context)
+    assert tuple(context.cache.info())[:2] == (0, 1)
+
+
+def test_plain_object_is_not_memoized():
+    context = Context()
+    mel.eval("(thumb 'a')", context)
+    assert len(context.cache) == 0
+
+
+# entries evicted right after each lookup, as by another thread
+class ForgetfulCache(Cache):
+    def __contains__(self, key):
+        found = super().__contains__(key)
+        self._entries.pop(key, None)
+        return found
+
+    def get(self, key, default=None):
+        value = super().get(key, default)
+        self._entries.pop(key, None)
+        return value
+
+
+def test_cache_keyword_survives_eviction_during_evaluation():
+    context = Context(Environment(ForgetfulCache()))
+    mel.eval("($thumb 'a')", context)
+    assert mel.eval("($thumb 'b')", context) == {"$thumb": {":": ["a"]}}
+    assert mel.eval("($thumb 'c')", context) == {"$thumb": {":": ["c"]}}
@@ -0,0 +1,222 @@
+import copy
+import json
+import os
+import pickle
+
+import pytest
+
+import mel
+from mel import compiling, nodes
+from mel.parsing import Parser
+from mel.parsing.constants import GRAMMAR_VERSION
+
+
+def shape(node):
+    fields = {
+        name: shape(value) if isinstance(value, nodes.Node) else value
+        for name, value in vars(node).items()
+        if name not in compiling.STRUCTURE
+    }
+    subnodes = [shape(subnode) for subnode in getattr(node, "_subnodes", ())]
+    return type(node).__name__, node.index, str(node), fields, subnodes
+
+
+def evaluate(tree):
+    context = mel.Context()
+    context.tree = tree
+    return mel.evaluate(tree, context)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "person.mel"
+    path.write_text("(person name='Ana' age=3 #tag 'ünï' 2.5 [1 2])")
+    return path
+
+
+# ROUND TRIP ===========================================
+
+@pytest.mark.parametrize("text", [
+    "",
+    "(a b=2 c>=1.5 #d)",
+    "name = 'Ana' (x age=99999999999999999999999 y=-3 z=-70000)",
+    "(a (b c)) a/b/c [x y] a/*/0..2 '{a} é'",
+    "(%: html) (?doc 'x') (!q x = 1) {a b}",
+])
+@pytest.mark.parametrize("lazy", [False, True])
+def test_compiled_tree_matches_parsed_tree(text, lazy):
+    tree = mel.parse(text)
+    loaded = compiling.loads(compiling.dumps(tree), lazy=lazy)
+    assert shape(loaded) == shape(tree)
+
+
+def test_compiled_tree_evaluates_as_parsed_tree():
+    text = open("examples/person").read()
+    tree = mel.parse(text)
+    loaded = compiling.loads(compiling.dumps(tree), lazy=True)
+    assert json.dumps(evaluate(loaded)) == json.dumps(evaluate(tree))
+
+
+def test_lazy_subnodes_become_a_list_when_added_to():
+    loaded = compiling.loads(compiling.dumps(mel.parse("a b")), lazy=True)
+    loaded.add(nodes.Node())
+    assert len(loaded) == 3
+
+
+def test_header_records_source_hash_and_grammar():
+    tree = mel.parse("(a)")
+    header = compiling.read_header(compiling.dumps(tree))
+    assert header.grammar_version == GRAMMAR_VERSION
+    assert header.source_hash == compiling.source_hash("(a)")
+
+
+def test_loading_other_bytes_fails():
+    with pytest.raises(ValueError):
+        compiling.loads(b"x" * compiling.HEADER.size)
+
+
+# CACHE FILES ===========================================
+
+def test_parse_file_writes_cache(source):
+    tree = mel.parse_file(str(source))
+    assert os.path.exists(compiling.cache_path(str(source)))
+    assert shape(tree) == shape(mel.parse(source.read_text()))
+
+
+def test_parse_file_uses_fresh_cache(source, monkeypatch):
+    mel.parse_file(str(source))
+    monkeypatch.setattr(mel, "parse", pytest.fail)
+    tree = mel.parse_file(str(source))
+    assert evaluate(tree)["person"]["name"] == "Ana"
+
+
+def test_touched_file_with_same_content_uses_cache(source, monkeypatch):
+    mel.parse_file(str(source))
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    monkeypatch.setattr(mel, "parse", pytest.fail)
+    assert evaluate(mel.parse_file(str(source)))["person"]["age"] == 3
+
+
+def test_touched_file_cache_takes_new_mtime(source, monkeypatch):
+    mel.parse_file(str(source))
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    mel.parse_file(str(source))
+    header = compiling.read_header(
+        open(compiling.cache_path(str(source)), "rb").read()
+    )
+    assert header.source_mtime == source.stat().st_mtime_ns
+    monkeypatch.setattr(compiling, "source_hash", pytest.fail)
+    assert compiling.read_cache(str(source)) is not None
+
+
+def test_changed_file_is_parsed_again(source):
+    mel.parse_file(str(source))
+    source.write_text("(person name='Bia' age=40)")
+    assert evaluate(mel.parse_file(str(source)))["person"]["age"] == 40
+
+
+def test_tree_loaded_from_cache_can_be_copied(source):
+    mel.parse_file(str(source))
+    tree = mel.parse_file(str(source))
+    assert isinstance(tree[0]._subnodes, compiling.LazyNodes)
+    expected = shape(mel.parse(source.read_text()))
+    assert shape(pickle.loads(pickle.dumps(tree))) == expected
+    assert shape(copy.deepcopy(tree)) == expected
+
+
+def test_parse_file_without_cache(source):
+    mel.parse_file(str(source), cache=False)
+    assert not os.path.exists(compiling.cache_path(str(source)))
+
+
+def test_corrupt_cache_is_ignored(source):
+    mel.parse_file(str(source))
+    with open(compiling.cache_path(str(source)), "wb") as file:
+        file.write(b"MELC")
+    assert evaluate(mel.parse_file(str(source)))["person"]["age"] == 3
+
+
+# PARSE CACHE ===========================================
+
+@pytest.fixture
+def parse_cache(tmp_path):
+    return compiling.ParseCache(str(tmp_path / "cache"))
+
+
+def test_parse_cache_reuses_trees_by_content(parse_cache):
+    tree = mel.parse("(a b=1)", cache=parse_cache)
+    cached = mel.parse("(a b=1)", cache=parse_cache)
+    assert shape(cached) == shape(tree)
+    assert parse_cache.info()[:2] == (1, 1)
+
+
+def test_parse_cache_key_includes_grammar_version(parse_cache, monkeypatch):
+    path = parse_cache.path("(a)")
+    monkeypatch.setattr(compiling, "GRAMMAR_VERSION", GRAMMAR_VERSION + 1)
+    assert parse_cache.path("(a)") != path
+
+
+def test_parse_cache_skips_parsing_on_hit(parse_cache):
+    parse_cache.fetch("(a)", mel.parse)
+    tree = parse_cache.fetch("(a)", pytest.fail)
+    assert evaluate(tree) == {"a": {}}
+
+
+def test_parse_errors_are_not_cached(parse_cache):
+    with pytest.raises(mel.MelError):
+        mel.parse("(a", cache=parse_cache)
+    assert parse_cache.info().currsize == 0
+
+
+def test_parse_cache_ignores_other_parsers(parse_cache):
+    class CustomParser(Parser):
+        pass
+
+    mel.parse("(a)", cache=parse_cache)
+    mel.parse("(a)", CustomParser, cache=parse_cache)
+    assert parse_cache.info()[:2] == (0, 1)
+
+
+def test_parse_cache_skips_removed_shards(parse_cache, monkeypatch):
+    mel.parse("(a)", cache=parse_cache)
+    scandir = os.scandir
+
+    def removed(path):
+        if path != parse_cache.directory:
+            raise FileNotFoundError(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", removed)
+    assert parse_cache.info().currsize == 0
+
+
+def test_parse_cache_evicts_least_recently_used(parse_cache):
+    texts = ["(a{})".format(i) for i in range(3)]
+    for text in texts:
+        mel.parse(text, cache=parse_cache)
+    size = os.path.getsize(parse_cache.path(texts[0]))
+    for time, text in enumerate(texts):
+        os.utime(parse_cache.path(text), ns=(time, time))
+    parse_cache.maxsize = size * 2
+    parse_cache.evict()
+    assert not os.path.exists(parse_cache.path(texts[0]))
+    assert os.path.exists(parse_cache.path(texts[2]))
+    assert parse_cache.info().currsize <= parse_cache.maxsize
+
+
+def test_parse_file_falls_back_to_parse_cache(source, parse_cache):
+    mel.parse_file(str(source), cache=False, parse_cache=parse_cache)
+    mel.parse_file(str(source), cache=False, parse_cache=parse_cache)
+    assert parse_cache.info()[:2] == (1, 1)
+
+
+# PICKLING ===========================================
+
+def test_nodes_keep_default_copy_and_pickle():
+    tree = mel.parse("(a b=2)")
+    node = tree[0]
+    node.seen = {"b"}
+    assert copy.copy(node)._subnodes is node._subnodes
+    assert pickle.loads(pickle.dumps(node)).seen == {"b"}
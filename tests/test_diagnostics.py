@@ -0,0 +1,193 @@
+import sys
+
+import pytest
+
+import mel
+from mel import diagnostics
+from mel.diagnostics import memory, tracing
+from mel.exceptions import ParsingError
+from mel.parsing import Parser
+from mel.parsing.base import BaseParser, ParserMap
+
+
+# PROFILER ===========================================
+
+def test_profiled_parse_matches_plain_parse():
+    text = "(a b=1 c=[1 2] #d) x = a/b"
+    tree = diagnostics.Profiler().parse(text)
+    assert repr(list(tree)) == repr(list(mel.parse(text)))
+
+
+def test_rule_counts():
+    profiler = diagnostics.profile("(a b=1)")
+    root = profiler.rules["root"]
+    assert (root.attempts, root.successes, root.failures) == (1, 1, 0)
+    assert root.tokens == 6
+    _object = profiler.rules["object"]
+    assert _object.successes == 1
+    assert _object.tokens == 6
+    keyword = profiler.rules["keyword"]
+    assert keyword.attempts == keyword.successes + keyword.failures
+    assert keyword.backtracks > 0
+
+
+def test_times_add_up():
+    profiler = diagnostics.profile("(a (b (c d=[1 2 3])))")
+    root = profiler.rules["root"]
+    self_times = sum(stats.self_time for stats in profiler.rules.values())
+    assert self_times == root.total_time
+    for stats in profiler.rules.values():
+        assert 0 <= stats.self_time <= stats.total_time
+
+
+# the root rule matches nothing and the text is left unread
+def test_failed_parse_keeps_counts():
+    profiler = diagnostics.Profiler()
+    with pytest.raises(ParsingError):
+        profiler.parse("(a b=")
+    assert profiler.rules["root"].tokens == 0
+    assert profiler.rules["object"].successes == 0
+
+
+def test_plain_parsers_are_left_alone():
+    diagnostics.profile("(a b=1)")
+    assert "Profiled" not in [cls.__name__ for cls in Parser.__mro__]
+    for parser in ParserMap._map.values():
+        assert parser.read_rule is BaseParser.read_rule
+
+
+# OUTPUT ===========================================
+
+def test_table_ranks_rules_by_self_time():
+    profiler = diagnostics.profile("(a b=1) (c d='e')")
+    rows = profiler.table()
+    assert [row[-1] for row in rows] == sorted(
+        (row[-1] for row in rows), reverse=True
+    )
+    lines = profiler.format_table().splitlines()
+    assert lines[0].split()[:3] == ["rule", "attempts", "successes"]
+    assert len(lines) == len(rows) + 1
+
+
+def test_collapsed_stacks():
+    profiler = diagnostics.profile("(a b=1)")
+    lines = profiler.collapsed().splitlines()
+    stacks = dict(line.rsplit(" ", 1) for line in lines)
+    assert "root" in stacks
+    assert "root;value;object" in stacks
+    assert all(value.isdigit() for value in stacks.values())
+
+
+# HEATMAP ===========================================
+
+def test_tracing_stream_parses_like_plain_stream():
+    text = "(a b=1 c=[1 2] #d) x = a/b"
+    stream = diagnostics.TracingTokenStream(text)
+    tree = Parser(stream).parse()
+    assert repr(list(tree)) == repr(list(mel.parse(text)))
+
+
+def test_backtracked_tokens_are_counted():
+    heatmap = diagnostics.heatmap("x 1")
+    # x is read as a path by each relation sign before it's read as a value
+    assert heatmap.stream.reads == [9, 1]
+    assert heatmap.stream.restores == [8, 0]
+    assert heatmap.rereads == 8
+    assert heatmap.error is None
+
+
+def test_spans_rank_reparsed_tokens_first():
+    heatmap = diagnostics.heatmap("(a 1 2)\nx y")
+    spans = heatmap.spans(2)
+    assert [span.reads for span in spans] == [9, 9]
+    texts = {"(a 1 2)\nx y"[span.start:span.end]: span for span in spans}
+    assert sorted(texts) == ["x", "y"]
+    assert (texts["x"].line, texts["x"].column) == (1, 0)
+
+
+def test_spans_join_tokens_with_the_same_counts():
+    heatmap = diagnostics.heatmap("(a x y z)")
+    assert len(heatmap.spans(100)) < len(heatmap.tokens)
+
+
+def test_format_marks_tokens_under_their_lines():
+    lines = diagnostics.heatmap("(a b)\nc").format().splitlines()
+    assert len(lines) == 4
+    assert lines[0].startswith("1 | ") and lines[0].endswith("| (a b)")
+    prefix = len(lines[0]) - len("(a b)")
+    assert lines[1][:prefix].isspace()
+    assert lines[1][prefix] != " "
+    assert tracing.SHADES[-1] in lines[1]
+    assert "c" in lines[2]
+
+
+def test_failed_parse_keeps_heatmap():
+    heatmap = diagnostics.heatmap("(a x")
+    assert isinstance(heatmap.error, ParsingError)
+    assert max(heatmap.stream.visits) > 0
+    assert "x" in heatmap.format_spans(1)
+
+
+# MEMORY ===========================================
+
+def test_memory_report_counts_tokens_and_nodes_by_class():
+    report = diagnostics.memory_report("(a 1 2) x = a")
+    assert report.tokens["IntToken"].count == 2
+    assert report.nodes["IntNode"].count == 2
+    assert report.nodes["RootNode"].count == 1
+    assert all(usage.bytes > 0 for usage in report.nodes.values())
+
+
+def test_memory_report_keeps_source_apart():
+    text = "(a 1 2) x = a"
+    report = diagnostics.memory_report(text)
+    assert report.source_chars == len(text)
+    assert report.encoded_bytes == len(text)
+    assert report.source_references > 0
+    longer = diagnostics.memory_report(text + " " * 1000)
+    assert longer.source_bytes - report.source_bytes == 1000
+    assert abs(longer.node_bytes - report.node_bytes) < 1000
+
+
+def test_memory_report_sizes_intermediate_lists():
+    report = diagnostics.memory_report("(a 1 2 3) (b [4 5])")
+    assert report.lists.count > 0
+    assert report.lists.bytes > 0
+    assert report.traced_peak > 0
+
+
+def test_memory_report_format():
+    text = diagnostics.memory_report("(a 1)").format()
+    assert "bytes per source byte" in text
+    assert "IntNode" in text and "IntToken" in text
+
+
+class Slotted:
+    __slots__ = ["name", "items", "unset"]
+
+
+class Plain:
+    def __init__(self, name):
+        self.name = name
+
+
+def test_memory_report_sizes_slot_values():
+    item = Slotted()
+    item.name = "n" * 100
+    item.items = ("a" * 50,)
+    size = sys.getsizeof(item) + sys.getsizeof(item.name)
+    size += sys.getsizeof(item.items) + sys.getsizeof(item.items[0])
+    assert memory._own_size(item, set()) == size
+
+
+def test_memory_report_sizes_instance_dicts_sharing_keys():
+    items = [Plain("n" * 100) for _ in range(3)]
+    for item in items:
+        size = memory._own_size(item, set())
+        assert size == sys.getsizeof(item) + sys.getsizeof(item.__dict__) \
+            + sys.getsizeof(item.name)
+
+
+def test_memory_report_raises_parsing_errors():
+    with pytest.raises(ParsingError):
+        diagnostics.memory_report("(a 1")
@@ -0,0 +1,164 @@
+import sys
+
+import pytest
+
+import mel
+from mel import nodes
+from mel.utils import Context
+from mel.exceptions import EvaluationError
+from mel.evaluation import BaseEvaluator, Evaluation
+
+
+# LITERALS ===========================================
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("42", 42),
+        ("-4.5", -4.5),
+        ("True", True),
+        ("'text'", "text"),
+        ('"text"', "text"),
+        ("[1 'a' [true]]", [1, "a", [True]]),
+    ]
+)
+def test_literal_values(test_input, expected):
+    assert mel.eval(test_input) == {":": [expected]}
+
+
+# STRUCTS ===========================================
+
+def test_object_becomes_dict():
+    tree = mel.eval("(person #active name = 'John' age = 45 'note')")
+    assert tree == {
+        "person": {
+            "#active": True,
+            "name": "John",
+            "age": 45,
+            ":": ["note"],
+        }
+    }
+
+
+def test_objects_sharing_a_key_are_grouped():
+    tree = mel.eval("(item 1) (item 2) (item 3)")
+    assert tree == {"item": [{":": [1]}, {":": [2]}, {":": [3]}]}
+
+
+def test_anonym_objects_are_values():
+    assert mel.eval("(: x = 1)") == {":": [{"x": 1}]}
+
+
+def test_constraints_are_grouped_by_path():
+    assert mel.eval("x > 1 x <= 5") == {"x": {">": 1, "<=": 5}}
+
+
+# REFERENCES ===========================================
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("x = 42 y = x", 42),
+        ("(a b = 'c') y = a/b", "c"),
+        ("items = [1 2 3 4] y = items/1..2", [2, 3]),
+        ("(a (b 1) (c 2)) y = a/*", [{":": [1]}, {":": [2]}]),
+        ("y = missing", None),
+        ("x = 'Bob' y = \"Hi {x}\"", "Hi Bob"),
+    ]
+)
+def test_reference_values(test_input, expected):
+    assert mel.eval(test_input)["y"] == expected
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("(p age = 5) (p age = 9) y = {p age > 6}", [{"age": 9}]),
+        ("(p #vip) (p) y = {p #vip}", [{"#vip": True}]),
+        ("(p age = 5) y = {p age > 6 'none'}", ["none"]),
+        ("(a 1) (b 2) y = {:}", [{":": [1]}, {":": [2]}]),
+    ]
+)
+def test_query_values(test_input, expected):
+    assert mel.eval(test_input)["y"] == expected
+
+
+def test_referenced_subtree_is_evaluated_once():
+    context = Context()
+    context.tree = mel.parse("(a 1) x = a y = a")
+    evaluation = Evaluation(context)
+    tree = evaluation.run(context.tree)
+    assert tree["x"] is tree["y"] is tree["a"]
+
+
+def test_circular_reference():
+    with pytest.raises(EvaluationError):
+        mel.eval("a = b b = a")
+
+
+def test_deep_documents_do_not_overflow():
+    depth = sys.getrecursionlimit() * 2
+    context = Context()
+    tree = nodes.RootNode()
+    parent = tree
+    for _ in range(depth):
+        child = nodes.ListNode()
+        parent.add(child)
+        parent = child
+    context.tree = tree
+    value = Evaluation(context).run(tree)[":"][0]
+    for _ in range(depth - 1):
+        value = value[0]
+    assert value == []
+
+
+# DISPATCH TABLE ===========================================
+
+def test_evaluators_are_looked_up_on_context():
+    class DoubleEvaluator(BaseEvaluator):
+        Node = nodes.IntNode
+
+        def build(self, node, values, evaluation):
+            return node.value * 2
+
+    context = Context()
+    context.evaluators[nodes.IntNode] = DoubleEvaluator()
+    assert mel.eval("x = 21 4.5", context) == {"x": 42, ":": [4.5]}
+    assert mel.eval("x = 21") == {"x": 21}
+
+
+def test_cached_objects_are_looked_up_once_per_evaluation():
+    context = Context()
+    mel.eval("($a x=1) (b y=2)", context=context)
+    assert tuple(context.cache.info()) == (0, 1, 128, 1)
+    mel.eval("($a x=1) (b y=2)", context=context)
+    assert tuple(context.cache.info()) == (1, 1, 128, 1)
+
+
+# SCOPES ===========================================
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("n = 1 (a n = 2 y = n)", 2),
+        ("n = 1 (a y = n)", 1),
+        ("(b n = 3) (a y = b/n)", 3),
+        ("n = 1 (a n = 2 (c y = n))", 2),
+    ]
+)
+def test_keywords_resolve_from_innermost_scope(test_input, expected):
+    tree = mel.eval(test_input)
+    while "y" not in tree:
+        tree = tree.get("a") or tree["c"]
+    assert tree["y"] == expected
+
+
+def test_target_resolves_in_its_own_scope():
+    tree = mel.eval("y = a/b (a b = n n = 7)")
+    assert tree["y"] == 7
+
+
+def test_same_template_in_different_scopes():
+    tree = mel.eval('(a n = 1 "{n}") (b n = 2 "{n}")')
+    assert tree["a"][":"] == ["1"]
+    assert tree["b"][":"] == ["2"]
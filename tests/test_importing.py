@@ -0,0 +1,211 @@
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import mel
+from mel import importing, rendering
+from mel.exceptions import EvaluationError
+from mel.utils import Context, Environment
+
+
+@pytest.fixture
+def importer(tmp_path):
+    return importing.Importer(cache=False, root=str(tmp_path))
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "shared").mkdir()
+    (tmp_path / "shared" / "colors").write_text("(Colors red = '#f00')")
+    (tmp_path / "base").write_text(
+        "(@import 'shared/colors')\n"
+        "(Theme main = Colors/red (font size = 12 label = \"{size}pt\"))\n"
+        "title = 'Base'"
+    )
+    return tmp_path
+
+
+def evaluate(importer, path, text):
+    path.write_text(text)
+    context = Context(Environment(importer=importer))
+    context.path = str(path)
+    return mel.eval(text, context)
+
+
+# RESOLUTION ===========================================
+
+def test_imported_names_are_resolved(project, importer):
+    value = evaluate(
+        importer, project / "page",
+        "(@import 'base') (p color = Theme/main \"{Theme/font/label}\")"
+    )
+    assert value["p"] == {"color": "#f00", ":": ["12pt"]}
+
+
+def test_imports_are_left_out_of_values(project, importer, monkeypatch):
+    monkeypatch.chdir(project)
+    text = "(@import 'base') x = title"
+    context = Context(Environment(importer=importer))
+    assert mel.eval(text, context) == {"x": "Base"}
+    assert rendering.json.dumps(mel.parse(text)) == '{"x":"Base"}'
+
+
+def test_own_names_shadow_imported_ones(project, importer):
+    value = evaluate(
+        importer, project / "page",
+        "(@import 'base') title = 'Page' x = title"
+    )
+    assert value["x"] == "Page"
+
+
+def test_imports_are_relative_to_the_importing_file(project, importer):
+    (project / "pages").mkdir()
+    value = evaluate(
+        importer, project / "pages" / "home", "(@import '../base') x = title"
+    )
+    assert value["x"] == "Base"
+
+
+def test_imports_without_path_are_relative_to_working_directory(
+        project, importer, monkeypatch):
+    monkeypatch.chdir(project)
+    context = Context(Environment(importer=importer))
+    assert mel.eval("(@import 'base') x = title", context)["x"] == "Base"
+
+
+def test_rendering_resolves_imports(project, monkeypatch):
+    monkeypatch.chdir(project)
+    text = "(%: html) (@import 'base') (p Theme/main)"
+    (project / "page").write_text(text)
+    file = io.StringIO()
+    rendering.render(mel.parse(text), file, path=str(project / "page"))
+    assert file.getvalue() == "<p>#f00</p>"
+
+
+# SHARED MODULES ===========================================
+
+def test_imported_files_are_parsed_once(project, importer):
+    for number in range(5):
+        evaluate(importer, project / "page", "(@import 'base') x = title")
+    # base and shared/colors
+    assert importer.modules.info().misses == 2
+
+
+def test_imported_trees_are_not_copied(project, importer):
+    tree = mel.parse("(@import 'base')")
+    first = importer.imports(tree, str(project / "page"))
+    second = importer.imports(tree, str(project / "other"))
+    assert [module.tree for module in first] == \
+        [module.tree for module in second]
+    assert [module.path for module in first] == [
+        str(project / "base"), str(project / "shared" / "colors")
+    ]
+
+
+def test_changed_files_are_parsed_again(project, importer):
+    evaluate(importer, project / "page", "(@import 'base') x = title")
+    base = project / "base"
+    base.write_text("title = 'New'")
+    stat = base.stat()
+    os.utime(base, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    value = evaluate(importer, project / "page", "(@import 'base') x = title")
+    assert value["x"] == "New"
+
+
+# ERRORS ===========================================
+
+@pytest.mark.parametrize("files", [
+    {"page": "(@import 'page')"},
+    {"page": "(@import 'a')", "a": "(@import 'b')", "b": "(@import 'a')"},
+    {"page": "(@import 'a')", "a": "(@import 'page')"},
+])
+def test_circular_imports(tmp_path, importer, files):
+    for name, text in files.items():
+        (tmp_path / name).write_text(text)
+    with pytest.raises(EvaluationError, match="Circular import"):
+        evaluate(importer, tmp_path / "page", files["page"])
+
+
+def test_shared_imports_are_not_cycles(tmp_path, importer):
+    (tmp_path / "a").write_text("(@import 'c') a = 1")
+    (tmp_path / "b").write_text("(@import 'c') b = 2")
+    (tmp_path / "c").write_text("c = 3")
+    value = evaluate(
+        importer, tmp_path / "page", "(@import 'a' 'b') x = [a b c]"
+    )
+    assert value["x"] == [1, 2, 3]
+
+
+# chains longer than the recursion limit, kept low to keep the test quick
+def test_long_import_chains(tmp_path, importer):
+    for number in range(300):
+        (tmp_path / str(number)).write_text(
+            "(@import '{}')".format(number + 1)
+        )
+    (tmp_path / "300").write_text("last = 300")
+    tree = mel.parse("(@import '0')")
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(250)
+    try:
+        modules = importer.imports(tree, str(tmp_path / "page"))
+    finally:
+        sys.setrecursionlimit(limit)
+    assert len(modules) == 301
+
+
+@pytest.mark.parametrize("path", ["../outside", "/etc/passwd"])
+def test_imports_stay_under_root(tmp_path, path):
+    (tmp_path / "project").mkdir()
+    (tmp_path / "outside").write_text("secret = 1")
+    importer = importing.Importer(
+        cache=False, root=str(tmp_path / "project")
+    )
+    with pytest.raises(EvaluationError, match="outside of"):
+        evaluate(
+            importer, tmp_path / "project" / "page",
+            "(@import '{}')".format(path)
+        )
+
+
+@pytest.mark.parametrize("path, allowed", [
+    ("base", True),
+    ("../outside", False),
+])
+def test_imports_stay_under_the_document_directory(
+        tmp_path, monkeypatch, path, allowed):
+    (tmp_path / "project").mkdir()
+    (tmp_path / "project" / "base").write_text("x = 1")
+    (tmp_path / "outside").write_text("x = 2")
+    (tmp_path / "elsewhere").mkdir()
+    monkeypatch.chdir(tmp_path / "elsewhere")
+    importer = importing.Importer(cache=False)
+    page = tmp_path / "project" / "page"
+    text = "(@import '{}') y = x".format(path)
+    if allowed:
+        assert evaluate(importer, page, text) == {"y": 1}
+    else:
+        with pytest.raises(EvaluationError, match="outside of"):
+            evaluate(importer, page, text)
+
+
+def test_default_importer_is_created_once(monkeypatch):
+    monkeypatch.setattr(importing, "_importer", None)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        importers = list(executor.map(
+            lambda _: importing.default_importer(), range(32)
+        ))
+    assert all(importer is importers[0] for importer in importers)
+
+
+@pytest.mark.parametrize("text, message", [
+    ("(@import 'missing')", "Can't import"),
+    ("(@import bad)", "Imports take file paths"),
+    ("(@import 'broken')", "In "),
+])
+def test_import_errors(tmp_path, importer, text, message):
+    (tmp_path / "broken").write_text("(a")
+    with pytest.raises(EvaluationError, match=message):
+        evaluate(importer, tmp_path / "page", text)
@@ -0,0 +1,64 @@
+import importlib
+import os
+import subprocess
+import sys
+
+import pytest
+
+import mel
+from mel.parsing.base import ParserMap
+from mel.parsing.constants import RULE_MODULES
+from mel.rendering.base import RENDERER_MODULES, RendererMap
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# modules loaded by a fresh interpreter running statement
+def loaded_modules(statement):
+    statement += "; import sys; print(' '.join(sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-c", statement],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return set(result.stdout.split())
+
+
+# STARTUP ===========================================
+
+@pytest.mark.parametrize("module", [
+    "importlib.metadata",
+    "mel.compiling",
+    "mel.parsing.struct",
+    "mel.rendering",
+    "pickle",
+    "sqlite3",
+    "xml.sax.saxutils",
+])
+def test_import_mel_defers_module(module):
+    assert module not in loaded_modules("import mel")
+
+
+def test_parsing_imports_parser_modules():
+    modules = loaded_modules("import mel; mel.parse('(a b=1)')")
+    assert "mel.parsing.struct" in modules
+
+
+# LAZY REGISTRATION ===========================================
+
+def test_every_parser_rule_is_mapped_to_its_module():
+    for module in set(RULE_MODULES.values()):
+        importlib.import_module("mel.parsing." + module)
+    for _id, parser in ParserMap._map.items():
+        assert parser.__module__ == "mel.parsing." + RULE_MODULES[_id]
+
+
+@pytest.mark.parametrize("_id", sorted(RENDERER_MODULES))
+def test_builtin_renderers_are_found_by_format(_id):
+    assert RendererMap.get(_id).id == _id
+
+
+def test_lazy_submodules():
+    assert mel.compiling.__name__ == "mel.compiling"
+    with pytest.raises(AttributeError):
+        mel.missing
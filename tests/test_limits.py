@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+import mel
+from mel.exceptions import LimitError, MelError, ParsingError
+from mel.lexing import TokenStream
+from mel.limits import CancelToken, Limits
+from mel.parsing import Parser
+
+
+def parse(text, **limits):
+    return mel.parse(text, limits=Limits(**limits))
+
+
+# LIMITS ===========================================
+
+def test_parses_within_limits():
+    tree = parse("(a b=1 c=[1 2])", max_size=100, max_tokens=100,
+                 max_depth=50, timeout=10, max_backtracks=100)
+    assert repr(list(tree)) == repr(list(mel.parse("(a b=1 c=[1 2])")))
+
+
+@pytest.mark.parametrize("limits, name", [
+    ({"max_size": 20}, "size"),
+    ({"max_tokens": 5}, "tokens"),
+    ({"max_depth": 10}, "depth"),
+    ({"max_backtracks": 3}, "backtracks"),
+])
+def test_limit_breach_raises_limit_error(limits, name):
+    with pytest.raises(LimitError) as info:
+        # each bare name is read as a path before it's read as a value
+        parse("(a (b (c (d 1 2 3)))) x y", **limits)
+    assert info.value.limit == name
+
+
+def test_eval_takes_limits():
+    assert mel.eval("(a b=1)", limits=Limits(max_tokens=100)) == {
+        "a": {"b": 1}
+    }
+    with pytest.raises(LimitError):
+        mel.eval("(a b=1)", limits=Limits(max_tokens=3))
+
+
+def test_limit_error_is_not_a_parsing_error():
+    with pytest.raises(MelError) as info:
+        parse("(a 1)", max_tokens=1)
+    assert not isinstance(info.value, ParsingError)
+
+
+def test_limit_error_has_partial_stats():
+    with pytest.raises(LimitError) as info:
+        parse("(a (b (c (d 1))))", max_depth=12)
+    stats = info.value.stats
+    assert stats["depth"] == 13
+    assert stats["tokens"] == 13
+    assert stats["rules"] > 0
+    assert stats["elapsed"] >= 0
+
+
+def test_size_is_checked_before_lexing():
+    with pytest.raises(LimitError) as info:
+        TokenStream("(a 1) !!", limits=Limits(max_size=5))
+    assert info.value.stats["tokens"] == 0
+
+
+def test_deep_nesting_raises_limit_error_without_limits():
+    depth = 1000
+    with pytest.raises(LimitError) as info:
+        mel.parse("(a " * depth + ")" * depth)
+    assert info.value.limit == "depth"
+
+
+def test_timeout():
+    text = " ".join("(a{} 1 2 3)".format(i) for i in range(200))
+    with pytest.raises(LimitError) as info:
+        parse(text, timeout=0)
+    assert info.value.limit == "timeout"
+
+
+# CANCELLATION ===========================================
+
+def test_cancelled_token_stops_parse():
+    token = CancelToken()
+    token.cancel()
+    text = " ".join("(a{} 1)".format(i) for i in range(200))
+    with pytest.raises(LimitError) as info:
+        parse(text, cancel=token)
+    assert info.value.limit == "cancel"
+
+
+def test_cancel_from_another_thread():
+    token = CancelToken()
+    text = " ".join("(a{} 1 2 3)".format(i) for i in range(2000))
+    stream = TokenStream(text, limits=Limits(cancel=token))
+    errors = []
+
+    def run():
+        try:
+            Parser(stream).parse()
+        except LimitError as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    token.cancel()
+    thread.join()
+    assert [error.limit for error in errors] in ([], ["cancel"])
+    assert token.cancelled
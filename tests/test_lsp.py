@@ -0,0 +1,340 @@
+import io
+import time
+
+import pytest
+
+from mel import lsp
+
+
+URI = "file:///page.mel"
+
+TEXT = """@mary = (person name = "Mary")
+(page
+    title = "Hi"
+    author = @mary
+    heading = title
+    (Category news)
+    category = Category
+)
+"""
+
+
+class Client:
+    def __init__(self, text=TEXT, params=None):
+        self.messages = []
+        self.server = lsp.LanguageServer(self.messages.append)
+        self.ids = 0
+        self.request("initialize", params or {})
+        self.notify("textDocument/didOpen", {"textDocument": {
+            "uri": URI, "text": text, "version": 1,
+        }})
+        self.server.flush()
+
+    def request(self, method, params):
+        self.ids += 1
+        self.server.handle({
+            "jsonrpc": "2.0", "id": self.ids, "method": method,
+            "params": params,
+        })
+        response = self.messages.pop()
+        assert response["id"] == self.ids
+        return response
+
+    def notify(self, method, params):
+        self.server.handle({
+            "jsonrpc": "2.0", "method": method, "params": params,
+        })
+
+    def at(self, method, line, character):
+        return self.request(method, {
+            "textDocument": {"uri": URI},
+            "position": {"line": line, "character": character},
+        })["result"]
+
+    def edit(self, start, end, text, version=2):
+        self.notify("textDocument/didChange", {
+            "textDocument": {"uri": URI, "version": version},
+            "contentChanges": [{
+                "range": {
+                    "start": {"line": start[0], "character": start[1]},
+                    "end": {"line": end[0], "character": end[1]},
+                },
+                "text": text,
+            }],
+        })
+
+    def diagnostics(self):
+        return [
+            message["params"]["diagnostics"] for message in self.messages
+            if message.get("method") == "textDocument/publishDiagnostics"
+        ]
+
+
+def span(result):
+    start, end = result["range"]["start"], result["range"]["end"]
+    return (start["line"], start["character"]), (end["line"], end["character"])
+
+
+# MESSAGES ===========================================
+
+def test_messages_round_trip():
+    file = io.BytesIO()
+    lsp.write_message(file, {"id": 1, "result": "é"})
+    lsp.write_message(file, {"method": "exit"})
+    file.seek(0)
+    assert lsp.read_message(file) == {"id": 1, "result": "é"}
+    assert lsp.read_message(file) == {"method": "exit"}
+    assert lsp.read_message(file) is None
+
+
+def test_serve_until_exit():
+    messages = [
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+        {"jsonrpc": "2.0", "id": 2, "method": "shutdown"},
+        {"jsonrpc": "2.0", "method": "exit"},
+    ]
+    input, output = io.BytesIO(), io.BytesIO()
+    for message in messages:
+        lsp.write_message(input, message)
+    input.seek(0)
+    assert lsp.serve(input, output) == 0
+    output.seek(0)
+    assert lsp.read_message(output)["result"]["capabilities"]
+    assert lsp.read_message(output) == {
+        "jsonrpc": "2.0", "id": 2, "result": None,
+    }
+
+
+def test_unknown_method():
+    client = Client()
+    response = client.request("workspace/symbol", {})
+    assert response["error"]["code"] == lsp.METHOD_NOT_FOUND
+
+
+def test_failed_notification_is_logged():
+    client = Client()
+    client.notify("textDocument/didOpen", {})
+    assert client.messages[-1]["method"] == "window/logMessage"
+
+
+def test_request_before_initialize():
+    messages = []
+    server = lsp.LanguageServer(messages.append)
+    server.handle({"id": 1, "method": "shutdown"})
+    assert messages[0]["error"]["code"] == lsp.SERVER_NOT_INITIALIZED
+
+
+# LINES ===========================================
+
+@pytest.mark.parametrize("text", [
+    "a\nbc\r\nd\re",
+    "a😀b\nc",
+    "",
+    "\n\n",
+])
+def test_positions_round_trip(text):
+    lines = lsp.Lines(text)
+    for offset in range(len(text) + 1):
+        assert lines.offset(lines.position(offset)) == offset
+
+
+def test_positions_count_utf16_units():
+    lines = lsp.Lines("a😀b\nc")
+    assert lines.position(2) == {"line": 0, "character": 3}
+    assert lsp.Lines("a😀b", utf16=False).position(2) == {
+        "line": 0, "character": 2,
+    }
+
+
+@pytest.mark.parametrize("text, start, end, new", [
+    ("a\nb\nc", 2, 3, "x\ny"),
+    ("a\nb\nc", 0, 5, ""),
+    ("a\r\nb", 1, 2, ""),
+    ("a\rb", 2, 2, "\n"),
+    ("a\nb", 1, 1, "\r"),
+    ("ab\ncd", 1, 1, "\r"),
+    ("\r\n\r\n", 1, 3, ""),
+])
+def test_replace_keeps_line_starts(text, start, end, new):
+    lines = lsp.Lines(text).replace(start, end, new)
+    expected = lsp.Lines(text[:start] + new + text[end:])
+    assert lines.text == expected.text
+    assert lines.starts == expected.starts
+
+
+# SYNCHRONIZATION ===========================================
+
+def test_open_publishes_diagnostics():
+    client = Client()
+    assert client.diagnostics() == [[]]
+
+
+def test_parse_error_diagnostic():
+    client = Client("(a b=1)\n(c")
+    [[diagnostic]] = client.diagnostics()
+    assert diagnostic["severity"] == 1
+    assert diagnostic["range"]["start"]["line"] == 1
+
+
+def test_edits_are_parsed_once_flushed():
+    client = Client()
+    client.edit((2, 13), (2, 15), "Hello")
+    client.edit((2, 18), (2, 18), "!")
+    assert client.server.dirty
+    client.server.flush()
+    assert not client.server.dirty
+    assert client.server.documents[URI].text == TEXT.replace(
+        '"Hi"', '"Hello!"'
+    )
+    assert client.diagnostics() == [[]]
+
+
+def test_diagnostics_published_when_they_change():
+    client = Client()
+    client.edit((1, 0), (1, 0), "(")
+    client.server.flush()
+    client.edit((2, 13), (2, 15), "Ho", version=3)
+    client.server.flush()
+    client.edit((1, 0), (1, 1), "", version=4)
+    client.server.flush()
+    published = client.diagnostics()
+    assert len(published) == 3
+    assert published[1] and published[2] == []
+
+
+def test_queries_see_pending_edits():
+    client = Client()
+    client.edit((0, 0), (0, 0), "(first)\n")
+    assert client.at("textDocument/definition", 4, 14) == {
+        "uri": URI,
+        "range": {
+            "start": {"line": 1, "character": 0},
+            "end": {"line": 1, "character": 30},
+        },
+    }
+
+
+def test_broken_document_keeps_its_indexes():
+    client = Client()
+    client.edit((8, 0), (8, 0), "(")
+    assert client.at("textDocument/definition", 3, 14) is not None
+    assert client.diagnostics()[-1]
+
+
+def test_close_clears_diagnostics():
+    client = Client("(a")
+    client.notify("textDocument/didClose", {"textDocument": {"uri": URI}})
+    assert client.diagnostics()[-1] == []
+    assert URI not in client.server.documents
+
+
+# QUERIES ===========================================
+
+def test_document_symbols():
+    client = Client()
+    symbols = client.request("textDocument/documentSymbol", {
+        "textDocument": {"uri": URI},
+    })["result"]
+    assert [
+        (symbol["name"], symbol["kind"]) for symbol in symbols
+    ] == [("@mary", lsp.VARIABLE), ("page", lsp.OBJECT)]
+    assert [
+        (symbol["name"], symbol["kind"]) for symbol in symbols[1]["children"]
+    ] == [
+        ("title", lsp.PROPERTY), ("author", lsp.PROPERTY),
+        ("heading", lsp.PROPERTY), ("Category", lsp.CLASS),
+        ("category", lsp.PROPERTY),
+    ]
+    assert span(symbols[0]["children"][0]) == ((0, 16), (0, 29))
+
+
+@pytest.mark.parametrize("start, end, text", [
+    ((0, 0), (0, 0), "(x)\n\n"),
+    ((0, 0), (0, 0), "(x) "),
+    ((4, 0), (5, 0), ""),
+    ((5, 4), (5, 4), "\n"),
+])
+def test_document_symbols_follow_edits(start, end, text):
+    client = Client()
+    client.request("textDocument/documentSymbol", {
+        "textDocument": {"uri": URI},
+    })
+    client.edit(start, end, text)
+    client.server.flush()
+    edited = client.server.documents[URI].text
+    expected = Client(edited).request("textDocument/documentSymbol", {
+        "textDocument": {"uri": URI},
+    })["result"]
+    assert client.request("textDocument/documentSymbol", {
+        "textDocument": {"uri": URI},
+    })["result"] == expected
+
+
+@pytest.mark.parametrize("line, character, target", [
+    (3, 14, ((0, 0), (0, 30))),
+    (4, 15, ((2, 4), (2, 16))),
+    (6, 16, ((5, 4), (5, 19))),
+])
+def test_definition(line, character, target):
+    client = Client()
+    result = client.at("textDocument/definition", line, character)
+    assert span(result) == target
+
+
+@pytest.mark.parametrize("line, character", [(1, 2), (2, 12), (8, 0)])
+def test_no_definition(line, character):
+    client = Client()
+    assert client.at("textDocument/definition", line, character) is None
+
+
+def test_hover_reference():
+    client = Client()
+    result = client.at("textDocument/hover", 3, 14)
+    assert '@mary = (person name = "Mary")' in result["contents"]["value"]
+    assert span(result) == ((3, 13), (3, 18))
+
+
+def test_hover_symbol():
+    client = Client()
+    result = client.at("textDocument/hover", 1, 2)
+    assert "object page" in result["contents"]["value"]
+
+
+def test_definitions_follow_moved_expressions():
+    client = Client()
+    client.edit((1, 0), (1, 0), "(x)\n\n")
+    result = client.at("textDocument/definition", 6, 15)
+    assert span(result) == ((4, 4), (4, 16))
+
+
+# LATENCY ===========================================
+
+LARGE = "\n".join(
+    "(item{0}\n    name = \"{0}\"\n    next = item{1}\n)".format(
+        index, index + 1
+    )
+    for index in range(2000)
+)
+
+
+def test_queries_on_large_documents_are_quick():
+    client = Client(LARGE)
+    start = time.perf_counter()
+    for index in range(0, 2000, 100):
+        line = index * 4 + 2
+        assert client.at("textDocument/definition", line, 12) is not None
+        assert client.at("textDocument/hover", line, 12) is not None
+    assert (time.perf_counter() - start) / 40 < 0.02
+
+
+# an edit at the top moves every outline below it to other lines
+def test_symbols_after_an_edit_at_the_top_are_quick():
+    client = Client(LARGE)
+    params = {"textDocument": {"uri": URI}}
+    client.request("textDocument/documentSymbol", params)
+    client.edit((0, 0), (0, 0), "(first)\n")
+    client.server.flush()
+    start = time.perf_counter()
+    symbols = client.request("textDocument/documentSymbol", params)["result"]
+    assert time.perf_counter() - start < 0.02
+    assert span(symbols[1]) == ((1, 0), (4, 1))
@@ -0,0 +1,134 @@
+import json
+import urllib.request
+
+import pytest
+
+import mel
+from mel import metrics
+from mel.exceptions import MelError
+from mel.utils.cache import Cache
+
+
+@pytest.fixture
+def registry():
+    metrics.enable()
+    before = metrics.snapshot()
+    yield before
+    metrics.enable()
+
+
+def grown(before, name):
+    return metrics.snapshot()[name] - before[name]
+
+
+# METRICS ===========================================
+
+def test_counter_by_labels():
+    counter = metrics.Counter("things_total", "Things", ["kind"])
+    counter.inc(("a",))
+    counter.inc(("a",), 2)
+    counter.inc(("b",))
+    assert counter.snapshot() == {"a": 3, "b": 1}
+    assert counter.samples() == [
+        ("things_total", {"kind": "a"}, 3),
+        ("things_total", {"kind": "b"}, 1),
+    ]
+
+
+def test_histogram_buckets():
+    histogram = metrics.Histogram("size", "Size", [1, 10])
+    for value in [0.5, 1, 5, 50]:
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 4
+    assert snapshot["sum"] == 56.5
+    assert list(snapshot["buckets"].values()) == [2, 1, 1]
+    buckets = [value for name, _, value in histogram.samples()
+               if name == "size_bucket"]
+    assert buckets == [2, 3, 4]
+
+
+def test_parse_updates_metrics(registry):
+    mel.parse("(a 1 2) x = a")
+    assert grown(registry, "mel_documents_parsed_total") == 1
+    assert grown(registry, "mel_lexed_characters_total") == 13
+    nodes = metrics.snapshot()["mel_tree_nodes"]
+    assert nodes["count"] == registry["mel_tree_nodes"]["count"] + 1
+
+
+def test_errors_are_counted_by_kind(registry):
+    counts = registry["mel_errors_total"]
+    with pytest.raises(MelError):
+        mel.parse("(a")
+    with pytest.raises(MelError):
+        mel.eval("(page title = title)")
+    found = metrics.snapshot()["mel_errors_total"]
+    assert found["ParsingError"] == counts.get("ParsingError", 0) + 1
+    assert found["EvaluationError"] == counts.get("EvaluationError", 0) + 1
+
+
+def test_evaluation_is_timed(registry):
+    mel.eval("(a 1)")
+    found = metrics.snapshot()["mel_eval_seconds"]["count"]
+    assert found == registry["mel_eval_seconds"]["count"] + 1
+
+
+def test_disabled_metrics_stay_still(registry):
+    metrics.enable(False)
+    mel.parse("(a 1)")
+    assert grown(registry, "mel_documents_parsed_total") == 0
+
+
+def test_tracked_caches():
+    cache = Cache()
+    metrics.track_cache("test", cache)
+    cache.fetch("a", lambda: 1)
+    cache.fetch("a", lambda: 1)
+    found = metrics.snapshot()["mel_cache_lookups_total"]["test"]
+    assert found == {"hits": 1, "misses": 1}
+    del cache
+    assert "test" not in metrics.snapshot()["mel_cache_lookups_total"]
+
+
+# EXPORTERS ===========================================
+
+def test_prometheus_text():
+    registry = metrics.Registry()
+    counter = registry.counter("errors_total", "Errors", ["kind"])
+    counter.inc(('say "hi"',))
+    histogram = registry.histogram("seconds", "Time", [0.1])
+    histogram.observe(0.05)
+    text = metrics.prometheus_text(registry)
+    assert "# TYPE errors_total counter" in text
+    assert 'errors_total{kind="say \\"hi\\""} 1' in text
+    assert 'seconds_bucket{le="0.1"} 1' in text
+    assert 'seconds_bucket{le="+Inf"} 1' in text
+    assert "seconds_count 1" in text
+
+
+def test_write_prometheus(tmp_path):
+    path = tmp_path / "mel.prom"
+    metrics.write_prometheus(str(path))
+    assert "mel_documents_parsed_total" in path.read_text()
+
+
+def test_serve_prometheus():
+    server = metrics.serve_prometheus(0)
+    try:
+        port = server.server_address[1]
+        url = "http://127.0.0.1:{}/metrics".format(port)
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert b"mel_parse_seconds_count" in response.read()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_reporter_exports_on_stop():
+    logged = []
+    export = metrics.logging_export(lambda found: logged.append(found))
+    reporter = metrics.Reporter(export, interval=60).start()
+    reporter.stop()
+    assert len(logged) == 1
+    assert "mel_documents_parsed_total" in logged[0]
+    json.dumps(logged[0], default=str)
@@ -0,0 +1,112 @@
+import pytest
+
+from mel import nodes
+from mel.parsing import Parser
+from mel.lexing import TokenStream
+
+
+def parse(text):
+    stream = TokenStream(text)
+    return Parser(stream).parse()
+
+
+# NODE VIEW ===========================================
+
+def test_container_slice_is_a_view():
+    node = parse("[1 2 3 4 5]")[0]
+    view = node[1:3]
+    assert isinstance(view, nodes.NodeView)
+    assert [n.value for n in view] == [2, 3]
+
+
+def test_view_shares_subnodes_storage():
+    node = parse("[1 2 3]")[0]
+    view = node.view()
+    node.add(parse("4")[0])
+    assert len(view) == 3
+    assert view[0] is node[0]
+
+
+@pytest.mark.parametrize(
+    "start, end, expected",
+    [
+        (None, None, [0, 1, 2, 3, 4]),
+        (2, None, [2, 3, 4]),
+        (None, -2, [0, 1, 2]),
+        (-2, None, [3, 4]),
+        (4, 1, []),
+    ]
+)
+def test_view_bounds(start, end, expected):
+    node = parse("[0 1 2 3 4]")[0]
+    view = node.view(start, end)
+    assert len(view) == len(expected)
+    assert [n.value for n in view] == expected
+
+
+@pytest.mark.parametrize(
+    "index, expected",
+    [
+        (slice(None, None, 2), [0, 2, 4]),
+        (slice(None, None, -1), [4, 3, 2, 1, 0]),
+        (slice(-2, None), [3, 4]),
+        (slice(3, 0, -2), [3, 1]),
+    ]
+)
+def test_container_and_view_slices_agree(index, expected):
+    node = parse("[0 1 2 3 4]")[0]
+    assert [n.value for n in node[index]] == expected
+    assert [n.value for n in node.view()[index]] == expected
+
+
+def test_view_of_view():
+    node = parse("[0 1 2 3 4 5]")[0]
+    view = node.view(1)[1:-1]
+    assert [n.value for n in view] == [2, 3, 4]
+    assert view[-1].value == 4
+
+
+# RANGE SLICE ===========================================
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("x/0..3", slice(0, 4)),
+        ("x/2..", slice(2, None)),
+        ("x/..5", slice(None, 6)),
+        ("x/0..-1", slice(0, None)),
+        ("x/0..-2", slice(0, -1)),
+    ]
+)
+def test_range_slice(test_input, expected):
+    _range = parse(test_input)[0][1]
+    assert _range.slice() == expected
+
+
+# WALKING ===========================================
+
+def test_children_are_subnodes_then_fields():
+    relation = parse("a = [1 2]")[0]
+    assert nodes.children(relation) == [relation.path, relation.value]
+    listing = relation.value
+    assert nodes.children(listing) == list(listing)
+
+
+def test_walk_reaches_every_node_once():
+    tree = parse("(a b = [1 2]) c/d")
+    walked = list(nodes.walk(tree))
+    assert len(walked) == len({id(node) for node in walked})
+    assert {type(node).__name__ for node in walked} >= {
+        "RootNode", "ObjectNode", "EqualNode", "ListNode", "IntNode",
+        "ReferenceNode",
+    }
+
+
+def test_walk_follows_replaced_children():
+    tree = parse("(a) (b)")
+    walked = []
+    for node in nodes.walk(tree):
+        walked.append(str(node))
+        if node is tree:
+            node._subnodes = node._subnodes[1:]
+    assert "(a)" not in walked and "(b)" in walked
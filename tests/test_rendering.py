@@ -0,0 +1,207 @@
+import io
+import json
+
+import pytest
+
+import mel
+from mel.exceptions import EvaluationError, MelError
+from mel.rendering import BufferedWriter, Renderer, RendererMap, renderer
+from mel.rendering.css import CSSRenderer
+from mel.rendering.json import Mapping, dump, dumps
+
+
+# BUFFERED WRITER ===========================================
+
+class File(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+def test_writer_buffers_small_writes():
+    file = File()
+    writer = BufferedWriter(file, size=10)
+    for _ in range(9):
+        writer.write("a")
+    assert file.writes == 0
+    writer.write("a")
+    assert file.writes == 1
+    writer.write("b")
+    writer.flush()
+    assert file.getvalue() == "a" * 10 + "b"
+
+
+# JSON ===========================================
+
+@pytest.mark.parametrize(
+    "test_input",
+    [
+        "",
+        "42 -1.5 true 'a' \"b\"",
+        "[1 [2 [3]] 'x']",
+        "(person #active name = 'John' age = 45 'note')",
+        "(item 1) (item 2) (: x = 1)",
+        "x > 1 x <= 5",
+        "x = 1 (a n = 2 y = n z = x)",
+        "items = [1 2 3 4] y = items/1..2 z = items/*",
+        "(p age = 5) (p age = 9) y = {p age > 6}",
+        "n = 'Bob' (a t = \"Hi {n}\")",
+        "y = missing",
+        "(x a = 1 b > 2 c != 3) y = x/*",
+        "(x a = [1 2] b <= 'z') y = x/* z = x/*/0",
+    ]
+)
+def test_json_matches_evaluation(test_input):
+    output = dumps(mel.parse(test_input))
+    assert json.loads(output) == mel.eval(test_input)
+
+
+def test_dump_writes_in_chunks():
+    text = " ".join("(item value = {})".format(i) for i in range(150))
+    file = File()
+    dump(mel.parse(text), file, buffer_size=1024)
+    assert 1 < file.writes < 50
+    assert json.loads(file.getvalue()) == mel.eval(text)
+
+
+def test_circular_reference():
+    with pytest.raises(EvaluationError):
+        dumps(mel.parse("a = b b = a"))
+
+
+# MAPPINGS ===========================================
+
+def test_expressions_as_values():
+    mapping = Mapping(objects="value", relations="value", tags="value")
+    output = dumps(mel.parse("(a #b c = 1)"), mapping)
+    assert json.loads(output) == {":": [{"a": {":": [
+        "#b",
+        {"path": "c", "sign": "=", "value": 1}
+    ]}}]}
+
+
+def test_references_as_source():
+    mapping = Mapping(references="source")
+    output = dumps(mel.parse("x = 1 y = x/0..2"), mapping)
+    assert json.loads(output) == {"x": 1, "y": "x/0..2"}
+
+
+# RENDERERS ===========================================
+
+def render(text, _format=None):
+    file = io.StringIO()
+    mel.render(text, file, _format)
+    return file.getvalue()
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("(p 'a < b')", "<p>a &lt; b</p>"),
+        (
+            "(a href = 'x?a=1&b=2' #hidden)",
+            '<a href="x?a=1&amp;b=2" hidden></a>'
+        ),
+        ("(input type = 'text' 42)", '<input type="text" value="42" />'),
+        ("(ul (li 1) (li 2))", "<ul><li>1</li><li>2</li></ul>"),
+        ("(?note 'hi')", "<!-- hi -->"),
+        ("(?note 'a -- b --> c')", "<!-- a - - b - -&gt; c -->"),
+        ("(: 'a' 'b')", "ab"),
+        ("n = 'x' (p n)", "<p>x</p>"),
+    ]
+)
+def test_html(test_input, expected):
+    assert render(test_input, "html") == expected
+
+
+def test_xml():
+    output = render("(item #on name = '\"a\"' (empty))", "xml")
+    assert output == "<item on=\"true\" name='\"a\"'><empty/></item>"
+
+
+@pytest.mark.parametrize("_format", ["html", "xml"])
+@pytest.mark.parametrize("test_input", [
+    "($thumb 1)",
+    "(p a/b = 1)",
+    "(Concept/x 1)",
+])
+def test_names_are_validated(_format, test_input):
+    with pytest.raises(MelError):
+        render(test_input, _format)
+
+
+def test_xml_comments():
+    assert render("(?note 'x--')", "xml") == "<!-- x- - -->"
+
+
+def test_css():
+    output = render("(nav color = 'red' (a margin = 0 (b x = 1)))", "css")
+    assert output == "nav{color:red}nav a{margin:0}nav a b{x:1}"
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("red}body{display:none", "red\\7d body\\7b display:none"),
+    ("a;b", "a\\3b b"),
+    ("</style>", "\\3c /style\\3e "),
+    ("'x' /* y */", "\\27 x\\27  \\2f * y */"),
+    ("12px/1.5 sans-serif", "12px/1.5 sans-serif"),
+])
+def test_css_values_are_escaped(value, expected):
+    output = render("(nav color = {})".format(json.dumps(value)), "css")
+    assert output == "nav{{color:{}}}".format(expected)
+
+
+@pytest.mark.parametrize("name", ["a{b", "a}b", "a;b"])
+def test_css_names_cant_end_blocks(name):
+    with pytest.raises(MelError):
+        CSSRenderer(None).name(name)
+
+
+def test_document_default_format():
+    assert render("(%: html) (p 1)") == "<p>1</p>"
+
+
+def test_format_keys_switch_renderers():
+    output = render("(style (%css (p margin = 0)))", "html")
+    assert output == "<style>p{margin:0}</style>"
+
+
+def test_default_format_is_json():
+    assert json.loads(render("(p 1)")) == {"p": {":": [1]}}
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("(p 1)", "{'p': {':': [1]}}"),
+        ("(%: html) (p 1)", "<p>1</p>"),
+    ]
+)
+def test_show_prints_values_of_documents_without_format(test_input,
+                                                        expected):
+    file = io.StringIO()
+    mel.show(mel.parse(test_input), file)
+    assert file.getvalue() == expected
+
+
+def test_unknown_format():
+    with pytest.raises(MelError):
+        render("(p 1)", "nope")
+
+
+def test_registered_renderer():
+    @renderer
+    class UpperRenderer(Renderer):
+        id = "upper"
+
+        def expand(self, node):
+            return [str(node).upper()]
+
+    try:
+        assert render("(p 'a')", "upper") == "(P 'A')"
+    finally:
+        RendererMap._map.pop("upper")
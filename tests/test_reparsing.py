@@ -0,0 +1,99 @@
+import pytest
+
+import mel
+from mel import compiling, nodes, reparsing
+from mel.exceptions import MelError
+
+
+BASE = "(a b=1) (c 'x y' d=[1 2]) -- note\nx y z (q w=\"t {a}\")"
+
+
+def shape(node):
+    fields = {
+        name: shape(value) if isinstance(value, nodes.Node) else value
+        for name, value in vars(node).items()
+        if name not in compiling.STRUCTURE
+    }
+    subnodes = [shape(subnode) for subnode in getattr(node, "_subnodes", ())]
+    return type(node).__name__, node.index, str(node), fields, subnodes
+
+
+def edit(old, new):
+    document = reparsing.Document(old)
+    tree = document.update(new)
+    assert shape(tree) == shape(mel.parse(new))
+    assert tree.text == document.text == new
+    return document
+
+
+# UPDATES ===========================================
+
+@pytest.mark.parametrize("new", [
+    BASE,
+    "(a b=12) (c 'x y' d=[1 2]) -- note\nx y z (q w=\"t {a}\")",
+    "(a b=1) (c 'x y z' d=[1 2]) -- note\nx y z (q w=\"t {a}\")",
+    "(a b=1) (c 'x y' d=[1 2]) -- note\nx yy z (q w=\"t {a}\")",
+    "(a b=1) (c 'x y' d=[1 2]) -- note\nx y z (q w=\"t {b}\") k",
+    "n (a b=1) (c 'x y' d=[1 2]) -- note\nx y z (q w=\"t {a}\")",
+    "(a b=1) -- note\nx y z (q w=\"t {a}\")",
+    "(a b=1) (c 'x y' d=[1 2]) x y z (q w=\"t {a}\")",
+    "(a b=1) (c 'x y' d=[1 2]) -- x y z (q w=\"t {a}\")",
+    "(a b=1)(c 'x y' d=[1 2]) -- note\nx y z (q w=\"t {a}\")",
+    "(a b=1) (c 'x y' d=[1 2]) -- note\nxy z (q w=\"t {a}\")",
+    "(a b=1) (c 'x y' d=[1 2]) -- note\nx y z",
+    "",
+])
+def test_update_matches_full_parse(new):
+    edit(BASE, new)
+
+
+def test_update_from_empty_text():
+    edit("", BASE)
+
+
+# a string opened by the edit runs past the reparsed region
+def test_update_falls_back_to_full_parse():
+    edit("a b c d e f g h", "a 'b c d e f g h'")
+
+
+def test_successive_updates():
+    document = reparsing.Document(BASE)
+    text = BASE
+    for position in (3, 20, 40, 0, len(text)):
+        text = text[:position] + " k " + text[position:]
+        tree = document.update(text)
+        assert shape(tree) == shape(mel.parse(text))
+
+
+def test_unchanged_expressions_are_kept():
+    document = reparsing.Document(BASE + " (e f=1) (g h=2)")
+    first, *_, last = document.tree
+    tree = document.update(BASE.replace("x y z", "x w z") + " (e f=1) (g h=2)")
+    assert tree[0] is first
+    assert tree[-1] is last
+
+
+# an older text isn't kept alive by the expressions before an edit
+def test_unchanged_expressions_read_the_new_text():
+    document = reparsing.Document(BASE + " (e f=1) (g h=2)")
+    text = BASE + " (e f=1) (g h=3)"
+    tree = document.update(text)
+    assert tree[0].text is text
+    assert all(node.text is text for node in tree[0])
+
+
+# ERRORS ===========================================
+
+def test_bad_text_keeps_last_tree():
+    document = reparsing.Document(BASE)
+    tree = document.tree
+    with pytest.raises(MelError):
+        document.update(BASE + " (a")
+    assert document.tree is tree
+    assert document.text == BASE
+    edit(BASE, BASE + " (a)")
+
+
+def test_bad_initial_text():
+    with pytest.raises(MelError):
+        reparsing.Document("(a")
@@ -0,0 +1,85 @@
+import types
+
+import pytest
+
+from mel import nodes
+from mel.parsing import Parser
+from mel.lexing import TokenStream
+from mel.resolving import ReferenceResolver
+
+
+def resolve(text):
+    stream = TokenStream(text)
+    tree = Parser(stream).parse()
+    reference = tree[len(tree) - 1]
+    return ReferenceResolver(tree).resolve(reference)
+
+
+def values(selection):
+    return [node.value for node in selection]
+
+
+# LOOKUP ===========================================
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("x = 42 x", 42),
+        ("@x = 'a' @x", 'a'),
+        ("(a b = 3) a/b", 3),
+        ("(a (b (c 5))) a/b/c/0", 5),
+        ("items = [1 2 3] items/1", 2),
+    ]
+)
+def test_single_target(test_input, expected):
+    assert resolve(test_input).value == expected
+
+
+@pytest.mark.parametrize(
+    "test_input",
+    [
+        "x",
+        "x = 2 y",
+        "x = 2 x/0",
+        "items = [1 2] items/5",
+        "(a b = 3) a/c/d",
+    ]
+)
+def test_missing_target(test_input):
+    assert resolve(test_input) is None
+
+
+def test_tag_target():
+    node = resolve("(a #b) a/#b")
+    assert node.id == nodes.TagKeywordNode.id
+
+
+# RANGE ===========================================
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("items = [0 1 2 3 4 5] items/2..4", [2, 3, 4]),
+        ("items = [0 1 2 3 4 5] items/..1", [0, 1]),
+        ("items = [0 1 2 3 4 5] items/4..", [4, 5]),
+        ("items = [0 1 2 3 4 5] items/*", [0, 1, 2, 3, 4, 5]),
+    ]
+)
+def test_range_and_wildcard_are_views(test_input, expected):
+    view = resolve(test_input)
+    assert isinstance(view, nodes.NodeView)
+    assert len(view) == len(expected)
+    assert values(view) == expected
+
+
+def test_chained_expansion_is_lazy():
+    text = "(catalog (a images=[1 2 3 4 5]) (b images=[6 7])) " \
+           "catalog/*/images/0..2"
+    selection = resolve(text)
+    assert isinstance(selection, types.GeneratorType)
+    assert values(selection) == [1, 2, 3, 6, 7]
+
+
+def test_list_step():
+    selection = resolve("(fruits (a 1) (b 2) (c 3)) fruits/[c a]")
+    assert [str(node.key) for node in selection] == ['c', 'a']
@@ -0,0 +1,127 @@
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from mel import server
+from mel.exceptions import MelError
+
+
+@pytest.fixture
+def socket_path():
+    # unix socket paths are short, so they can't live in tmp_path
+    directory = tempfile.mkdtemp()
+    yield os.path.join(directory, "mel.sock")
+    shutil.rmtree(directory)
+
+
+@pytest.fixture
+def running(socket_path):
+    instance = server.Server(socket_path, idle_timeout=None)
+    thread = threading.Thread(target=instance.serve_forever, args=[0.05])
+    thread.start()
+    yield instance
+    instance.shutdown()
+    thread.join()
+
+
+def ask(instance, **payload):
+    return server.request(instance.path, payload, timeout=5)
+
+
+# REQUESTS ===========================================
+
+# like bin/mel, documents without a format print their evaluated value
+def test_renders_text(running):
+    response = ask(running, text="(a b=1)")
+    assert response["output"] == str({"a": {"b": 1}})
+
+
+def test_renders_text_in_format(running):
+    response = ask(running, text="(a b=1)", format="json")
+    assert json.loads(response["output"]) == {"a": {"b": 1}}
+
+
+def test_renders_file_in_format(running, tmp_path):
+    path = tmp_path / "doc.mel"
+    path.write_text("(p 'hi')")
+    response = ask(running, path=str(path), format="html", cache=False)
+    assert response["output"] == "<p>hi</p>"
+
+
+def test_keeps_trees_of_unchanged_files(running, tmp_path):
+    path = tmp_path / "doc.mel"
+    path.write_text("(a)")
+    ask(running, path=str(path), cache=False)
+    ask(running, path=str(path), cache=False)
+    assert running.trees.info()[:2] == (1, 1)
+    path.write_text("(a b=2)")
+    response = ask(running, path=str(path), cache=False)
+    assert response["output"] == str({"a": {"b": 2}})
+
+
+@pytest.mark.parametrize("payload", [
+    {"text": "(a"},
+    {"path": "/missing/doc.mel"},
+    {},
+])
+def test_reports_errors(running, payload):
+    assert "error" in ask(running, **payload)
+
+
+def test_serves_concurrent_clients(running):
+    texts = ["(a{0} b={0})".format(i) for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(executor.map(lambda t: ask(running, text=t), texts))
+    for index, response in enumerate(responses):
+        expected = {"a{}".format(index): {"b": index}}
+        assert response["output"] == str(expected)
+
+
+# LIFETIME ===========================================
+
+def test_exits_when_idle(socket_path):
+    instance = server.Server(socket_path, idle_timeout=0.1)
+    instance.serve_forever(poll_interval=0.05)
+    assert not os.path.exists(socket_path)
+
+
+def test_replaces_stale_socket(socket_path):
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+    server.Server(socket_path).server_close()
+
+
+def test_refuses_socket_in_use(running):
+    with pytest.raises(MelError):
+        server.Server(running.path)
+
+
+def test_keeps_files_that_arent_sockets(socket_path):
+    with open(socket_path, "w") as file:
+        file.write("notes")
+    with pytest.raises(MelError):
+        server.Server(socket_path)
+    with open(socket_path) as file:
+        assert file.read() == "notes"
+
+
+def test_socket_is_private(running):
+    assert os.stat(running.path).st_mode & 0o777 == 0o600
+
+
+def test_socket_is_created_private(socket_path, monkeypatch):
+    monkeypatch.setattr(os, "chmod", pytest.fail)
+    umask = os.umask(0o022)
+    try:
+        with server.Server(socket_path, idle_timeout=None):
+            assert os.stat(socket_path).st_mode & 0o777 == 0o600
+        assert os.umask(0o022) == 0o022
+    finally:
+        os.umask(umask)
@@ -0,0 +1,54 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import mel
+from mel import sharing
+from mel.utils import Context
+
+
+TEXT = "(person name='Ana' age=3 #active) person/name"
+
+
+def evaluate(tree):
+    context = Context()
+    context.tree = tree
+    return mel.evaluate(tree, context)
+
+
+def evaluate_shared(name):
+    with sharing.attach(name) as shared:
+        return json.dumps(evaluate(shared.tree))
+
+
+# PUBLISHING ===========================================
+
+def test_attached_tree_evaluates_as_published_tree():
+    tree = mel.parse(TEXT)
+    with sharing.publish(tree) as shared:
+        with sharing.attach(shared.name) as attached:
+            assert evaluate(attached.tree) == evaluate(tree)
+
+
+def test_attached_nodes_read_the_source_text():
+    with sharing.publish(mel.parse(TEXT)) as shared:
+        with sharing.attach(shared.name) as attached:
+            assert str(attached.tree[0]) == "(person name='Ana' age=3 #active)"
+
+
+def test_workers_read_one_published_tree():
+    tree = mel.parse(TEXT)
+    expected = json.dumps(evaluate(tree))
+    with sharing.publish(tree) as shared:
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            results = executor.map(evaluate_shared, [shared.name] * 3)
+            assert list(results) == [expected] * 3
+
+
+def test_closing_the_publisher_removes_the_segment():
+    shared = sharing.publish(mel.parse(TEXT))
+    name = shared.name
+    shared.close()
+    with pytest.raises(FileNotFoundError):
+        sharing.attach(name)
@@ -0,0 +1,86 @@
+import pytest
+
+import mel
+from mel import nodes
+from mel.exceptions import EvaluationError, ParsingError
+from mel.templating import Template, compile_template
+
+
+def render_last(text):
+    return mel.eval(text)[":"][-1]
+
+
+# COMPILE ===========================================
+
+def test_template_is_split_into_parts_and_slots():
+    template = Template("Hi {name}, you are {person/age}!")
+    assert template.parts == ["Hi ", "", ", you are ", "", "!"]
+    assert [index for index, _ in template.slots] == [1, 3]
+    assert all(
+        ref.id == nodes.ReferenceNode.id for _, ref in template.slots
+    )
+
+
+@pytest.mark.parametrize(
+    "source, expected",
+    [
+        ("", ""),
+        ("plain", "plain"),
+        ("{{literal}}", "{literal}"),
+        ("a {{b}} c", "a {b} c"),
+    ]
+)
+def test_template_without_slots(source, expected):
+    assert Template(source).render(None) == expected
+
+
+def test_compiled_template_is_cached_by_source():
+    assert compile_template("x {a} y") is compile_template("x {a} y")
+
+
+@pytest.mark.parametrize("source, index", [
+    ("{a b}", 3),
+    ("x {}", 3),
+    ("x {  a b}", 7),
+])
+def test_invalid_reference_segment(source, index):
+    with pytest.raises(ParsingError) as error:
+        Template(source)
+    assert error.value.index == index
+
+
+def test_render_calls_resolver_per_slot():
+    template = Template("{a}-{b/c}")
+    assert template.render(str) == "a-b/c"
+
+
+# RENDER ===========================================
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ('name = "Bob" "Hello {name}!"', "Hello Bob!"),
+        ("(p age = 42) \"{p/age} years\"", "42 years"),
+        ('items = [1 2 3] "{items/0..1}"', "1 2"),
+        ('items = [1] "{items/3..5}?"', "?"),
+    ]
+)
+def test_render_resolves_references(test_input, expected):
+    assert render_last(test_input) == expected
+
+
+@pytest.mark.parametrize(
+    "test_input, message, pointer",
+    [
+        ('x = "{}"', "Invalid reference", "1 | x = \"{}\"\n" + "-" * 10),
+        ('x = "a {b c} d"', "Invalid reference", "-" * 14 + "^"),
+        ('y = 1\nx = "color: {red}"', "Undefined reference {red}",
+         "2 | x = \"color: {red}\"\n" + "-" * 17 + "^"),
+    ]
+)
+def test_template_errors_point_at_the_document(test_input, message,
+                                               pointer):
+    with pytest.raises(EvaluationError) as error:
+        mel.eval(test_input)
+    assert message in str(error.value)
+    assert pointer in str(error.value)
@@ -0,0 +1,87 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import mel
+from mel.utils import Context, Environment, StripedLock
+
+
+# CONTEXT ===========================================
+
+def test_eval_creates_a_context_per_call():
+    assert mel.eval("x = 1") == {"x": 1}
+    assert mel.eval("y = 2") == {"y": 2}
+
+
+def test_context_can_be_reused():
+    context = Context()
+    assert mel.eval("x = 1", context) == {"x": 1}
+    assert mel.eval("x = 2", context) == {"x": 2}
+    assert str(context.tree) == "x = 2"
+
+
+def test_contexts_share_the_environment_cache():
+    environment = Environment()
+    mel.eval("($a 1)", Context(environment))
+    tree = mel.eval("($a 2)", Context(environment))
+    assert tree == {"$a": {":": [1]}}
+
+
+# STRIPED LOCK ===========================================
+
+def test_striped_lock_is_stable_per_key():
+    locks = StripedLock(4)
+    assert len(locks) == 4
+    assert locks["a"] is locks["a"]
+
+
+# THREADS ===========================================
+
+def test_concurrent_evaluations_are_isolated():
+    environment = Environment()
+
+    def evaluate(number):
+        text = "n = {0} (item value = n 'item {0}')".format(number)
+        context = Context(environment)
+        tree = mel.eval(text, context)
+        return number, tree, str(context.tree)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(evaluate, range(400)))
+    for number, tree, source in results:
+        assert tree["n"] == number
+        assert tree["item"] == {
+            "value": number,
+            ":": ["item {}".format(number)]
+        }
+        assert source.startswith("n = {} ".format(number))
+
+
+def test_shared_cache_computes_each_key_once():
+    environment = Environment()
+    barrier = threading.Barrier(8)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    def fetch(_):
+        barrier.wait()
+        return environment.cache.fetch("key", compute)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        values = list(executor.map(fetch, range(8)))
+    assert values == [1] * 8
+    assert calls == [1]
+
+
+def test_concurrent_cached_objects():
+    environment = Environment()
+
+    def evaluate(number):
+        text = "($shared {})".format(number)
+        return mel.eval(text, Context(environment))["$shared"]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        values = list(executor.map(evaluate, range(200)))
+    assert all(value == values[0] for value in values)
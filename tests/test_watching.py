@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from mel import nodes, watching
+from mel.exceptions import MelError
+
+
+@pytest.fixture
+def changes():
+    return []
+
+
+def watcher(path, changes):
+    return watching.Watcher(
+        str(path), lambda path, tree: changes.append((path, tree))
+    )
+
+
+def touch(path, text):
+    path.write_text(text)
+    # the next signature must differ, even on coarse clocks
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+# FILES ===========================================
+
+def test_first_poll_parses_file(tmp_path, changes):
+    path = tmp_path / "a.mel"
+    path.write_text("(a b=1)")
+    assert watcher(path, changes).poll() == [str(path)]
+    assert isinstance(changes[0][1], nodes.RootNode)
+    assert changes[0][1].text == "(a b=1)"
+
+
+def test_unchanged_file_is_skipped(tmp_path, changes):
+    path = tmp_path / "a.mel"
+    path.write_text("(a b=1)")
+    instance = watcher(path, changes)
+    instance.poll()
+    assert instance.poll() == []
+    assert len(changes) == 1
+
+
+def test_changed_file_is_reparsed(tmp_path, changes):
+    path = tmp_path / "a.mel"
+    path.write_text("(a b=1) (c d=2)")
+    instance = watcher(path, changes)
+    instance.poll()
+    touch(path, "(a b=3) (c d=2)")
+    assert instance.poll() == [str(path)]
+    assert str(changes[-1][1][0]) == "(a b=3)"
+    assert str(changes[-1][1][1]) == "(c d=2)"
+
+
+def test_errors_are_reported(tmp_path, changes):
+    path = tmp_path / "a.mel"
+    path.write_text("(a b=1)")
+    instance = watcher(path, changes)
+    instance.poll()
+    touch(path, "(a b=")
+    instance.poll()
+    assert isinstance(changes[-1][1], MelError)
+    touch(path, "(a b=2)")
+    instance.poll()
+    assert str(changes[-1][1][0]) == "(a b=2)"
+
+
+# DIRECTORIES ===========================================
+
+def test_directory_files_are_watched(tmp_path, changes):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / ".hidden").write_text("(h)")
+    (tmp_path / "__melcache__").mkdir()
+    (tmp_path / "__melcache__" / "a.melc").write_text("")
+    (tmp_path / "a.mel").write_text("(a)")
+    (tmp_path / "sub" / "b.mel").write_text("(b)")
+    instance = watcher(tmp_path, changes)
+    assert instance.poll() == [
+        str(tmp_path / "a.mel"), str(tmp_path / "sub" / "b.mel")
+    ]
+
+
+def test_removed_files_are_forgotten(tmp_path, changes):
+    path = tmp_path / "a.mel"
+    path.write_text("(a)")
+    instance = watcher(tmp_path, changes)
+    instance.poll()
+    path.unlink()
+    assert instance.poll() == []
+    assert instance.documents == {}